@@ -1,22 +1,46 @@
 #importing liberaries
-import tkinter as tk
-from tkinter import *
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
+#pandas, numpy and matplotlib are imported by the operations that use them, so startup stays fast
+import argparse
+import csv
+import datetime
+import decimal
+import json
+import os
+import sys
+import time
 import pymysql
-import crud
+import slowlog
 #Code Starts Here
-print("Basic CRUD OPERATION")
-con=pymysql.connect(host="localhost", user="root", password='',
-    cursorclass=pymysql.cursors.DictCursor)
-try:
-    print(con.connection_id())
-except:
-    print("connection complete")
-
-#installation curobj object
-curobj=con.cursor()
+#one connection for the whole session; opened by connect() from main()
+con=None
+curobj=None
+#database selected with USE, so commands only switch when it changes
+current_db=None
+#statements slower than SLOW_QUERY_MS go to SLOW_QUERY_LOG with their EXPLAIN plan
+slow_log=slowlog.SlowLog.from_env()
+def connect(host, user, password, autocommit):
+    global con, curobj
+    con=pymysql.connect(host=host, user=user, password=password,
+        cursorclass=pymysql.cursors.DictCursor, autocommit=autocommit)
+    curobj=con.cursor()
+def ident(name):
+    #backtick-quote a table/column/database name taken from a script
+    return '`'+str(name).replace('`','``')+'`'
+def use(db):
+    global current_db
+    if db!=current_db:
+        curobj.execute('use {}'.format(ident(db)))
+        current_db=db
+def logged(db, sql, source, params=None):
+    t0=time.perf_counter()
+    curobj.execute(sql, params)
+    record=curobj.fetchall() if curobj.description else None
+    rows=len(record) if record is not None else curobj.rowcount
+    elapsed=time.perf_counter()-t0
+    if slow_log.observe("mysql", db, sql, params, elapsed, rows,
+                        lambda: slowlog.explain_mysql(curobj, sql, params), source):
+        print("slow query: {} rows in {:.0f} ms".format(rows, elapsed*1000), file=sys.stderr)
+    return record
 def cls():
     print("\n" * 4)
 def intro():
@@ -43,72 +67,42 @@ def menu():
     print(" Q. Quit")
     #showtb()
     
-def main():
-    ch = 0
-    menu()
-    ch = input("Press 1 to 5 for CRUD or Q to Quit: ")
-    if ch == '1':
-        createdb()
-    elif ch=='s' or ch=='S':
-        showtb()
-    elif ch == '2':
-        createtb()
-    elif ch == '3':
-        insert()
-    elif ch == '4':
-        selectall()       
-    elif ch == '5':
-        selectcon() 
-    elif ch == '6':
-        update()
-    elif ch == '7':
-        droptb()
-    elif ch=='8':
-        dropdb()
-    elif ch == '9':
-        desctb()
-    elif ch=='A' or ch=='a':
-        alter()
-    elif ch=='P' or ch=='p':
-        plot()
-    elif ch == 'Q' or ch == 'q' :
-        print("Thanks for using DMS!")
-    elif ch == 'E' or ch == 'e' :
-        export()
-    else: 
-        print("Invalid choice! Enter a valid option.")
-        main() 
-    while ch == 'Q' or ch == 'q':
-        curobj.close()
-        con.close()
-        raise SystemExit#terminate the app
-    else:
-        replayMenu()
-def replayMenu():
-    startover = ""
-    startover = input('...continue (y/n)? ')
-    while startover.lower() != 'y':
-        print("Thank you for using DMS.")
-        break
-    else:
-        main()
+def interactive():
+    #a loop rather than main() -> replayMenu() -> main(), so long sessions do not grow the stack
+    actions={'1': createdb, 's': showtb, '2': createtb, '3': insert, '4': selectall, '5': selectcon,
+             '6': update, '7': droptb, '8': dropdb, '9': desctb, 'a': alter, 'p': plot, 'e': export}
+    while True:
+        menu()
+        ch = input("Press 1 to 5 for CRUD or Q to Quit: ").lower()
+        if ch == 'q':
+            print("Thanks for using DMS!")
+            break
+        if ch not in actions:
+            print("Invalid choice! Enter a valid option.")
+            continue
+        try:
+            actions[ch]()
+        except pymysql.MySQLError as e:
+            print("ERROR %d: %s" %(e.args[0], e.args[1]))
+        startover = input('...continue (y/n)? ')
+        if startover.lower() != 'y':
+            print("Thank you for using DMS.")
+            break
 def createdb():
     Q=input("Do you have a Database (y/n): ").lower()
     if Q=='n':
         dname=input("enter the database name: ")
-        q1='create database {}'.format(dname)
+        q1='create database {}'.format(ident(dname))
         curobj.execute(q1)
     elif Q=='y':
         dbn=input("Enter the Database name: ")
-        q1='use '+dbn
-        curobj.execute(q1)
+        use(dbn)
     else:
         print("Inavalid Choice..")
     
 def createtb():
     db=input("enter the database name: ")
-    sql1='use {}'.format(db)
-    curobj.execute(sql1)
+    use(db)
     tb=input("enter the table name: ")
     col=int(input("enter the number of columns: "))
     sql='create table '+tb+'('
@@ -153,9 +147,9 @@ def createtb():
     except con.Error as e:
         print("ERROR %d: %s" %(e.args[0], e.args[1]))
 def showtb():
+    import pandas as pd
     db=input("enter the database name: ")
-    sql1='use {}'.format(db)
-    curobj.execute(sql1)
+    use(db)
     sql="Show tables"
     curobj.execute(sql)
     tbn=curobj.fetchall()
@@ -165,9 +159,9 @@ def showtb():
             ,'===================================')
     #print(s1)
 def insert():
+    import pandas as pd
     db=input("enter the database name: ")
-    sql1='use {}'.format(db)
-    curobj.execute(sql1)
+    use(db)
     sql3='show tables'
     curobj.execute(sql3)
     result=curobj.fetchall()
@@ -200,9 +194,9 @@ def insert():
     except con.Error as e:
         print("ERROR %d: %s" %(e.args[0], e.args[1]))
 def selectall():
+    import pandas as pd
     db=input("enter the database name: ")
-    sql1='use {}'.format(db)
-    curobj.execute(sql1)
+    use(db)
     #db=input("enter the database name: ")
     #sql1='use {}'.format(db)
     #curobj.execute(sql1)
@@ -233,9 +227,9 @@ def selectall():
     print(result)
     '''
 def selectcon():
+    import pandas as pd
     db=input("enter the database name: ")
-    sql1='use {}'.format(db)
-    curobj.execute(sql1)
+    use(db)
     tbn=input("enter the table name: ")
     print("Table selected")
     coln=int(input("enter the number of columns: "))
@@ -248,26 +242,21 @@ def selectcon():
     #if coln==1:
         #sql=sql[:-1]
     sql=sql +' from {}'.format(tbn)
-    curobj.execute(sql)
-    record=curobj.fetchall()
+    record=logged(db, sql, "selectcon")
     result=pd.DataFrame(record)
     print(result)
     
 def export():
     db=input("enter the Database Name: ")
-    sql='use {}'.format(db)
-    curobj.execute(sql)
+    use(db)
     tbn=input("enter the table name: ")
-    sql='select * from {}'.format(tbn)
-    curobj.execute(sql)
-    record=curobj.fetchall()
-    result=pd.DataFrame(record)
-    df=pd.to_csv(result)
+    path=input("enter the csv file name [{}.csv]: ".format(tbn)) or tbn+'.csv'
+    rows=export_csv(tbn, path)
+    print(rows, "rows written to", path)
     
 def alter():
     db=input("enter the database name: ")
-    sql='use {}'.format(db)
-    curobj.execute(sql)
+    use(db)
     print(" 1.Add Column")
     print(" 2.Drop Column")
     print(" 3.Modify Column")
@@ -310,11 +299,9 @@ def alter():
         curobj.execute(sql)
     else:
         print('invalid choice')
-        main()
 def update():
     db=input("enter the database name: ")
-    sql='use {}'.format(db)
-    curobj.execute(sql)
+    use(db)
     tbn=input("enter the table name: ")
     col1=input("enter the column name to update: ")
     val=input("enter the value for the column: ")
@@ -322,11 +309,11 @@ def update():
     val2=input("enter the values in the column: ")
     sql='Update '+tbn+' set '+col1+' = '+'"'+val+'"'+' where '+col+'='+val2
     print(sql)
-    curobj.execute(sql)
+    logged(db, sql, "update")
 def desctb():
+    import pandas as pd
     db=input("enter the database name: ")
-    sql='use {}'.format(db)
-    curobj.execute(sql)
+    use(db)
     tbn=input("enter the table name: ")
     sql='desc {}'.format(tbn)
     curobj.execute(sql)
@@ -335,8 +322,7 @@ def desctb():
     print(df)
 def droptb():
     db=input("enter the database name: ")
-    sql='use {}'.format(db)
-    curobj.execute(sql)
+    use(db)
     tbn=input("enter the table name: ")
     sql='DROP TABLE {}'.format(tbn)
     print(sql)
@@ -344,41 +330,368 @@ def droptb():
     print("Table successfully Deleted...")
 def plot():
     db=input("enter the database name: ")
-    sql1='use {}'.format(db)
-    curobj.execute(sql1)
+    use(db)
     tbn=input("enter the table name: ")
-    sql='select * from {}'.format(tbn)
-    curobj.execute(sql)
-    record=curobj.fetchall()
-    result=pd.DataFrame(record)
-    column=list(result.columns)
-    print('Column Names:',column)
+    curobj.execute('desc {}'.format(ident(tbn)))
+    print('Column Names:',[r['Field'] for r in curobj.fetchall()])
     bartype=input("Enter the bar Type[Bar,Line]: ").lower()
     title=input("enter the title for graph: ")
     x_axis=input("enter the x-axis column name: ")
     y_axis=input("enter the y-axis column name: ")
     colors=input("enter the Bar colours: ")
-    x=result[x_axis].tolist()
-    y=result[y_axis].tolist()
-    plt.title(title)
-    if bartype=='bar':
-        outline=input('enter the outline color: ')
-        plt.bar(x,y,color=colors,width=0.5,edgecolor=outline)
-    elif bartype=='line':
-        plt.plot(x,y,color=colors)
-    else:
-        print("Invalid Choice...")
-    plt.xlabel(x_axis)
-    plt.ylabel(y_axis)
-    plt.xticks(x)
-    ymin=int(input("enter the minimum y-axis value: "))
-    ymax=int(input("enter the maximum y-axis value: "))
-    yinter=int(input("enter the interval of y-axis: "))
-    plt.yticks(np.arange(ymin,ymax,yinter))
-    plt.show()
+    outline=input('enter the outline color: ') if bartype=='bar' else ''
+    path=input("enter the image file name, .png or .svg [{}.png]: ".format(tbn)) or tbn+'.png'
+    ymin=input("enter the minimum y-axis value [auto]: ")
+    ymax=input("enter the maximum y-axis value [auto]: ")
+    try:
+        ylim=(float(ymin), float(ymax)) if ymin and ymax else None
+        info=plot_table(tbn, x_axis, y_axis, bartype, path, title=title,
+                        color=colors or None, edgecolor=outline or None, ylim=ylim)
+    except ValueError as e:
+        print(e)
+        return
+    print("{rows} rows drawn as {points} points in {path} ({seconds} s)".format(**info))
 def dropdb(): 
+    global current_db
     db=input("enter the database name to delete: ")
-    sql='drop database '+db
+    sql='drop database '+ident(db)
     curobj.execute(sql)
+    #MySQL deselects a dropped database, so the next use() must send USE again
+    if current_db==db:
+        current_db=None
     print("Database Successfully Deleted...")
-main()
+def export_csv(tbn, path, size=1000):
+    #an unbuffered cursor streams the table to the file instead of loading it all first
+    cur=con.cursor(pymysql.cursors.SSCursor)
+    rows=0
+    try:
+        cur.execute('select * from {}'.format(ident(tbn)))
+        with open(path, 'w', newline='', encoding='utf-8') as fh:
+            out=csv.writer(fh)
+            out.writerow([d[0] for d in cur.description])
+            while True:
+                chunk=cur.fetchmany(size)
+                if not chunk:
+                    break
+                out.writerows(chunk)
+                rows+=len(chunk)
+    finally:
+        cur.close()
+    return rows
+
+PLOT_FORMATS=('.png', '.svg')
+def plot_table(tbn, x_col, y_col, kind='line', path=None, points=2000, agg='mean',
+               title='', color=None, edgecolor=None, ylim=None, size=10000):
+    #Charts two columns of a table of any size into an image file, without a display.
+    #Only x and y are read, streamed from an unbuffered cursor in chunks of `size` rows,
+    #and cut down to about `points` points: LTTB for line charts (rows read in x order),
+    #`points` equal-width bins aggregated by `agg` for bar charts. A text x column is
+    #charted as one bar per value, grouped by the database (the `points` largest).
+    import numpy as np
+    import downsample
+    kind=kind.lower()
+    if kind not in ('line', 'bar'):
+        raise ValueError('plot kind must be line or bar')
+    if agg not in downsample.AGGREGATES:
+        raise ValueError('agg must be one of '+', '.join(downsample.AGGREGATES))
+    path=path or tbn+'.png'
+    if os.path.splitext(path)[1].lower() not in PLOT_FORMATS:
+        raise ValueError('plot file must end in '+' or '.join(PLOT_FORMATS))
+    points=max(3, int(points))
+    t0=time.perf_counter()
+    x, y, tb=ident(x_col), ident(y_col), ident(tbn)
+    rows_sql=' from {} where {} is not null and {} is not null'.format(tb, x, y)
+    curobj.execute('select count(*) as n, min({0}) as lo, max({0}) as hi'.format(x)+rows_sql)
+    stats=curobj.fetchone()
+    n, lo, hi=stats['n'], stats['lo'], stats['hi']
+    dates=isinstance(lo, datetime.date)
+    numeric=dates or isinstance(lo, (int, float, decimal.Decimal))
+    def to_float(values):
+        if dates:
+            #matplotlib date numbers: days since 1970-01-01
+            return np.array(values, dtype='datetime64[us]').astype(np.int64)/86400e6
+        return np.array(values, dtype=float)
+    width=0.8
+    if n==0:
+        xs, ys=np.empty(0), np.empty(0)
+    elif not numeric:
+        if kind=='line':
+            raise ValueError('line charts need a numeric or date x column; use bar')
+        fn={'mean': 'avg', 'sum': 'sum', 'min': 'min', 'max': 'max', 'count': 'count'}[agg]
+        curobj.execute('select {0} as x, {1}({2}) as v{3} group by {0} order by v desc limit %s'.format(
+            x, fn, y, rows_sql), (points,))
+        groups=sorted(curobj.fetchall(), key=lambda r: r['x'])
+        xs=[str(r['x']) for r in groups]
+        ys=np.array([r['v'] for r in groups], dtype=float)
+    else:
+        cur=con.cursor(pymysql.cursors.SSCursor)
+        try:
+            cur.execute('select {}, {}'.format(x, y)+rows_sql+(' order by {}'.format(x) if kind=='line' else ''))
+            def chunks():
+                while True:
+                    chunk=cur.fetchmany(size)
+                    if not chunk:
+                        return
+                    cx, cy=zip(*chunk)
+                    yield to_float(cx), np.array(cy, dtype=float)
+            if kind=='line':
+                xs, ys=downsample.lttb(chunks(), n, points)
+            else:
+                flo, fhi=to_float([lo, hi])
+                xs, ys=downsample.binned(chunks(), flo, fhi, points, agg)
+                width=0.9*((fhi-flo)/points or 1)
+        finally:
+            cur.close()
+    render_chart(path, kind, xs, ys, x_col, y_col, title, color, edgecolor, ylim, dates, width)
+    return {'table': tbn, 'rows': n, 'points': len(xs), 'path': path,
+            'seconds': round(time.perf_counter()-t0, 3)}
+def render_chart(path, kind, xs, ys, xlabel, ylabel, title='', color=None, edgecolor=None, ylim=None,
+                 dates=False, width=0.8):
+    #Figure with the Agg canvas rather than pyplot: no display, no GUI backend, no global figure state
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig=Figure(figsize=(10, 5), dpi=100)
+    FigureCanvasAgg(fig)
+    ax=fig.add_subplot()
+    if kind=='bar':
+        ax.bar(xs, ys, width=width, color=color, edgecolor=edgecolor)
+    else:
+        ax.plot(xs, ys, color=color, linewidth=0.8)
+    if dates:
+        ax.xaxis_date()
+        fig.autofmt_xdate()
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if ylim:
+        ax.set_ylim(*ylim)
+    fig.savefig(path)
+#----------------------------------------------------------------------------
+#Script mode: python CRUD.py --script ops.jsonl (or - for stdin)
+#
+#One JSON operation per line; blank lines and lines starting with # are skipped.
+#Every operation runs on the one connection opened for the run, with autocommit
+#off. Writes are committed every --batch rows/statements and at the end, unless
+#the script opens its own transaction with begin ... commit/rollback.
+#Consecutive inserts into the same table with the same columns are sent as one
+#multi-row INSERT. Note that MySQL commits implicitly before and after DDL
+#(create/alter/drop), so a rollback cannot undo those.
+#----------------------------------------------------------------------------
+class ScriptError(Exception):
+    pass
+def where_clause(where):
+    if not where:
+        return '', []
+    return ' where '+' and '.join(ident(k)+'=%s' for k in where), list(where.values())
+def column_def(col):
+    return ' '.join(filter(None, [ident(col['name']), col['type'], col.get('constraint', '')]))
+class Script:
+    def __init__(self, out, batch=500):
+        self.out=out
+        self.batch=max(1, batch)
+        #buffered inserts: [key, sql, rows, first line]; key is (db, table, columns)
+        self.pending=None
+        self.writes=0
+        self.explicit=False
+        self.ops=0
+        self.rows=0
+        self.commits=0
+    def emit(self, records):
+        for rec in records or ():
+            self.out.write(json.dumps(rec, default=str)+'\n')
+    def wrote(self, n):
+        self.rows+=n
+        self.writes+=n
+        if not self.explicit and self.writes>=self.batch:
+            self.commit()
+    def flush(self):
+        if self.pending is None:
+            return
+        key, sql, rows, first=self.pending
+        self.pending=None
+        try:
+            #pymysql rewrites executemany of INSERT ... VALUES into multi-row inserts
+            curobj.executemany(sql, rows)
+        except pymysql.MySQLError as e:
+            raise ScriptError('insert from line {}: {}'.format(first, e))
+        self.wrote(len(rows))
+    def commit(self):
+        self.flush()
+        con.commit()
+        self.commits+=1
+        self.writes=0
+    def run(self, op, lineno):
+        if not isinstance(op, dict) or 'op' not in op:
+            raise ScriptError('expected an object with an "op" key')
+        name=op['op']
+        handler=getattr(self, 'op_'+str(name), None)
+        if handler is None:
+            raise ScriptError('unknown op {!r}'.format(name))
+        if name!='insert' or op.get('database', current_db)!=current_db:
+            self.flush()
+        if op.get('database'):
+            use(op['database'])
+        handler(op, lineno)
+        self.ops+=1
+    def op_use(self, op, lineno):
+        if not op.get('database'):
+            raise ScriptError('use needs "database"')
+    def op_begin(self, op, lineno):
+        if self.explicit:
+            raise ScriptError('begin inside an open transaction')
+        #finish the implicit batch so the explicit transaction holds only its own writes
+        self.commit()
+        con.begin()
+        self.explicit=True
+    def op_commit(self, op, lineno):
+        self.commit()
+        self.explicit=False
+    def op_rollback(self, op, lineno):
+        con.rollback()
+        self.explicit=False
+        self.writes=0
+    def op_create_database(self, op, lineno):
+        curobj.execute('create database if not exists {}'.format(ident(op['name'])))
+    def op_drop_database(self, op, lineno):
+        curobj.execute('drop database if exists {}'.format(ident(op['name'])))
+        global current_db
+        if current_db==op['name']:
+            current_db=None
+    def op_create_table(self, op, lineno):
+        cols=', '.join(column_def(c) for c in op['columns'])
+        curobj.execute('create table if not exists {} ({})'.format(ident(op['table']), cols))
+    def op_drop_table(self, op, lineno):
+        curobj.execute('drop table if exists {}'.format(ident(op['table'])))
+    def op_alter(self, op, lineno):
+        tbn=ident(op['table'])
+        action=op['action']
+        if action=='add':
+            sql='alter table {} add column {}'.format(tbn, column_def(op['column']))
+        elif action=='drop':
+            sql='alter table {} drop column {}'.format(tbn, ident(op['column']))
+        elif action=='modify':
+            sql='alter table {} modify column {}'.format(tbn, column_def(op['column']))
+        elif action=='rename':
+            sql='alter table {} change column {} {}'.format(tbn, ident(op['from']), column_def(op['column']))
+        else:
+            raise ScriptError('alter action must be add, drop, modify or rename')
+        curobj.execute(sql)
+    def op_insert(self, op, lineno):
+        rows=op['rows'] if 'rows' in op else [op['row']]
+        for row in rows:
+            key=(current_db, op['table'], tuple(row))
+            if self.pending is not None and self.pending[0]!=key:
+                self.flush()
+            if self.pending is None:
+                sql='insert into {} ({}) values ({})'.format(
+                    ident(op['table']), ', '.join(ident(c) for c in row), ', '.join(['%s']*len(row)))
+                self.pending=[key, sql, [], lineno]
+            self.pending[2].append(tuple(row.values()))
+            if len(self.pending[2])>=self.batch:
+                self.flush()
+    def op_update(self, op, lineno):
+        if not op.get('set'):
+            raise ScriptError('update needs "set"')
+        where, params=where_clause(op.get('where'))
+        sql='update {} set {}{}'.format(
+            ident(op['table']), ', '.join(ident(k)+'=%s' for k in op['set']), where)
+        logged(current_db, sql, 'script', list(op['set'].values())+params)
+        self.wrote(curobj.rowcount)
+    def op_select(self, op, lineno):
+        cols=', '.join(ident(c) for c in op['columns']) if op.get('columns') else '*'
+        where, params=where_clause(op.get('where'))
+        sql='select {} from {}{}'.format(cols, ident(op['table']), where)
+        if op.get('limit') is not None:
+            sql+=' limit %s'
+            params.append(int(op['limit']))
+        self.emit(logged(current_db, sql, 'script', params))
+    def op_desc(self, op, lineno):
+        curobj.execute('desc {}'.format(ident(op['table'])))
+        self.emit(curobj.fetchall())
+    def op_show_tables(self, op, lineno):
+        curobj.execute('show tables')
+        self.emit(curobj.fetchall())
+    def op_export(self, op, lineno):
+        path=op.get('path') or op['table']+'.csv'
+        rows=export_csv(op['table'], path)
+        self.emit([{'export': op['table'], 'path': path, 'rows': rows}])
+    def op_plot(self, op, lineno):
+        ylim=op.get('ylim')
+        self.emit([plot_table(op['table'], op['x'], op['y'], op.get('kind', 'line'), op.get('path'),
+                              op.get('points', 2000), op.get('agg', 'mean'), op.get('title', ''),
+                              op.get('color'), op.get('edgecolor'), tuple(ylim) if ylim else None)])
+    def op_sql(self, op, lineno):
+        record=logged(current_db, op['sql'], 'script', op.get('params'))
+        if record is not None:
+            self.emit(record)
+        else:
+            self.wrote(max(curobj.rowcount, 0))
+def run_script(lines, out, batch=500, keep_going=False):
+    #returns the exit status: 0, or 1 if any operation failed
+    script=Script(out, batch)
+    failed=0
+    t0=time.perf_counter()
+    def fail(lineno, e):
+        print('line {}: {}'.format(lineno, e), file=sys.stderr)
+        if not keep_going:
+            #undo the uncommitted part of the run, buffered inserts included
+            script.pending=None
+            con.rollback()
+    for lineno, line in enumerate(lines, 1):
+        line=line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            script.run(json.loads(line), lineno)
+        except (ValueError, KeyError, TypeError, ScriptError, pymysql.MySQLError) as e:
+            failed+=1
+            fail(lineno, e if not isinstance(e, KeyError) else 'missing key {}'.format(e))
+            if not keep_going:
+                return 1
+    try:
+        if script.explicit:
+            print('warning: transaction still open at end of script; committing it', file=sys.stderr)
+        script.commit()
+    except (ScriptError, pymysql.MySQLError) as e:
+        failed+=1
+        fail('end', e)
+    print('{} ops, {} rows written, {} commits in {:.2f} s'.format(
+        script.ops, script.rows, script.commits, time.perf_counter()-t0), file=sys.stderr)
+    return 1 if failed else 0
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='SQL Data Management System. Runs the interactive menu unless --script is given.')
+    parser.add_argument('--script', metavar='FILE', help='JSON-lines file of operations to run, or - for stdin')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default=os.getenv('MYSQL_PWD', ''), help='default: $MYSQL_PWD')
+    parser.add_argument('--database', help='database to USE before the first operation')
+    parser.add_argument('--batch', type=int, default=500,
+                        help='rows per multi-row INSERT and writes per implicit commit (default 500)')
+    parser.add_argument('--keep-going', action='store_true', help='report failed operations and carry on')
+    parser.add_argument('--output', help='file for select/desc/show_tables results (default stdout)')
+    args=parser.parse_args(argv)
+    if args.script is None:
+        print("Basic CRUD OPERATION")
+        connect(args.host, args.user, args.password, autocommit=True)
+        try:
+            if args.database:
+                use(args.database)
+            interactive()
+        finally:
+            con.close()
+        return 0
+    connect(args.host, args.user, args.password, autocommit=False)
+    src=sys.stdin if args.script=='-' else open(args.script, encoding='utf-8')
+    out=open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.database:
+            use(args.database)
+        return run_script(src, out, args.batch, args.keep_going)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+        con.close()
+if __name__ == "__main__":
+    sys.exit(main())
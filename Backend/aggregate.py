@@ -0,0 +1,263 @@
+"""Group-by aggregates and histograms for GET .../aggregate.
+
+Charts used to pull whole tables (``SELECT *``) and aggregate client-side.
+An ``AggregateQuery`` asks for count/sum/avg/min/max per group, and/or a
+histogram of one column, over the rows matching ``filters``. Only those
+summaries go over the wire.
+
+sum, avg, min, max and histograms treat values as numbers. When every column
+they use is declared numeric (INTEGER, REAL...), the database computes them
+(``pushdown``): ``sql.aggregate_sql`` and ``sql.histogram_sql``. Otherwise,
+e.g. the TEXT columns ``/submit`` creates, SQL would quietly count
+non-numeric strings as 0. ``compute`` then aggregates a scan of just the
+needed columns, chunk by chunk, with NumPy. Values that are not numbers are
+skipped there, as NULLs are in SQL. A histogram takes two scans there: the
+first reads only its column to find the range (``value_range``), so the
+second can count buckets chunk by chunk instead of keeping every value.
+"""
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .row_query import InvalidQuery, check_columns, coerce
+
+FUNCS = ("count", "sum", "avg", "min", "max")
+NUMERIC_FUNCS = ("sum", "avg", "min", "max")
+
+
+def is_numeric(ctype: str) -> bool:
+    t = ctype.upper()
+    return any(k in t for k in ("INT", "REAL", "FLOA", "DOUB", "DEC", "NUM"))
+
+
+def label(fn: str, col: Optional[str]) -> str:
+    return fn if col is None else f"{fn}_{col.lower()}"
+
+
+def parse_metrics(text: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+    """``count,sum:age,avg:age`` -> [("count", None), ("sum", "age"), ("avg", "age")]."""
+    metrics = []
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        fn, _, col = part.partition(":")
+        if fn not in FUNCS:
+            raise InvalidQuery(f"unknown metric {fn!r}; expected one of {', '.join(FUNCS)}")
+        if fn != "count" and not col:
+            raise InvalidQuery(f"{fn} needs a column, e.g. {fn}:age")
+        metrics.append((fn, col or None))
+    return metrics
+
+
+class AggregateQuery:
+    __slots__ = ("group_by", "metrics", "filters", "histogram", "bins", "limit", "pushdown")
+
+    def __init__(self, group_by, metrics, filters, histogram, bins, limit, pushdown):
+        self.group_by: Tuple[str, ...] = group_by
+        self.metrics: Tuple[Tuple[str, Optional[str]], ...] = metrics
+        self.filters: Tuple[Tuple[str, str, Tuple[Any, ...]], ...] = filters
+        self.histogram: Optional[str] = histogram
+        self.bins = bins
+        self.limit = limit
+        self.pushdown = pushdown
+
+    def filter_shape(self) -> tuple:
+        return tuple((col, op, len(values)) for col, op, values in self.filters)
+
+    def filter_params(self) -> List[Any]:
+        return [v for _, _, values in self.filters for v in values]
+
+    def scan_columns(self) -> Tuple[str, ...]:
+        """Columns the NumPy path reads: group columns, metric columns, histogram column."""
+        cols = list(self.group_by) + [c for _, c in self.metrics if c] + ([self.histogram] if self.histogram else [])
+        seen = set()
+        return tuple(c for c in cols if not (c.lower() in seen or seen.add(c.lower())))
+
+    def key(self) -> tuple:
+        return (self.group_by, self.metrics, self.filter_shape(), tuple(self.filter_params()),
+                self.histogram, self.bins, self.limit)
+
+
+def build(
+    columns: Dict[str, str],
+    group_by: List[str],
+    metrics: List[Tuple[str, Optional[str]]],
+    filters: List[Tuple[str, str, List[Any]]],
+    histogram: Optional[str],
+    bins: int,
+    limit: int,
+) -> AggregateQuery:
+    """Validate against ``columns`` (lower-cased name -> declared type) and decide on pushdown."""
+    if not metrics and histogram is None:
+        metrics = [("count", None)]
+    names = list(group_by) + [c for _, c in metrics if c] + [c for c, _, _ in filters]
+    check_columns(columns, names + ([histogram] if histogram else []))
+    numeric_cols = [c for fn, c in metrics if fn in NUMERIC_FUNCS] + ([histogram] if histogram else [])
+    pushdown = all(is_numeric(columns[c.lower()]) for c in numeric_cols)
+    typed = tuple((c, op, tuple(coerce(v, columns[c.lower()]) for v in vs)) for c, op, vs in filters)
+    return AggregateQuery(tuple(group_by), tuple(metrics), typed, histogram, bins, limit, pushdown)
+
+
+def histogram_edges(lo: float, hi: float, bins: int) -> Tuple[float, List[float]]:
+    """Bucket width and the ``bins + 1`` edges; the last bucket includes ``hi``, as in numpy.histogram."""
+    width = (hi - lo) / bins if hi > lo else 1.0
+    return width, [lo + i * width for i in range(bins)] + [hi if hi > lo else lo + width * bins]
+
+
+def histogram_result(column: str, bins: int, counts: Optional[List[int]], lo, hi) -> Dict[str, Any]:
+    """``counts`` per bucket between ``lo`` and ``hi``; None when no value was a number."""
+    if counts is None:
+        return {"column": column, "edges": [], "counts": []}
+    return {"column": column, "edges": histogram_edges(lo, hi, bins)[1], "counts": counts}
+
+
+def sql_result(query: "AggregateQuery", groups, hist) -> Dict[str, Any]:
+    """Shape pushed-down results: ``groups`` rows from aggregate_sql, ``hist`` = (lo, hi, bucket rows) or None."""
+    result: Dict[str, Any] = {"engine": "sql"}
+    if query.metrics:
+        names = list(query.group_by) + [label(fn, col) for fn, col in query.metrics]
+        result["groups"] = [
+            {k: float(v) if isinstance(v, Decimal) else v for k, v in zip(names, row)} for row in groups
+        ]
+    if query.histogram:
+        counts = None
+        if hist is not None:
+            lo, hi, rows = hist
+            counts = [0] * query.bins
+            for b, n in rows:
+                counts[min(int(b), query.bins - 1)] += n
+            lo, hi = float(lo), float(hi)
+        result["histogram"] = histogram_result(query.histogram, query.bins, counts, *(
+            (lo, hi) if counts is not None else (None, None)))
+    return result
+
+
+def _sort_key(key: tuple):
+    # NULLs first, as in SQL; mixed types fall back to their text
+    return tuple((v is not None, v if isinstance(v, (int, float)) else 0, "" if v is None else str(v)) for v in key)
+
+
+def _numbers(np, values: Sequence[Any]):
+    """A float array of ``values``, NaN where a value is NULL or not a number."""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        def num(v):
+            try:
+                return float(v)
+            except (TypeError, ValueError):
+                return np.nan
+        return np.fromiter((num(v) for v in values), dtype=float, count=len(values))
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("aggregating non-numeric columns requires the numpy package")
+    return np
+
+
+def value_range(chunks: Iterable[Sequence[tuple]]) -> Optional[Tuple[float, float]]:
+    """(min, max) of the numbers in the first column of ``chunks``; None if there are none."""
+    np = _numpy()
+    lo, hi = np.inf, -np.inf
+    for chunk in chunks:
+        if not chunk:
+            continue
+        values = _numbers(np, [row[0] for row in chunk])
+        values = values[~np.isnan(values)]
+        if len(values):
+            lo, hi = min(lo, values.min()), max(hi, values.max())
+    return (float(lo), float(hi)) if lo <= hi else None
+
+
+def compute(
+    columns: List[str], chunks: Iterable[Sequence[tuple]], query: AggregateQuery,
+    hist_range: Optional[Tuple[float, float]] = None,
+) -> Dict[str, Any]:
+    """The NumPy path: aggregate ``chunks`` of rows holding ``query.scan_columns()``.
+
+    ``hist_range`` is ``value_range`` of the histogram column over the same
+    rows, from a first scan; None when it held no numbers.
+    """
+    np = _numpy()
+
+    pos = {c.lower(): i for i, c in enumerate(columns)}
+    gpos = [pos[c.lower()] for c in query.group_by]
+    groups: Dict[tuple, int] = {}
+    count = np.zeros(0)
+    # per metric: values seen, sum, min, max
+    acc = [[np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0)] for _ in query.metrics]
+    hist = None
+    if query.histogram and hist_range is not None:
+        lo, hi = hist_range
+        width, _ = histogram_edges(lo, hi, query.bins)
+        hist = np.zeros(query.bins, dtype=np.int64)
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        cols = list(zip(*chunk))
+        if gpos:
+            codes = np.fromiter(
+                (groups.setdefault(k, len(groups)) for k in zip(*(cols[i] for i in gpos))),
+                dtype=np.intp, count=len(chunk),
+            )
+        else:
+            groups.setdefault((), 0)
+            codes = np.zeros(len(chunk), dtype=np.intp)
+        n = len(groups)
+        grow = n - len(count)
+        if grow:
+            count = np.concatenate([count, np.zeros(grow)])
+            for a in acc:
+                a[0] = np.concatenate([a[0], np.zeros(grow)])
+                a[1] = np.concatenate([a[1], np.zeros(grow)])
+                a[2] = np.concatenate([a[2], np.full(grow, np.inf)])
+                a[3] = np.concatenate([a[3], np.full(grow, -np.inf)])
+        count += np.bincount(codes, minlength=n)
+        for (fn, col), a in zip(query.metrics, acc):
+            if col is None:
+                continue
+            raw = cols[pos[col.lower()]]
+            if fn == "count":
+                present = np.fromiter((v is not None for v in raw), dtype=bool, count=len(raw))
+                a[0] += np.bincount(codes[present], minlength=n)
+                continue
+            values = _numbers(np, raw)
+            ok = ~np.isnan(values)
+            c, v = codes[ok], values[ok]
+            a[0] += np.bincount(c, minlength=n)
+            a[1] += np.bincount(c, weights=v, minlength=n)
+            np.minimum.at(a[2], c, v)
+            np.maximum.at(a[3], c, v)
+        if hist is not None:
+            values = _numbers(np, cols[pos[query.histogram.lower()]])
+            values = values[~np.isnan(values)]
+            # clipped: a row written between the two scans may fall outside the range
+            buckets = np.clip(((values - lo) / width).astype(np.intp), 0, query.bins - 1)
+            hist += np.bincount(buckets, minlength=query.bins)
+
+    result: Dict[str, Any] = {"engine": "numpy"}
+    if query.metrics:
+        rows = []
+        for key, g in sorted(groups.items(), key=lambda kv: _sort_key(kv[0]))[:query.limit]:
+            row = dict(zip(query.group_by, key))
+            for (fn, col), a in zip(query.metrics, acc):
+                seen = a[0][g]
+                if fn == "count":
+                    row[label(fn, col)] = int(count[g] if col is None else seen)
+                elif not seen:
+                    row[label(fn, col)] = None
+                else:
+                    value = {"sum": a[1][g], "avg": a[1][g] / seen, "min": a[2][g], "max": a[3][g]}[fn]
+                    row[label(fn, col)] = float(value)
+            rows.append(row)
+        if not query.group_by and not rows:
+            rows = [{label(fn, col): (0 if fn == "count" else None) for fn, col in query.metrics}]
+        result["groups"] = rows
+    if query.histogram:
+        counts = hist.tolist() if hist is not None else None
+        result["histogram"] = histogram_result(query.histogram, query.bins, counts, *(hist_range or (None, None)))
+    return result
@@ -0,0 +1,40 @@
+"""Run blocking database calls without blocking the event loop.
+
+sqlite3 and pymysql are blocking drivers. The API's endpoints are
+``async def`` and hand every database call to ``run_db``, which runs it on
+a dedicated thread pool. That pool is separate from Starlette's shared
+threadpool, so a burst of slow queries cannot starve other sync work, and
+its size is tuned with DB_THREADS. SQLite writes go to the per-form writer
+threads instead (see sqlite_writer) and are awaited through their futures.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator
+
+DB_THREADS = int(os.getenv("DB_THREADS", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+_DONE = object()
+
+
+async def run_db(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def iterate_db(it: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Drive a blocking iterator (e.g. a cursor-backed export) from the DB pool."""
+    try:
+        while True:
+            chunk = await run_db(next, it, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            await run_db(close)
+
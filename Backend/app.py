@@ -1,7 +1,13 @@
 from flask import Flask, request, jsonify
 import mysql.connector
+from mysql.connector import errorcode
+
+import metrics
+import mysql_pool
 
 app = Flask(__name__)
+# per-route latency, response bytes and DB timings at GET /metrics
+metrics.instrument_flask(app, "auth")
 
 # MySQL Database Configuration
 DB_CONFIG = {
@@ -11,15 +17,26 @@ DB_CONFIG = {
     "database": "hackathon"  # Replace with your database name
 }
 
-# Test Database Connection
+# Test Database Connection (opens the shared pool so requests start warm)
 def test_db_connection():
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        conn.close()
+        mysql_pool.warm(DB_CONFIG)
         print("Database connection successful!")
     except mysql.connector.Error as err:
         print(f"Error: {err}")
 
+# /login looks users up by email; without an index that is a full table scan.
+# Run at startup (below), not on import: it is DDL and needs the database up.
+def ensure_indexes():
+    try:
+        mysql_pool.ensure_index(DB_CONFIG, "login", "ix_login_email", ["email"])
+    except mysql.connector.Error as err:
+        # another process created it between the check and the CREATE
+        if err.errno != errorcode.ER_DUP_KEYNAME:
+            print(f"Could not create login email index: {err}")
+    except mysql_pool.PoolExhausted as err:
+        print(f"Could not create login email index: {err}")
+
 # Test the connection on startup
 test_db_connection()
 
@@ -35,17 +52,19 @@ def signup():
         return jsonify({"error": "Email and password are required"}), 400
 
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO signup (name, email, phone, password) VALUES (%s, %s, %s, %s)",
-            (name, email, phone, password),
-        )
-        conn.commit()
-        conn.close()
+        with mysql_pool.connection(DB_CONFIG) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO signup (name, email, phone, password) VALUES (%s, %s, %s, %s)",
+                (name, email, phone, password),
+            )
+            conn.commit()
+            cursor.close()
         return jsonify({"message": "User signed up successfully"}), 201
     except mysql.connector.IntegrityError:
         return jsonify({"error": "User with this email already exists"}), 409
+    except mysql_pool.PoolExhausted as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -59,11 +78,11 @@ def login():
         return jsonify({"error": "Email and password are required"}), 400
 
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, email, phone FROM login WHERE email = %s AND password = %s", (email, password))
-        user = cursor.fetchone()
-        conn.close()
+        with mysql_pool.connection(DB_CONFIG) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, name, email, phone FROM login WHERE email = %s AND password = %s", (email, password))
+            user = cursor.fetchone()
+            cursor.close()
 
         if user:
             return jsonify({"message": "Login successful", "user": {
@@ -71,8 +90,11 @@ def login():
             }}), 200
         else:
             return jsonify({"error": "Invalid credentials"}), 401
+    except mysql_pool.PoolExhausted as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    ensure_indexes()
+    app.run(debug=True)
@@ -0,0 +1,56 @@
+"""Row throughput: one POST per row versus the bulk endpoint.
+
+Runs in-process against the SQLite backend through FastAPI's TestClient, so
+it measures the service rather than the network.
+
+    python Backend/bench/bulk_insert.py --rows 5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--batch", type=int, default=1000, help="rows per bulk request")
+    args = ap.parse_args()
+
+    os.environ["FORM_DB_DIR"] = tempfile.mkdtemp(prefix="bench_bulk_")
+    from fastapi.testclient import TestClient
+    from Backend import api
+
+    client = TestClient(api.app)
+    rows = [{"name": f"user{i}", "email": f"user{i}@example.com", "score": i} for i in range(args.rows)]
+    columns = [{"name": "name"}, {"name": "email"}, {"name": "score", "type": "INTEGER"}]
+
+    def setup(form):
+        client.post("/forms", json={"form_name": form})
+        client.post(f"/forms/{form}/tables", json={"table": "t", "columns": columns})
+
+    setup("single")
+    t0 = time.perf_counter()
+    for row in rows:
+        client.post("/forms/single/tables/t/rows", json={"row": row})
+    single = time.perf_counter() - t0
+
+    setup("bulk")
+    t0 = time.perf_counter()
+    for start in range(0, len(rows), args.batch):
+        body = "\n".join(json.dumps(r) for r in rows[start:start + args.batch])
+        r = client.post("/forms/bulk/tables/t/rows/bulk", content=body,
+                        headers={"content-type": "application/x-ndjson"})
+        assert r.json()["inserted"] == len(rows[start:start + args.batch]), r.text
+    bulk = time.perf_counter() - t0
+
+    print(f"single-row: {args.rows / single:10.0f} rows/s")
+    print(f"bulk:       {args.rows / bulk:10.0f} rows/s  ({single / bulk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Event-loop responsiveness under database load.
+
+Starts the API under uvicorn (or uses --url), then keeps --clients concurrent
+clients busy on /submit and on list_rows while a probe polls GET /health. If
+database work blocked the event loop, the probe latency would track the
+database latency; with every call offloaded it stays near the bare round trip.
+
+    python Backend/bench/event_loop.py --clients 1000 --seconds 10
+    python Backend/bench/event_loop.py --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(client, url, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url + "/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+async def run(url, clients, seconds):
+    import httpx
+
+    limits = httpx.Limits(max_connections=clients + 1, max_keepalive_connections=clients + 1)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        await wait_ready(client, url)
+        await client.post(url + "/forms", json={"form_name": "loop"})
+        await client.post(url + "/submit", json={"form_name": "loop", "fields": {"name": "seed", "email": "seed@example.com"}})
+        stop = time.monotonic() + seconds
+        counts = {"submit": 0, "list": 0, "errors": 0}
+        probes = []
+
+        async def worker(i):
+            n = 0
+            while time.monotonic() < stop:
+                n += 1
+                try:
+                    if i % 2:
+                        r = await client.post(url + "/submit", json={
+                            "form_name": "loop", "fields": {"name": f"u{i}-{n}", "email": f"u{i}@example.com"},
+                        })
+                        kind = "submit"
+                    else:
+                        r = await client.get(url + "/forms/loop/tables/submissions/rows", params={"limit": 50})
+                        kind = "list"
+                    counts[kind if r.status_code == 200 else "errors"] += 1
+                except Exception:
+                    counts["errors"] += 1
+
+        async def probe():
+            while time.monotonic() < stop:
+                t0 = time.perf_counter()
+                await client.get(url + "/health")
+                probes.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(probe(), *(worker(i) for i in range(clients)))
+
+    print(f"clients: {clients}  duration: {seconds}s")
+    print(f"submit: {counts['submit'] / seconds:8.0f} req/s   list_rows: {counts['list'] / seconds:8.0f} req/s"
+          f"   errors: {counts['errors']}")
+    print(f"/health probe: n={len(probes)}  p50={percentile(probes, 50) * 1000:.1f} ms"
+          f"  p99={percentile(probes, 99) * 1000:.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=1000)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--url", help="drive an already running server instead of starting one")
+    args = ap.parse_args()
+
+    if args.url:
+        asyncio.run(run(args.url.rstrip("/"), args.clients, args.seconds))
+        return
+
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT, FORM_DB_DIR=tempfile.mkdtemp(prefix="bench_loop_"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "Backend.api:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        asyncio.run(run(f"http://127.0.0.1:{port}", args.clients, args.seconds))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Login throughput: connect-per-request versus the shared pool.
+
+Runs the /login query from several threads for a fixed time, first opening a
+fresh mysql.connector connection per request (the old code path), then
+borrowing from mysql_pool. With --url the real Flask endpoint is driven over
+HTTP instead, so run it once against the old build and once against this one.
+
+    python Backend/bench/login_load.py --threads 16 --seconds 10
+    python Backend/bench/login_load.py --url http://127.0.0.1:5000/login
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOGIN_SQL = "SELECT id, name, email, phone FROM login WHERE email = %s AND password = %s"
+
+
+def run(worker, threads, seconds):
+    latencies = []
+    errors = [0]
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+
+    def loop():
+        local = []
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            try:
+                worker()
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    ts = [threading.Thread(target=loop) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    latencies.sort()
+    n = len(latencies)
+
+    def pct(p):
+        return latencies[min(n - 1, int(n * p))] * 1000 if n else 0.0
+
+    return {
+        "requests": n,
+        "errors": errors[0],
+        "rps": round(n / seconds, 1),
+        "p50_ms": round(pct(0.50), 3),
+        "p99_ms": round(pct(0.99), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="localhost")
+    ap.add_argument("--user", default="root")
+    ap.add_argument("--password", default="")
+    ap.add_argument("--database", default="hackthone_db")
+    ap.add_argument("--email", default="bench@example.com")
+    ap.add_argument("--login-password", default="bench")
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--url", help="drive a running Flask app's /login endpoint instead of the database")
+    args = ap.parse_args()
+
+    creds = (args.email, args.login_password)
+
+    if args.url:
+        import httpx
+
+        local = threading.local()
+
+        def http_login():
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = httpx.Client()
+            r = client.post(args.url, json={"email": creds[0], "password": creds[1]})
+            if r.status_code >= 500:
+                raise RuntimeError(r.text)
+
+        print("http", run(http_login, args.threads, args.seconds))
+        return
+
+    import mysql.connector
+    import mysql_pool
+
+    config = {"host": args.host, "user": args.user, "password": args.password, "database": args.database}
+
+    def connect_per_request():
+        conn = mysql.connector.connect(**config)
+        cursor = conn.cursor()
+        cursor.execute(LOGIN_SQL, creds)
+        cursor.fetchone()
+        conn.close()
+
+    def pooled():
+        with mysql_pool.connection(config) as conn:
+            cursor = conn.cursor()
+            cursor.execute(LOGIN_SQL, creds)
+            cursor.fetchone()
+            cursor.close()
+
+    print("connect-per-request", run(connect_per_request, args.threads, args.seconds))
+    mysql_pool.warm(config, size=args.threads)
+    print("pooled             ", run(pooled, args.threads, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
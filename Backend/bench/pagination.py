@@ -0,0 +1,64 @@
+"""Deep-page cost: OFFSET paging versus the keyset cursor on list_rows.
+
+Builds a SQLite form table with --rows rows (a few million by default), then
+times fetching pages at increasing depth both ways. OFFSET cost grows with
+depth; keyset pages cost the same everywhere.
+
+    python Backend/bench/pagination.py --rows 3000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=3_000_000)
+    ap.add_argument("--limit", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    os.environ["FORM_DB_DIR"] = tempfile.mkdtemp(prefix="bench_page_")
+    from fastapi.testclient import TestClient
+    from Backend import api
+
+    client = TestClient(api.app)
+    client.post("/forms", json={"form_name": "page"})
+    client.post("/forms/page/tables", json={"table": "t", "columns": [{"name": "payload"}]})
+
+    conn = sqlite3.connect(api.store.path("page"))
+    batch = 100_000
+    for start in range(0, args.rows, batch):
+        n = min(batch, args.rows - start)
+        conn.executemany("INSERT INTO t (payload) VALUES (?)", (("x" * 32,) for _ in range(n)))
+    conn.commit()
+    conn.close()
+
+    print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+    for depth in (0, args.rows // 100, args.rows // 10, args.rows // 2, args.rows - args.limit):
+        # OFFSET paging, as a client raising limit/offset would have to do
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            with api.sqlite_pool.connection(api.store.path("page")) as c:
+                c.execute("SELECT * FROM t ORDER BY id DESC LIMIT ? OFFSET ?", (args.limit, depth)).fetchall()
+        offset_ms = (time.perf_counter() - t0) / args.repeat * 1000
+
+        # the statement list_rows issues for ?before_id=
+        before_id = args.rows - depth + 1
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            with api.sqlite_pool.connection(api.store.path("page")) as c:
+                c.execute("SELECT * FROM t WHERE id < ? ORDER BY id DESC LIMIT ?", (before_id, args.limit + 1)).fetchall()
+        keyset_ms = (time.perf_counter() - t0) / args.repeat * 1000
+        r = client.get("/forms/page/tables/t/rows", params={"limit": args.limit, "before_id": before_id})
+        assert len(r.json()["rows"]) == args.limit
+        print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Throughput of ``python -m Backend.serve`` at 1, 2, 4 and 8 workers.
+
+For each worker count a fresh server is started on an empty data directory.
+Several load-generator processes then run concurrent httpx clients against
+--forms forms for --seconds: half /submit writes, half list_rows reads. The
+table shows requests/s and the speed-up over one worker. Scaling is bounded
+by the machine's cores, which the load generators share with the server.
+
+    python Backend/bench/scaling.py --workers 1 2 4 8 --seconds 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 60.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+async def _load(url, forms, clients, seconds, seed):
+    import httpx
+
+    stop = time.monotonic() + seconds
+    done = [0, 0]  # ok, errors
+
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=httpx.Limits(max_connections=clients)) as client:
+        async def worker(i):
+            n = 0
+            while time.monotonic() < stop:
+                n += 1
+                form = forms[(seed * 7919 + i * 31 + n) % len(forms)]
+                try:
+                    if n % 2:
+                        r = await client.post("/submit", json={"form_name": form, "fields": {"name": f"u{i}", "n": n}})
+                    else:
+                        r = await client.get(f"/forms/{form}/tables/submissions/rows", params={"limit": 20})
+                    done[0 if r.status_code == 200 else 1] += 1
+                except httpx.HTTPError:
+                    done[1] += 1
+
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+    return done
+
+
+def load_proc(args):
+    return asyncio.run(_load(*args))
+
+
+def run_once(workers, args):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PYTHONPATH=ROOT, FORM_DB_DIR=tempfile.mkdtemp(prefix="bench_scale_"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "Backend.serve", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+    )
+    try:
+        wait_ready(url)
+        import httpx
+
+        forms = [f"form{i}" for i in range(args.forms)]
+        for form in forms:
+            # creates the submissions table so reads never 404
+            httpx.post(url + "/submit", json={"form_name": form, "fields": {"name": "seed", "n": 0}})
+        with multiprocessing.Pool(args.procs) as pool:
+            t0 = time.perf_counter()
+            results = pool.map(load_proc, [(url, forms, args.clients, args.seconds, p) for p in range(args.procs)])
+            elapsed = time.perf_counter() - t0
+        ok = sum(r[0] for r in results)
+        errors = sum(r[1] for r in results)
+        return ok / elapsed, errors
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--forms", type=int, default=64)
+    ap.add_argument("--procs", type=int, default=4, help="load-generator processes")
+    ap.add_argument("--clients", type=int, default=64, help="concurrent clients per load process")
+    ap.add_argument("--seconds", type=float, default=10)
+    args = ap.parse_args()
+
+    print(f"cores: {os.cpu_count()}  forms: {args.forms}  clients: {args.procs}x{args.clients}")
+    print(f"{'workers':>8} {'req/s':>10} {'speed-up':>9} {'errors':>7}")
+    base = None
+    for n in args.workers:
+        rps, errors = run_once(n, args)
+        base = base or rps
+        print(f"{n:>8} {rps:>10.0f} {rps / base:>8.2f}x {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
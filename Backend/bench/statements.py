@@ -0,0 +1,79 @@
+"""Statement build + execute cost: per-call f-strings versus the sql.py cache.
+
+Builds an INSERT for a rotating set of tables (forms x tables, each with a few
+columns), the way insert_row does, and executes it on an in-memory SQLite
+connection. Three variants:
+
+  fstring   - rebuild and re-sanitize the text every call (the old code)
+  cached    - sql.insert_sql, with sqlite3's default 128-statement cache
+  cached+   - sql.insert_sql, with cached_statements raised (StorageProfile)
+
+With more distinct statements than the connection caches, sqlite3 re-prepares
+on every call; that is what the larger cached_statements avoids.
+
+    python Backend/bench/statements.py --tables 200 --calls 200000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def sanitize(name):
+    return ''.join(ch for ch in name if ch.isalnum() or ch == '_')
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tables", type=int, default=200)
+    ap.add_argument("--calls", type=int, default=200_000)
+    ap.add_argument("--cached-statements", type=int, default=1024)
+    args = ap.parse_args()
+
+    from Backend.sql import insert_sql
+
+    cols = ("name", "email", "phone", "note")
+    tables = [f"t{i}" for i in range(args.tables)]
+    row = ["n", "e@example.com", "555", "x"]
+
+    def setup(cache_size):
+        conn = sqlite3.connect(":memory:", cached_statements=cache_size)
+        for t in tables:
+            conn.execute(f"CREATE TABLE {t} (id INTEGER PRIMARY KEY, {', '.join(c + ' TEXT' for c in cols)})")
+        return conn
+
+    def fstring(table):
+        keys = [sanitize(k) for k in cols]
+        return f"INSERT INTO {table} ({','.join(keys)}) VALUES ({','.join('?' for _ in keys)})"
+
+    def cached(table):
+        return insert_sql("sqlite", table, cols)
+
+    print(f"{args.tables} tables, {args.calls} calls")
+    print(f"{'variant':>10} {'build us':>10} {'build+exec us':>14}")
+    for name, build, cache_size in (
+        ("fstring", fstring, 128),
+        ("cached", cached, 128),
+        ("cached+", cached, args.cached_statements),
+    ):
+        t0 = time.perf_counter()
+        for i in range(args.calls):
+            build(tables[i % len(tables)])
+        build_us = (time.perf_counter() - t0) / args.calls * 1e6
+
+        conn = setup(cache_size)
+        conn.execute("BEGIN")
+        t0 = time.perf_counter()
+        for i in range(args.calls):
+            conn.execute(build(tables[i % len(tables)]), row)
+        total_us = (time.perf_counter() - t0) / args.calls * 1e6
+        conn.rollback()
+        conn.close()
+        print(f"{name:>10} {build_us:>10.2f} {total_us:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Downsampling for charts of tables too big to draw point by point.
+
+Both functions take an iterable of ``(x, y)`` numpy chunks in row order, so
+a table can be streamed from a cursor. Memory stays bounded by the chunk size
+and the output size, however many rows go through.
+
+* ``lttb`` is Largest-Triangle-Three-Buckets, for line charts. It splits the
+  rows into ``points - 2`` buckets and keeps one point per bucket: the one
+  that forms the largest triangle with the point kept before it and the
+  average of the next bucket. Peaks and the overall shape survive, unlike
+  with every-nth sampling. The rows must be sorted by x, and their count is
+  needed up front to size the buckets.
+* ``binned`` is fixed-width binning of x over ``[lo, hi]`` for bar charts,
+  with the y values of each bin aggregated (mean, sum, min, max or count).
+
+numpy only; importable as ``downsample`` (CRUD.py) and ``Backend.downsample``.
+"""
+from typing import Iterable, Tuple
+
+import numpy as np
+
+Chunk = Tuple[np.ndarray, np.ndarray]
+
+AGGREGATES = ("mean", "sum", "min", "max", "count")
+
+
+def lttb(chunks: Iterable[Chunk], n: int, points: int) -> Chunk:
+    """At most ``points`` (x, y) of the ``n`` streamed rows, chosen by LTTB.
+
+    ``n`` may be stale (rows added or removed since it was counted): rows
+    past ``n`` are ignored, and a short stream ends the output early, with
+    the last row read as its final point.
+    """
+    if points < 3:
+        raise ValueError("lttb needs at least 3 points")
+    it = iter(chunks)
+    if n <= points:
+        # nothing to drop; this is at most ``points`` rows
+        parts = [(np.asarray(x, float), np.asarray(y, float)) for x, y in it]
+        if not parts:
+            return np.empty(0), np.empty(0)
+        return np.concatenate([p[0] for p in parts])[:n], np.concatenate([p[1] for p in parts])[:n]
+
+    buf_x = np.empty(0)
+    buf_y = np.empty(0)
+    start = 0  # row index of buf_x[0]
+    exhausted = False
+    tail = None  # (row index, x, y) of the last row read that is below n
+
+    def fill(upto: int) -> int:
+        # read chunks until the buffer reaches row ``upto`` (or the rows run out); returns its end
+        nonlocal buf_x, buf_y, exhausted, tail
+        xs, ys = [buf_x], [buf_y]
+        end = start + len(buf_x)
+        while end < upto and not exhausted:
+            try:
+                x, y = next(it)
+            except StopIteration:
+                exhausted = True
+                break
+            xs.append(np.asarray(x, float))
+            ys.append(np.asarray(y, float))
+            first, end = end, end + len(xs[-1])
+            if first < end and first < n:
+                last = min(n, end) - 1
+                tail = (last, xs[-1][last - first], ys[-1][last - first])
+        if len(xs) > 1:
+            buf_x, buf_y = np.concatenate(xs), np.concatenate(ys)
+        return end
+
+    if fill(1) == 0:
+        return np.empty(0), np.empty(0)
+    out_x, out_y = [buf_x[0]], [buf_y[0]]
+    ax, ay = buf_x[0], buf_y[0]
+    picked = 0  # row index of the last point kept
+    every = (n - 2) / (points - 2)
+    for k in range(points - 2):
+        lo, hi = int(k * every) + 1, int((k + 1) * every) + 1
+        # the next bucket; after the last one it is the final row
+        nxt = n if k == points - 3 else int((k + 2) * every) + 1
+        end = fill(nxt)
+        hi, nxt = min(hi, end), min(nxt, end)
+        if lo >= hi:
+            break
+        if nxt > hi:
+            cx = buf_x[hi - start:nxt - start].mean()
+            cy = buf_y[hi - start:nxt - start].mean()
+        else:
+            cx, cy = buf_x[hi - 1 - start], buf_y[hi - 1 - start]
+        bx, by = buf_x[lo - start:hi - start], buf_y[lo - start:hi - start]
+        # twice the triangle areas; only their order matters
+        i = int(np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay)).argmax())
+        ax, ay = bx[i], by[i]
+        picked = lo + i
+        out_x.append(ax)
+        out_y.append(ay)
+        buf_x, buf_y = buf_x[hi - start:], buf_y[hi - start:]
+        start = hi
+    # the final row: row n - 1, or the last one read if the stream ran short
+    fill(n)
+    if tail is not None and tail[0] > picked:
+        out_x.append(tail[1])
+        out_y.append(tail[2])
+    return np.array(out_x), np.array(out_y)
+
+
+def binned(chunks: Iterable[Chunk], lo: float, hi: float, bins: int, agg: str = "mean") -> Chunk:
+    """(bin centres, aggregated y) over ``bins`` equal-width bins of x in [lo, hi]; empty bins are left out."""
+    if agg not in AGGREGATES:
+        raise ValueError(f"agg must be one of {', '.join(AGGREGATES)}")
+    bins = max(1, bins)
+    width = (hi - lo) / bins or 1.0
+    counts = np.zeros(bins, np.int64)
+    sums = np.zeros(bins)
+    if agg == "min":
+        acc = np.full(bins, np.inf)
+    elif agg == "max":
+        acc = np.full(bins, -np.inf)
+    for x, y in chunks:
+        x = np.asarray(x, float)
+        y = np.asarray(y, float)
+        idx = np.clip(((x - lo) / width).astype(np.int64), 0, bins - 1)
+        counts += np.bincount(idx, minlength=bins)
+        if agg in ("mean", "sum"):
+            sums += np.bincount(idx, weights=y, minlength=bins)
+        elif agg == "min":
+            np.minimum.at(acc, idx, y)
+        elif agg == "max":
+            np.maximum.at(acc, idx, y)
+    if agg == "mean":
+        values = sums / np.maximum(counts, 1)
+    elif agg == "sum":
+        values = sums
+    elif agg == "count":
+        values = counts.astype(float)
+    else:
+        values = acc
+    keep = counts > 0
+    centres = lo + width * (np.arange(bins) + 0.5)
+    return centres[keep], values[keep]
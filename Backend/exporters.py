@@ -0,0 +1,297 @@
+"""Streaming encoders for table exports.
+
+Each encoder takes the column names and an iterator of row chunks (lists of
+tuples, as returned by ``cursor.fetchmany``) and yields encoded bytes, so an
+export never holds more than one chunk in memory. Parquet and Arrow need the
+optional ``pyarrow`` package, and the declared column types: their schema is
+fixed before the first row is read, because the file header is sent first.
+"""
+import csv
+import datetime
+import decimal
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+# formats whose schema comes from the declared column types
+ARROW_FORMATS = ("parquet", "arrow")
+
+# format name -> (media type, file extension)
+FORMATS = {
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+_ACCEPT = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonlines": "ndjson",
+    "text/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+
+
+def negotiate(fmt, accept) -> str:
+    """Pick an export format from an explicit ``format`` parameter or the Accept header.
+
+    Raises ValueError for an unknown explicit format; an Accept header with
+    nothing we can produce falls back to JSON.
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}")
+        return fmt
+    for part in (accept or "").split(","):
+        media = part.split(";")[0].strip().lower()
+        if media in _ACCEPT:
+            return _ACCEPT[media]
+    return "json"
+
+
+def json_default(value: Any):
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
+    return str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=json_default)
+
+
+def encode_json(columns: List[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """Same document shape as the old export: {"columns": [...], "rows": [[...], ...]}."""
+    yield ('{"columns": ' + _dumps(columns) + ', "rows": [').encode()
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = ", ".join(_dumps(list(r)) for r in chunk)
+        yield (body if first else ", " + body).encode()
+        first = False
+    yield b"]}"
+
+
+def encode_ndjson(columns: List[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        if chunk:
+            yield "".join(_dumps(dict(zip(columns, r))) + "\n" for r in chunk).encode()
+
+
+def encode_csv(columns: List[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        if buf.tell():
+            yield buf.getvalue().encode()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file object whose contents are taken out after every batch."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._parts.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def take(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def arrow_type(ctype: str):
+    """The Arrow type for a declared column type, after SQLite's affinity rules (MariaDB types too)."""
+    import pyarrow as pa
+
+    t = (ctype or "").upper().split("(")[0].strip()
+    if "INT" in t:
+        return pa.int64()
+    if "CHAR" in t or "TEXT" in t or "CLOB" in t or t in ("ENUM", "SET"):
+        return pa.string()
+    if "BLOB" in t or "BINARY" in t:
+        return pa.binary()
+    if "REAL" in t or "FLOA" in t or "DOUB" in t or "DEC" in t or "NUM" in t:
+        return pa.float64()
+    if "DATETIME" in t or "TIMESTAMP" in t:
+        return pa.timestamp("us")
+    if t == "DATE":
+        return pa.date32()
+    # no declared type, TIME, JSON, ENUM...: anything can be written as text
+    return pa.string()
+
+
+def arrow_schema(columns: List[str], types: Optional[Dict[str, str]]):
+    """``types`` maps lower-cased column names to declared types; unknown columns are strings."""
+    import pyarrow as pa
+
+    types = types or {}
+    return pa.schema([pa.field(name, arrow_type(types.get(name.lower(), ""))) for name in columns])
+
+
+def _fit(value: Any, typ) -> Any:
+    """``value`` converted to ``typ``, or None when it cannot be without changing it."""
+    import pyarrow as pa
+
+    if value is None:
+        return None
+    try:
+        if pa.types.is_string(typ):
+            return value if isinstance(value, str) else json_default(value)
+        if pa.types.is_binary(typ):
+            return bytes(value) if isinstance(value, (bytes, bytearray)) else str(value).encode()
+        if pa.types.is_integer(typ):
+            if isinstance(value, str):
+                value = value.strip()
+                value = int(value) if value.lstrip("+-").isdigit() else decimal.Decimal(value)
+            if value != int(value):
+                return None
+            value = int(value)
+            return value if -2 ** 63 <= value < 2 ** 63 else None
+        if pa.types.is_floating(typ):
+            return float(value)
+        if pa.types.is_timestamp(typ):
+            if isinstance(value, datetime.datetime):
+                return value
+            if isinstance(value, datetime.date):
+                return datetime.datetime.combine(value, datetime.time())
+            return datetime.datetime.fromisoformat(str(value))
+        if pa.types.is_date(typ):
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            if isinstance(value, datetime.date):
+                return value
+            return datetime.date.fromisoformat(str(value)[:10])
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+    return None
+
+
+def _native(typ) -> tuple:
+    """The Python types pyarrow takes for ``typ`` as they are (it would silently truncate 2.5 to int64)."""
+    import pyarrow as pa
+
+    if pa.types.is_integer(typ):
+        return (int,)
+    if pa.types.is_floating(typ):
+        return (float, int)
+    if pa.types.is_string(typ):
+        return (str,)
+    if pa.types.is_binary(typ):
+        return (bytes,)
+    if pa.types.is_timestamp(typ):
+        return (datetime.datetime,)
+    if pa.types.is_date(typ):
+        return (datetime.date,)
+    return ()
+
+
+def _arrow_array(values: Sequence[Any], typ):
+    import pyarrow as pa
+
+    native = _native(typ)
+    if all(v is None or type(v) in native for v in values):
+        try:
+            return pa.array(values, type=typ)
+        except (pa.ArrowInvalid, OverflowError):
+            pass
+    # SQLite lets any column hold any type; convert what does not match value by value
+    return pa.array([_fit(v, typ) for v in values], type=typ)
+
+
+def _record_batches(columns: List[str], chunks: Iterable[Sequence[tuple]], types: Optional[Dict[str, str]]):
+    import pyarrow as pa
+
+    schema = arrow_schema(columns, types)
+    empty = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        arrays = [_arrow_array(c, f.type) for c, f in zip(zip(*chunk), schema)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+        empty = False
+    if empty:
+        # still a valid file, with the table's columns
+        yield pa.RecordBatch.from_arrays([pa.array([], f.type) for f in schema], schema=schema)
+
+
+def encode_parquet(
+    columns: List[str], chunks: Iterable[Sequence[tuple]], types: Optional[Dict[str, str]] = None
+) -> Iterator[bytes]:
+    """One Parquet row group per chunk.
+
+    Column types follow ``types`` (see ``arrow_schema``); a value that does
+    not fit its column's type is converted, or written as null if it cannot be.
+    """
+    import pyarrow.parquet as pq
+
+    sink = _Drain()
+    writer = None
+    for batch in _record_batches(columns, chunks, types):
+        if writer is None:
+            writer = pq.ParquetWriter(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def encode_arrow(
+    columns: List[str], chunks: Iterable[Sequence[tuple]], types: Optional[Dict[str, str]] = None
+) -> Iterator[bytes]:
+    """An Arrow IPC stream, one record batch per chunk; types as for ``encode_parquet``."""
+    import pyarrow as pa
+
+    sink = _Drain()
+    writer = None
+    for batch in _record_batches(columns, chunks, types):
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+ENCODERS = {
+    "json": encode_json,
+    "ndjson": encode_ndjson,
+    "csv": encode_csv,
+    "parquet": encode_parquet,
+    "arrow": encode_arrow,
+}
+
+
+def require(fmt: str) -> None:
+    """Raise RuntimeError if the optional dependency for ``fmt`` is missing."""
+    if fmt in ARROW_FORMATS:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError(f"{fmt} export requires the pyarrow package")
@@ -0,0 +1,121 @@
+"""In-memory index of the forms in the data directory.
+
+Existence checks used to stat the form's ``.db`` file (or ``.db.mariadb``
+marker) on every request, and ``GET /forms`` listed the whole directory twice.
+With tens of thousands of forms that is a lot of syscalls per request. The
+catalog scans the directory once at startup. After that, ``create_form``,
+``drop_database`` and ``/submit`` keep it up to date, so lookups are set
+membership checks and listing is a bisect into a sorted list.
+
+Forms created or removed behind the service's back (another process, a
+restore) are picked up by ``maybe_refresh``. It rescans only when the
+directory's mtime has changed, and at most once per ``refresh_interval``
+seconds.
+"""
+import bisect
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+# file suffix -> backend kind
+_SUFFIXES = ((".db.mariadb", "mariadb"), (".db", "sqlite"))
+
+
+def _scan(data_dir: str) -> Dict[str, Set[str]]:
+    forms: Dict[str, Set[str]] = {}
+    with os.scandir(data_dir) as it:
+        for entry in it:
+            for suffix, kind in _SUFFIXES:
+                if entry.name.endswith(suffix):
+                    forms.setdefault(entry.name[:-len(suffix)], set()).add(kind)
+                    break
+    return forms
+
+
+class FormCatalog:
+    """Form names (as stored on disk) and which backends hold each of them."""
+
+    def __init__(self, data_dir: str, refresh_interval: float = 5.0):
+        self.data_dir = data_dir
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Set[str]] = {}
+        self._names: List[str] = []  # sorted
+        self._mtime = None
+        self._checked = 0.0
+        self.refreshes = 0
+
+    def load(self) -> None:
+        """(Re)build the index from the directory."""
+        mtime = os.stat(self.data_dir).st_mtime_ns
+        forms = _scan(self.data_dir)
+        with self._lock:
+            self._kinds = forms
+            self._names = sorted(forms)
+            self._mtime = mtime
+            self._checked = time.monotonic()
+            self.refreshes += 1
+
+    def maybe_refresh(self) -> bool:
+        """Rescan if the directory changed since the last scan; rate-limited."""
+        if self.refresh_interval <= 0 or time.monotonic() - self._checked < self.refresh_interval:
+            return False
+        self._checked = time.monotonic()
+        if os.stat(self.data_dir).st_mtime_ns == self._mtime:
+            return False
+        self.load()
+        return True
+
+    def contains(self, name: str, kind: str) -> bool:
+        kinds = self._kinds.get(name)
+        if kinds is not None and kind in kinds:
+            return True
+        # a miss may be a form another process just created
+        if self.maybe_refresh():
+            kinds = self._kinds.get(name)
+            return kinds is not None and kind in kinds
+        return False
+
+    def add(self, name: str, kind: str) -> None:
+        with self._lock:
+            kinds = self._kinds.get(name)
+            if kinds is None:
+                self._kinds[name] = {kind}
+                bisect.insort(self._names, name)
+            else:
+                kinds.add(kind)
+
+    def discard(self, name: str, kind: str) -> None:
+        with self._lock:
+            kinds = self._kinds.get(name)
+            if kinds is None:
+                return
+            kinds.discard(kind)
+            if not kinds:
+                del self._kinds[name]
+                i = bisect.bisect_left(self._names, name)
+                if i < len(self._names) and self._names[i] == name:
+                    del self._names[i]
+
+    def page(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> Tuple[List[str], Optional[str]]:
+        """Names starting with ``prefix`` that sort after ``after``, plus the ``after`` for the next page."""
+        names = self._names
+        start = bisect.bisect_left(names, prefix)
+        if after is not None and after >= prefix:
+            start = max(start, bisect.bisect_right(names, after))
+        out = []
+        for name in names[start:start + limit + 1]:
+            if not name.startswith(prefix):
+                break
+            out.append(name)
+        if len(out) > limit:
+            out = out[:limit]
+            return out, out[-1]
+        return out, None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def stats(self) -> Dict[str, int]:
+        return {"forms": len(self._names), "refreshes": self.refreshes}
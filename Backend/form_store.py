@@ -0,0 +1,255 @@
+"""The storage interface behind the form API.
+
+Every endpoint used to fork on ``USE_MARIADB`` and repeat the connection,
+cursor and error handling for each backend. A ``FormStore`` owns all of that:
+connection lifecycle, statement building and turning results into plain
+Python values. The endpoints only translate HTTP to store calls, and each
+backend applies its own fast paths (the SQLite writer queue and
+``executemany``, multi-row INSERTs and server-side cursors on MariaDB).
+
+Implementations: ``sqlite_store.SQLiteStore`` (one file per form),
+``mariadb_store.MariaDBStore`` (one shared database) and
+``memory_store.MemoryStore`` (process memory, for tests and demos).
+
+Store methods are coroutines so each backend decides how to get blocking
+work off the event loop. Failures are reported with the exceptions below;
+the API maps them to HTTP status codes.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from . import metrics
+from .aggregate import AggregateQuery
+from .rollups import Dimension
+from .row_query import RowQuery
+from .sql import is_ident, scan_sql, select_all_sql
+
+
+class FormNotFound(LookupError):
+    pass
+
+
+class FormExists(Exception):
+    pass
+
+
+class StoreError(Exception):
+    """A statement failed in the backend (bad table, bad column, constraint...)."""
+
+
+class RowStream:
+    """An open export: column names plus an iterator of row chunks.
+
+    ``chunks`` is a blocking iterator of lists of tuples; the caller must call
+    ``close`` (which is idempotent) to release the underlying connection.
+    """
+
+    def __init__(self, columns: List[str], chunks: Iterable[Sequence[tuple]], close: Optional[Callable[[], None]] = None):
+        self.columns = columns
+        self.chunks = chunks
+        self._close = close
+
+    def close(self) -> None:
+        close, self._close = self._close, None
+        if close is not None:
+            close()
+
+
+class FormStore:
+    """Interface implemented by every storage backend."""
+
+    kind = ""
+
+    async def create_form(self, form: str) -> str:
+        """Create the form and return where it lives; FormExists if it already does."""
+        raise NotImplementedError
+
+    async def form_exists(self, form: str) -> bool:
+        raise NotImplementedError
+
+    async def list_forms(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> Tuple[List[str], Optional[str]]:
+        """One page of form names in sorted order, plus the ``after`` value for the next page."""
+        raise NotImplementedError
+
+    async def drop_form(self, form: str) -> Dict[str, Any]:
+        """Drop the form and everything in it; returns extra fields for the response."""
+        raise NotImplementedError
+
+    async def create_table(self, form: str, table: str, columns: List[Tuple[str, str]]) -> None:
+        """Create ``table`` with an auto-increment ``id`` plus (name, type) columns."""
+        raise NotImplementedError
+
+    async def show_tables(self, form: str) -> List[Any]:
+        raise NotImplementedError
+
+    async def describe_table(self, form: str, table: str) -> List[Any]:
+        raise NotImplementedError
+
+    async def columns(self, form: str, table: str) -> Dict[str, str]:
+        """Lower-cased column name -> declared type, from the schema cache; empty if no such table."""
+        raise NotImplementedError
+
+    async def indexes(self, form: str, table: str) -> List[Dict[str, Any]]:
+        """Every index on ``table`` as {name, columns (lower-cased), unique}, the primary key included."""
+        raise NotImplementedError
+
+    async def create_index(self, form: str, table: str, name: str, columns: List[str], unique: bool = False) -> None:
+        raise NotImplementedError
+
+    async def drop_index(self, form: str, table: str, name: str) -> None:
+        raise NotImplementedError
+
+    async def drop_table(self, form: str, table: str) -> None:
+        raise NotImplementedError
+
+    async def insert_row(self, form: str, table: str, row: Dict[str, Any]) -> Any:
+        """Insert one row and return its id."""
+        raise NotImplementedError
+
+    async def insert_rows(self, form: str, table: str, rows: List[Any], results: List[Any]) -> None:
+        """Insert ``rows`` in one transaction.
+
+        ``results`` is aligned with ``rows``; entries that are already set
+        (parse errors) are skipped, every other entry is filled with
+        ``{"id": ...}`` or ``{"error": ...}``.
+        """
+        raise NotImplementedError
+
+    async def list_rows(self, form: str, table: str, query: RowQuery) -> List[Dict[str, Any]]:
+        """Up to ``query.limit`` rows matching ``query`` (see ``row_query``), in its order."""
+        raise NotImplementedError
+
+    async def update_rows(self, form: str, table: str, values: Dict[str, Any], where: Dict[str, Any]) -> int:
+        """UPDATE with equality conditions; returns the number of rows changed."""
+        raise NotImplementedError
+
+    async def open_export(
+        self, form: str, table: str,
+        fields: Optional[Tuple[str, ...]] = None, filters: Tuple[Tuple[str, str, tuple], ...] = (),
+    ) -> RowStream:
+        """Stream the table, or only ``fields`` of the rows matching ``filters`` (as in RowQuery)."""
+        raise NotImplementedError
+
+    async def aggregate(self, form: str, table: str, query: AggregateQuery) -> Dict[str, Any]:
+        """Compute ``query`` in the database; only called when ``query.pushdown`` is set."""
+        raise NotImplementedError
+
+    async def rollups(self, form: str, table: str) -> List[Tuple[str, str]]:
+        """(name, dimensions JSON) of every rollup defined on ``table``."""
+        raise NotImplementedError
+
+    async def create_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        """Define a rollup, install what keeps it current and backfill it from the table."""
+        raise NotImplementedError
+
+    async def rebuild_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        raise NotImplementedError
+
+    async def read_rollup(self, form: str, table: str, name: str, dims: List[Dimension], limit: int) -> List[tuple]:
+        """Up to ``limit`` (key values..., count) rows, in key order."""
+        raise NotImplementedError
+
+    async def drop_rollup(self, form: str, table: str, name: str) -> None:
+        raise NotImplementedError
+
+    async def submit(self, form: str, fields: Dict[str, Any]) -> None:
+        """Store one form submission, creating the table or missing columns as needed."""
+        raise NotImplementedError
+
+    async def submit_many(self, form: str, rows: List[Dict[str, Any]]) -> None:
+        """Store a batch of submissions, as the ingestion buffer flushes them."""
+        for fields in rows:
+            await self.submit(form, fields)
+
+    def storage_key(self, form: str) -> str:
+        """Where ``form``'s tables live. Forms with the same key share tables, so caches are keyed by it."""
+        return safe_name(form)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    async def close(self) -> None:
+        pass
+
+
+def safe_name(form: str) -> str:
+    """The form's name as used for its files (and listed by GET /forms)."""
+    return "_".join(form.split())
+
+
+def db_path(data_dir: str, form: str) -> str:
+    return os.path.join(data_dir, f"{safe_name(form)}.db")
+
+
+def group_by_columns(rows: List[Any], results: List[Any]) -> Dict[tuple, List[int]]:
+    """Indexes of the still-pending rows, grouped by their column tuple.
+
+    Rows with a column name that is not a valid identifier are rejected here.
+    """
+    groups: Dict[tuple, List[int]] = {}
+    for i, row in enumerate(rows):
+        if results[i] is None:
+            keys = tuple(row.keys())
+            bad = [k for k in keys if not is_ident(k)]
+            if bad:
+                results[i] = {"error": f"invalid column name: {bad[0]!r}"}
+            else:
+                groups.setdefault(keys, []).append(i)
+    return groups
+
+
+def explicit_id(keys) -> Optional[str]:
+    """The key naming the ``id`` column (in any case) when rows set their ids themselves."""
+    return next((k for k in keys if k.lower() == "id"), None)
+
+
+def insert_rows_one_by_one(cur, sql: str, idxs, params, results) -> None:
+    """Fallback when a batch fails: insert rows individually so only the bad ones are rejected."""
+    for i, values in zip(idxs, params):
+        cur.execute("SAVEPOINT bulk_row")
+        try:
+            cur.execute(sql, values)
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+            results[i] = {"error": str(e)}
+        else:
+            results[i] = {"id": cur.lastrowid}
+        cur.execute("RELEASE SAVEPOINT bulk_row")
+
+
+def scan_statement(dialect: str, table: str, fields, filters) -> Tuple[str, List[Any]]:
+    """(sql, params) for open_export: the whole table, or ``fields`` of the rows matching ``filters``."""
+    if not fields:
+        return select_all_sql(table), []
+    shape = tuple((col, op, len(values)) for col, op, values in filters)
+    return scan_sql(dialect, table, tuple(fields), shape), [v for _, _, values in filters for v in values]
+
+
+def fetch_chunks(cur, size: int, backend: str, done: Optional[Callable[[int, float, bool], None]] = None) -> Iterator[list]:
+    """``cur``'s rows ``size`` at a time.
+
+    ``done(rows, fetch_seconds, complete)`` runs when the stream ends or is
+    closed early (``complete`` is False then).
+    """
+    fetch = metrics.DB_SECONDS.labels(backend, "fetch")
+    scanned = metrics.DB_ROWS.labels(backend, "scan")
+    rows = 0
+    seconds = 0.0
+    complete = False
+    try:
+        while True:
+            t0 = time.perf_counter()
+            chunk = cur.fetchmany(size)
+            elapsed = time.perf_counter() - t0
+            fetch.observe(elapsed)
+            seconds += elapsed
+            if not chunk:
+                complete = True
+                return
+            rows += len(chunk)
+            scanned.inc(len(chunk))
+            yield chunk
+    finally:
+        if done is not None:
+            done(rows, seconds, complete)
@@ -0,0 +1,369 @@
+"""Streaming parsers for table imports (CSV and NDJSON).
+
+The counterpart of ``exporters``. A ``RowImporter`` is fed the request body
+block by block and returns typed rows as soon as their records are complete.
+Memory therefore stays bounded by one block, one partial record and the
+rows of the chunk being inserted, however large the file is.
+
+* CSV: the first record is the header, naming table columns. A record ends
+  at a newline outside quotes, so quoted fields may span lines. Empty fields
+  are NULL.
+* NDJSON: one object per line.
+
+Values are converted to the column's declared type with SQLite's affinity
+rules, so ``"42"`` becomes 42 in an INTEGER column. A value that cannot be
+converted, an unknown key or a malformed line rejects only its row. Rejects
+are counted, and the first ``max_rejects`` are kept with their line numbers.
+Problems that make the rest of the file unreadable raise ``InvalidImport``:
+a bad header, a runaway quoted field or a line over ``max_record_bytes``.
+
+Into a table that does not exist yet (``create``), the importer samples the
+first ``sample_rows`` rows and ``infer_columns`` picks INTEGER, REAL or TEXT
+for each column.
+"""
+import codecs
+import csv
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .sql import is_ident
+
+FORMATS = ("csv", "ndjson")
+
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonlines": "ndjson",
+}
+
+
+class InvalidImport(ValueError):
+    pass
+
+
+def detect(fmt: Optional[str], content_type: str) -> str:
+    """The import format from an explicit ``format`` parameter, else the Content-Type."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise InvalidImport(f"unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+        return fmt
+    found = _CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    if found is None:
+        raise InvalidImport("set Content-Type to text/csv or application/x-ndjson, or pass format=")
+    return found
+
+
+def kind(ctype: str) -> str:
+    """integer, real, numeric, text or any: the column's type affinity."""
+    t = ctype.upper()
+    if "INT" in t:
+        return "integer"
+    if "CHAR" in t or "CLOB" in t or "TEXT" in t or "DATE" in t or "TIME" in t:
+        return "text"
+    if not t or "BLOB" in t:
+        return "any"
+    if "REAL" in t or "FLOA" in t or "DOUB" in t:
+        return "real"
+    return "numeric"
+
+
+def _number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def convert(value: Any, affinity: str) -> Any:
+    """``value`` as stored in a column of ``affinity``; ValueError if it does not fit."""
+    if value is None:
+        return None
+    if isinstance(value, (dict, list)):
+        raise ValueError("nested values are not supported")
+    if affinity == "text":
+        return value if isinstance(value, str) else json.dumps(value)
+    if affinity == "any":
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"{value!r} is not a number")
+    if isinstance(value, str):
+        try:
+            value = _number(value.strip())
+        except ValueError:
+            raise ValueError(f"{value!r} is not a number") from None
+    if affinity == "integer":
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError(f"{value!r} is not an integer")
+            return int(value)
+        return value
+    if affinity == "real":
+        return float(value)
+    return value
+
+
+def infer_columns(names: List[str], rows: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """(name, INTEGER/REAL/TEXT) for each column, from the values in ``rows``."""
+    columns = []
+    for name in names:
+        values = [row[name] for row in rows if row.get(name) is not None]
+        ctype = "TEXT"
+        if values:
+            try:
+                numbers = [convert(v, "numeric") for v in values]
+            except ValueError:
+                pass
+            else:
+                ctype = "INTEGER" if all(isinstance(n, int) for n in numbers) else "REAL"
+        columns.append((name, ctype))
+    return columns
+
+
+class _Lines:
+    """Splits decoded text into complete lines, carrying a partial last line over."""
+
+    def __init__(self, max_record_bytes: int):
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._tail = ""
+        self.max_record_bytes = max_record_bytes
+
+    def feed(self, data: bytes, final: bool) -> List[str]:
+        text = self._tail + self._decoder.decode(data, final)
+        lines = text.split("\n")
+        self._tail = "" if final else lines.pop()
+        if len(self._tail) > self.max_record_bytes:
+            raise InvalidImport(f"a line is longer than {self.max_record_bytes} bytes")
+        if final and lines and not lines[-1]:
+            lines.pop()
+        return lines
+
+
+class RowImporter:
+    def __init__(
+        self,
+        fmt: str,
+        columns: Optional[Dict[str, str]],
+        delimiter: str = ",",
+        sample_rows: int = 1000,
+        max_rejects: int = 100,
+        max_record_bytes: int = 1 << 20,
+    ):
+        if len(delimiter) != 1:
+            raise InvalidImport("delimiter must be one character")
+        self.fmt = fmt
+        self.delimiter = delimiter
+        self.sample_rows = sample_rows
+        self.max_rejects = max_rejects
+        self._lines = _Lines(max_record_bytes)
+        self.line = 0
+        self.rows = 0
+        self.rejected = 0
+        self.rejects: List[Dict[str, Any]] = []
+        self.header: Optional[List[str]] = None
+        self._record: List[str] = []  # lines of a CSV record still inside quotes
+        self._quotes = 0
+        self._record_start = 0
+        self._affinity: Optional[Dict[str, str]] = None
+        self._sample: List[Tuple[int, Dict[str, Any]]] = []
+        self._final = False
+        if columns:
+            self.use_columns(columns)
+
+    @property
+    def needs_columns(self) -> bool:
+        """True once enough rows are sampled (or the body ended) to create the table from them."""
+        return self._affinity is None and (len(self._sample) >= self.sample_rows or self._final)
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.rejects) < self.max_rejects:
+            self.rejects.append({"line": line, "error": error})
+
+    def use_columns(self, columns: Dict[str, str]) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """Set the table's columns (lower-cased name -> type); returns the sampled rows, converted."""
+        self._affinity = {name: kind(ctype) for name, ctype in columns.items()}
+        if self.header is not None:
+            self._check_header(self.header)
+        sample, self._sample = self._sample, []
+        return self._convert(sample)
+
+    def inferred(self) -> List[Tuple[str, str]]:
+        names = self.header or list(dict.fromkeys(k for _, row in self._sample for k in row))
+        names = [n for n in names if n.lower() != "id"]
+        if not names:
+            raise InvalidImport("no columns to create the table with")
+        for name in names:
+            if not is_ident(name):
+                raise InvalidImport(f"invalid column name: {name!r}")
+        return infer_columns(names, [row for _, row in self._sample])
+
+    def _check_header(self, header: List[str]) -> None:
+        seen = set()
+        for name in header:
+            if not is_ident(name):
+                raise InvalidImport(f"invalid column name in header: {name!r}")
+            if self._affinity is not None and name.lower() not in self._affinity:
+                raise InvalidImport(f"unknown column in header: {name}")
+            if name.lower() in seen:
+                raise InvalidImport(f"column {name} appears twice in the header")
+            seen.add(name.lower())
+
+    def feed(self, data: bytes, final: bool = False) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """Parse the next block of the body; returns the (line numbers, rows) ready to insert."""
+        raw = self._csv(data, final) if self.fmt == "csv" else self._ndjson(data, final)
+        self._final = final
+        self.rows += len(raw)
+        if self._affinity is None:
+            self._sample.extend(raw)
+            return [], []
+        return self._convert(raw)
+
+    def _convert(self, raw: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[int], List[Dict[str, Any]]]:
+        lines, rows = [], []
+        affinity = self._affinity
+        for line, row in raw:
+            try:
+                typed = {}
+                for key, value in row.items():
+                    a = affinity.get(key.lower())
+                    if a is None:
+                        raise ValueError(f"unknown column {key}")
+                    try:
+                        typed[key] = convert(value, a)
+                    except ValueError as e:
+                        raise ValueError(f"column {key}: {e}") from None
+            except ValueError as e:
+                self.reject(line, str(e))
+                continue
+            if not typed:
+                self.reject(line, "empty row")
+                continue
+            lines.append(line)
+            rows.append(typed)
+        return lines, rows
+
+    def _ndjson(self, data: bytes, final: bool) -> List[Tuple[int, Dict[str, Any]]]:
+        out = []
+        for text in self._lines.feed(data, final):
+            self.line += 1
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                self.reject(self.line, f"invalid JSON: {e}")
+                continue
+            if not isinstance(row, dict):
+                self.reject(self.line, "row must be an object")
+                continue
+            out.append((self.line, row))
+        return out
+
+    def _csv(self, data: bytes, final: bool) -> List[Tuple[int, Dict[str, Any]]]:
+        records, starts = [], []
+        for text in self._lines.feed(data, final):
+            self.line += 1
+            if not self._record:
+                self._record_start = self.line
+            self._record.append(text)
+            self._quotes += text.count('"')
+            # a newline inside quotes (odd count so far) belongs to the field
+            if self._quotes % 2:
+                if sum(map(len, self._record)) > self._lines.max_record_bytes:
+                    raise InvalidImport(f"unterminated quoted field starting at line {self._record_start}")
+                continue
+            records.append("\n".join(self._record))
+            starts.append(self._record_start)
+            self._record, self._quotes = [], 0
+        if final and self._record:
+            raise InvalidImport(f"unterminated quoted field starting at line {self._record_start}")
+
+        out = []
+        for line, fields in zip(starts, csv.reader(records, delimiter=self.delimiter)):
+            if self.header is None:
+                self._check_header(fields)
+                self.header = fields
+                continue
+            if not fields:
+                continue
+            if len(fields) != len(self.header):
+                self.reject(line, f"expected {len(self.header)} fields, got {len(fields)}")
+                continue
+            out.append((line, {k: (v if v != "" else None) for k, v in zip(self.header, fields)}))
+        if final and self.header is None:
+            raise InvalidImport("the CSV has no header row")
+        return out
+
+
+class ImportProgress:
+    __slots__ = ("id", "form", "table", "format", "state", "bytes", "inserted", "error", "started", "finished", "importer")
+
+    def __init__(self, import_id: str, form: str, table: str, fmt: str):
+        self.id = import_id
+        self.form = form
+        self.table = table
+        self.format = fmt
+        self.state = "running"
+        self.bytes = 0
+        self.inserted = 0
+        self.error: Optional[str] = None
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.importer: Optional[RowImporter] = None
+
+    def done(self, error: Optional[str] = None) -> None:
+        self.state = "failed" if error else "done"
+        self.error = error
+        self.finished = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        imp = self.importer
+        seconds = (self.finished or time.time()) - self.started
+        return {
+            "import_id": self.id,
+            "table": self.table,
+            "format": self.format,
+            "state": self.state,
+            "error": self.error,
+            "bytes": self.bytes,
+            "lines": imp.line if imp else 0,
+            "rows": imp.rows if imp else 0,
+            "inserted": self.inserted,
+            "rejected": imp.rejected if imp else 0,
+            "rejects": sorted(imp.rejects, key=lambda r: r["line"]) if imp else [],
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.inserted / seconds) if seconds > 0 else 0,
+        }
+
+
+class ImportRegistry:
+    """Running imports, plus the last ``keep`` finished ones, for GET .../imports/{id}."""
+
+    def __init__(self, keep: int = 100):
+        self.keep = keep
+        self._imports: "OrderedDict[Tuple[str, str], ImportProgress]" = OrderedDict()
+
+    def start(self, form: str, table: str, fmt: str, import_id: Optional[str] = None) -> ImportProgress:
+        import_id = import_id or uuid.uuid4().hex
+        if (form, import_id) in self._imports and self._imports[form, import_id].state == "running":
+            raise InvalidImport(f"import {import_id} is already running")
+        progress = self._imports[form, import_id] = ImportProgress(import_id, form, table, fmt)
+        self._imports.move_to_end((form, import_id))
+        finished = [key for key, p in self._imports.items() if p.state != "running"]
+        for key in finished[:max(0, len(finished) - self.keep)]:
+            del self._imports[key]
+        return progress
+
+    def get(self, form: str, import_id: str) -> Optional[ImportProgress]:
+        return self._imports.get((form, import_id))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": sum(1 for p in self._imports.values() if p.state == "running"),
+            "finished": sum(1 for p in self._imports.values() if p.state != "running"),
+        }
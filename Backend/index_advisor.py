@@ -0,0 +1,157 @@
+"""Index usage tracking, recommendations and opt-in automatic creation.
+
+Tables only come with the ``id`` primary key, so a filtered or sorted
+list_rows and an update_rows ``where`` scan the whole table. Every executed
+query is recorded here by its *access shape*. That is its equality/IN
+columns, in a canonical order, followed by the one range or sort column an
+index could also serve. The query's time is recorded with it.
+
+``report`` ranks the shapes by total time and says whether an existing index
+leads with them. ``advise`` recommends a CREATE INDEX for each unindexed
+shape used at least ``min_uses`` times. ``record`` returns True exactly once
+per shape, when it reaches ``min_uses``. With auto-creation enabled, the API
+then creates the index in the background (``auto_created`` logs the
+outcome), at most ``max_auto`` per table.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .row_query import RowQuery
+from .sql import ident, index_name
+
+Shape = Tuple[Tuple[str, ...], Optional[str]]  # (equality columns, range/sort column)
+
+
+def access_shape(query: RowQuery) -> Optional[Shape]:
+    """The shape of a list_rows query, or None if the primary key serves it."""
+    eq = sorted({col.lower() for col, op, _ in query.filters if op in ("eq", "in")} - {"id"})
+    ranged = [col.lower() for col, op, _ in query.filters if op not in ("eq", "in", "ne")]
+    tail = next((c for c in ranged if c not in eq), None)
+    if tail is None and query.sort.lower() not in eq:
+        tail = query.sort.lower()
+    if tail == "id":
+        # the primary key already serves it, whatever comes before
+        tail = None
+    if not eq and tail is None:
+        return None
+    return tuple(eq), tail
+
+
+def where_shape(columns) -> Optional[Shape]:
+    """The shape of an update_rows ``where`` (equality on every column)."""
+    eq = tuple(sorted({c.lower() for c in columns} - {"id"}))
+    return (eq, None) if eq else None
+
+
+def covers(index: Tuple[str, ...], shape: Shape) -> bool:
+    """True if ``index`` starts with the shape's equality columns (any order) and then its tail."""
+    eq, tail = shape
+    head = index[:len(eq)]
+    if len(head) < len(eq) or set(head) != set(eq):
+        return False
+    return tail is None or (len(index) > len(eq) and index[len(eq)] == tail)
+
+
+def shape_columns(shape: Shape) -> List[str]:
+    eq, tail = shape
+    return list(eq) + ([tail] if tail else [])
+
+
+class _Usage:
+    __slots__ = ("uses", "seconds", "sources")
+
+    def __init__(self):
+        self.uses = 0
+        self.seconds = 0.0
+        self.sources = set()
+
+
+class IndexAdvisor:
+    def __init__(self, min_uses: int = 20, max_auto: int = 4):
+        self.min_uses = min_uses
+        self.max_auto = max_auto
+        self._usage: Dict[Tuple[str, str], Dict[Shape, _Usage]] = {}
+        self._auto: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, form: str, table: str, shape: Optional[Shape], seconds: float, source: str) -> bool:
+        """Count one executed query; True when its shape has just reached ``min_uses``."""
+        if shape is None:
+            return False
+        with self._lock:
+            shapes = self._usage.setdefault((form, table.lower()), {})
+            usage = shapes.get(shape)
+            if usage is None:
+                usage = shapes[shape] = _Usage()
+            usage.uses += 1
+            usage.seconds += seconds
+            usage.sources.add(source)
+            return usage.uses == self.min_uses
+
+    def _shapes(self, form: str, table: str) -> Dict[Shape, _Usage]:
+        with self._lock:
+            return dict(self._usage.get((form, table.lower()), {}))
+
+    def report(self, form: str, table: str, indexes: List[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+        """Every recorded shape of the table, slowest in total first."""
+        rows = []
+        for shape, usage in sorted(self._shapes(form, table).items(), key=lambda kv: -kv[1].seconds):
+            rows.append({
+                "columns": shape_columns(shape),
+                "sources": sorted(usage.sources),
+                "queries": usage.uses,
+                "total_ms": round(usage.seconds * 1000, 3),
+                "avg_ms": round(usage.seconds * 1000 / usage.uses, 3),
+                "indexed": any(covers(ix, shape) for ix in indexes),
+            })
+        return rows
+
+    def advise(self, form: str, table: str, indexes: List[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+        advice = []
+        for shape, usage in sorted(self._shapes(form, table).items(), key=lambda kv: -kv[1].uses):
+            if usage.uses < self.min_uses or any(covers(ix, shape) for ix in indexes):
+                continue
+            cols = shape_columns(shape)
+            advice.append({
+                "columns": cols,
+                "queries": usage.uses,
+                "sql": f"CREATE INDEX {ident(index_name(table, cols))} ON {ident(table)} "
+                       f"({', '.join(ident(c) for c in cols)})",
+            })
+        return advice
+
+    def top(self, limit: int) -> List[Tuple[str, str, Shape, float]]:
+        """(form, table, shape, seconds) of the most expensive shapes across all tables."""
+        with self._lock:
+            flat = [(form, table, shape, u.seconds) for (form, table), shapes in self._usage.items()
+                    for shape, u in shapes.items()]
+        flat.sort(key=lambda t: -t[3])
+        return flat[:limit]
+
+    def may_auto_create(self, form: str, table: str) -> bool:
+        with self._lock:
+            done = self._auto.get((form, table.lower()), [])
+            return sum(1 for a in done if a["status"] == "created") < self.max_auto
+
+    def auto_created(self, form: str, table: str, columns: List[str], status: str) -> None:
+        with self._lock:
+            self._auto.setdefault((form, table.lower()), []).append({"columns": columns, "status": status})
+
+    def auto_log(self, form: str, table: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._auto.get((form, table.lower()), []))
+
+    def forget(self, form: str, table: Optional[str] = None) -> None:
+        """Drop the counts for a dropped table, or for every table of a dropped form."""
+        with self._lock:
+            for data in (self._usage, self._auto):
+                for key in [k for k in data if k[0] == form and (table is None or k[1] == table.lower())]:
+                    del data[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tables": len(self._usage),
+                "shapes": sum(len(s) for s in self._usage.values()),
+                "auto_created": sum(1 for log in self._auto.values() for a in log if a["status"] == "created"),
+            }
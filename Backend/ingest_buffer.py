@@ -0,0 +1,317 @@
+"""Write-ahead buffer for /submit (INGEST_BUFFER=true).
+
+Without it, every /submit waits for its own trip through the form's writer
+thread and commit. With it, a submission is acknowledged once it is appended
+to a local log. A background flusher moves buffered submissions into the
+form databases every INGEST_FLUSH_MS, or as soon as INGEST_FLUSH_ROWS are
+waiting. It writes one multi-row insert per form and column set, and
+different forms flush in parallel.
+
+INGEST_DURABILITY decides when an append counts as done:
+
+* ``memory``: queued in process memory. A crash loses what was not flushed.
+* ``write``: written to the log file, so the OS has it. This survives the
+  process dying, but not the machine.
+* ``fsync``: the log is fsync'ed before the acknowledgement. Concurrent
+  appends share one fsync (group commit), so the cost is per fsync, not per
+  submission.
+
+The log is a series of segment files named ``<seq>.log``. Each line holds
+one JSON record prefixed with its CRC32. A flush seals the active segment
+and starts a new one. It writes the sealed records to the databases, then
+deletes the sealed segment. Submissions that failed are first appended to
+the new segment; after INGEST_MAX_ATTEMPTS failed flushes they move to
+``dead.log`` instead.
+
+At startup, left-over segments are replayed in order. A torn last line (a
+crash mid-append) fails its CRC and is dropped. Replay is at-least-once: a
+crash between a flush's commit and the segment's deletion stores those
+submissions again.
+
+Buffered submissions are not visible to reads until they are flushed.
+"""
+import asyncio
+import json
+import os
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from .aio import run_db
+
+DURABILITY = ("memory", "write", "fsync")
+
+Flush = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+
+
+class BufferFull(Exception):
+    """More than ``max_pending`` submissions are waiting for a flush."""
+
+
+class _Pending:
+    __slots__ = ("form", "fields", "attempts")
+
+    def __init__(self, form: str, fields: Dict[str, Any], attempts: int = 0):
+        self.form = form
+        self.fields = fields
+        self.attempts = attempts
+
+
+def encode(form: str, fields: Dict[str, Any], attempts: int = 0) -> bytes:
+    body = json.dumps({"form": form, "fields": fields, "attempts": attempts}, separators=(",", ":"), default=str)
+    data = body.encode()
+    return b"%08x %s\n" % (zlib.crc32(data), data)
+
+
+def decode(line: bytes) -> Optional[_Pending]:
+    """The record on ``line``, or None if it is torn or corrupt."""
+    crc, _, data = line.rstrip(b"\n").partition(b" ")
+    try:
+        if int(crc, 16) != zlib.crc32(data):
+            return None
+        rec = json.loads(data)
+    except ValueError:
+        return None
+    return _Pending(rec["form"], rec["fields"], rec.get("attempts", 0))
+
+
+class IngestBuffer:
+    def __init__(
+        self,
+        directory: str,
+        flush: Flush,
+        durability: str = "write",
+        flush_ms: float = 50,
+        flush_rows: int = 1000,
+        max_pending: int = 100_000,
+        max_attempts: int = 5,
+    ):
+        if durability not in DURABILITY:
+            raise RuntimeError(f"unknown INGEST_DURABILITY {durability!r}; expected one of {', '.join(DURABILITY)}")
+        self.directory = directory
+        self._flush = flush
+        self.durability = durability
+        self.flush_ms = flush_ms
+        self.flush_rows = flush_rows
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        self._pending: List[_Pending] = []
+        self._fd: Optional[int] = None
+        self._seq = 0
+        self._sealed: List[str] = []
+        self._flush_lock = asyncio.Lock()
+        # held by fsync and by segment rotation, so an fsync never sees a closed fd
+        self._sync_lock = asyncio.Lock()
+        self._sync_waiter: Optional[asyncio.Future] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.appended = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.fsyncs = 0
+        self.replayed = 0
+        self.torn = 0
+        self.retried = 0
+        self.dead = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def logged(self) -> bool:
+        return self.durability != "memory"
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}.log")
+
+    def _open_segment(self) -> None:
+        self._seq += 1
+        self._fd = os.open(self._segment_path(self._seq), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _log(self, items: List[_Pending]) -> None:
+        # small appends land in the page cache, so they are cheap enough for the event loop
+        if self._fd is not None and items:
+            os.write(self._fd, b"".join(encode(p.form, p.fields, p.attempts) for p in items))
+
+    async def start(self) -> None:
+        """Replay left-over segments into the databases, then start the flusher."""
+        if self.logged:
+            os.makedirs(self.directory, exist_ok=True)
+            segments = sorted(n for n in os.listdir(self.directory) if n.endswith(".log") and n[:-4].isdigit())
+            for name in segments:
+                path = os.path.join(self.directory, name)
+                with open(path, "rb") as fh:
+                    for line in fh:
+                        item = decode(line)
+                        if item is None:
+                            self.torn += 1
+                            continue
+                        self._pending.append(item)
+                        self.replayed += 1
+                self._sealed.append(path)
+            if segments:
+                self._seq = int(segments[-1][:-4])
+            self._open_segment()
+            await self.flush()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def append(self, form: str, fields: Dict[str, Any]) -> None:
+        """Buffer one submission; returns once it is as durable as INGEST_DURABILITY promises."""
+        if len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            raise BufferFull(f"{len(self._pending)} submissions are waiting to be stored")
+        item = _Pending(form, fields)
+        self._log([item])
+        self._pending.append(item)
+        self.appended += 1
+        if len(self._pending) >= self.flush_rows:
+            self._wake.set()
+        if self.durability == "fsync":
+            await self._sync()
+
+    async def _sync(self) -> None:
+        fut = self._sync_waiter
+        if fut is None:
+            fut = self._sync_waiter = asyncio.get_running_loop().create_future()
+            task = asyncio.get_running_loop().create_task(self._fsync(fut))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        await asyncio.shield(fut)
+
+    async def _fsync(self, fut: asyncio.Future) -> None:
+        async with self._sync_lock:
+            # covers every append made so far; later appends wait for the next fsync
+            if self._sync_waiter is fut:
+                self._sync_waiter = None
+            try:
+                await run_db(os.fsync, self._fd)
+                self.fsyncs += 1
+            except OSError as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(None)
+
+    async def _rotate(self) -> List[_Pending]:
+        """Seal the active segment (and everything pending) and start a new one."""
+        async with self._sync_lock:
+            if self._fd is not None:
+                if self.durability == "fsync":
+                    await run_db(os.fsync, self._fd)
+                os.close(self._fd)
+                self._sealed.append(self._segment_path(self._seq))
+                self._open_segment()
+            items, self._pending = self._pending, []
+            return items
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # e.g. the log's disk is full: keep serving, retry on the next tick
+                self.last_error = str(e)
+
+    async def flush(self) -> None:
+        """Store every buffered submission now."""
+        async with self._flush_lock:
+            if not self._pending and not self._sealed:
+                return
+            t0 = time.perf_counter()
+            items = await self._rotate()
+            by_form: Dict[str, List[_Pending]] = {}
+            for item in items:
+                by_form.setdefault(item.form, []).append(item)
+            # one batch per form; forms have their own writer threads, so they go in parallel
+            failed = await asyncio.gather(*(self._store(form, batch) for form, batch in by_form.items()))
+            retry, dead = [], []
+            for item in (item for batch in failed for item in batch):
+                item.attempts += 1
+                (dead if item.attempts >= self.max_attempts else retry).append(item)
+            if dead:
+                self.dead += len(dead)
+                if self.logged:
+                    with open(os.path.join(self.directory, "dead.log"), "ab") as fh:
+                        fh.write(b"".join(encode(p.form, p.fields, p.attempts) for p in dead))
+            if retry:
+                self.retried += len(retry)
+                self._log(retry)
+                self._pending[:0] = retry
+            if self._sealed:
+                if retry and self.durability == "fsync":
+                    await self._sync()
+                for path in self._sealed:
+                    os.remove(path)
+                self._sealed = []
+            elapsed = (time.perf_counter() - t0) * 1000
+            self.flushes += 1
+            self._flush_seconds += elapsed / 1000
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+
+    async def _store(self, form: str, items: List[_Pending]) -> List[_Pending]:
+        """Write one form's batch; returns the submissions that could not be stored."""
+        try:
+            await self._flush(form, [p.fields for p in items])
+            self.flushed += len(items)
+            return []
+        except Exception as e:
+            self.last_error = f"{form}: {e}"
+            if len(items) == 1:
+                return items
+        # a bad submission fails its whole batch: find it, and store the rest
+        failed = []
+        for item in items:
+            try:
+                await self._flush(form, [item.fields])
+                self.flushed += 1
+            except Exception as e:
+                self.last_error = f"{form}: {e}"
+                failed.append(item)
+        return failed
+
+    async def close(self) -> None:
+        """Stop the flusher and store what is left; anything that still fails stays in the log."""
+        if self._task is not None:
+            # not cancelled: a flush cut short would leave stored submissions in the log
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+                if not self._pending:
+                    os.remove(self._segment_path(self._seq))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "durability": self.durability,
+            "depth": len(self._pending),
+            "appended": self.appended,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "fsyncs": self.fsyncs,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._flush_seconds * 1000 / self.flushes, 3) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "replayed": self.replayed,
+            "torn": self.torn,
+            "retried": self.retried,
+            "dead": self.dead,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
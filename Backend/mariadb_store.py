@@ -0,0 +1,467 @@
+"""FormStore backed by one shared MariaDB database.
+
+MARIADB_URL names a single database, so every form's tables live side by
+side in it; a marker file in the data directory records which forms exist.
+All driver calls run on the DB executor with a connection from the
+``MariaDBPool``, which is created on first use.
+"""
+import os
+import threading
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pymysql
+
+from . import metrics, rollups
+from .aggregate import AggregateQuery, histogram_edges, sql_result
+from .aio import run_db
+from .form_store import (
+    FormExists, FormNotFound, FormStore, RowStream, StoreError,
+    db_path, explicit_id, fetch_chunks, group_by_columns, insert_rows_one_by_one, safe_name, scan_statement,
+)
+from .form_catalog import FormCatalog
+from .mariadb_pool import MariaDBPool
+from .rollups import Dimension
+from .row_query import RowQuery
+from .schema_cache import SchemaCache
+from .slowlog import SlowLog, explain_mysql
+from .sql import aggregate_sql, histogram_sql, ident, insert_sql, select_sql, update_sql
+
+_QUERY = metrics.DB_SECONDS.labels("mariadb", "query")
+_EXECUTE = metrics.DB_SECONDS.labels("mariadb", "execute")
+_FETCH = metrics.DB_SECONDS.labels("mariadb", "fetch")
+_LISTED = metrics.DB_ROWS.labels("mariadb", "list_rows")
+
+
+class MariaDBStore(FormStore):
+    kind = "mariadb"
+
+    def __init__(
+        self,
+        data_dir: str,
+        database: str,
+        pool_factory: Callable[[], MariaDBPool],
+        schema_cache: SchemaCache,
+        catalog: FormCatalog,
+        bulk_chunk_rows: int = 500,
+        export_chunk_rows: int = 1000,
+        slow_log: Optional[SlowLog] = None,
+    ):
+        self.data_dir = data_dir
+        self.catalog = catalog
+        self.database = database
+        self.schema_cache = schema_cache
+        self.bulk_chunk_rows = bulk_chunk_rows
+        self.export_chunk_rows = export_chunk_rows
+        self.slow_log = slow_log or SlowLog(threshold_ms=-1)
+        self._pool_factory = pool_factory
+        self._pool: Optional[MariaDBPool] = None
+        self._pool_lock = threading.Lock()
+        self._consecutive: Optional[bool] = None
+
+    @property
+    def pool(self) -> MariaDBPool:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    pool = self._pool_factory()
+                    pool.warm()
+                    self._pool = pool
+        return self._pool
+
+    def storage_key(self, form: str) -> str:
+        # every form's tables are in the one database, so a table written through one form changes it for all
+        return f"mariadb:{self.database}"
+
+    def marker(self, form: str) -> str:
+        return db_path(self.data_dir, form) + ".mariadb"
+
+    def _require(self, form: str) -> None:
+        if not self.catalog.contains(safe_name(form), self.kind):
+            raise FormNotFound(form)
+
+    async def _run(self, fn, cursorclass=None):
+        """Run ``fn(cur)`` on a pooled connection, off the event loop."""
+        def work():
+            with _QUERY.time(), self.pool.connection() as conn:
+                with conn.cursor(cursorclass) as cur:
+                    return fn(cur)
+
+        try:
+            return await run_db(work)
+        except pymysql.MySQLError as e:
+            raise StoreError(str(e)) from e
+
+    async def create_form(self, form: str) -> str:
+        # the database itself is MARIADB_URL's; the marker only records the form name
+        marker = self.marker(form)
+        if os.path.exists(marker):
+            raise FormExists(form)
+        with open(marker, "w") as fh:
+            fh.write("mariadb")
+        self.catalog.add(safe_name(form), self.kind)
+        return "mariadb"
+
+    async def form_exists(self, form: str) -> bool:
+        return self.catalog.contains(safe_name(form), self.kind)
+
+    async def list_forms(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> Tuple[List[str], Optional[str]]:
+        self.catalog.maybe_refresh()
+        return self.catalog.page(prefix, after, limit)
+
+    async def drop_form(self, form: str) -> Dict[str, Any]:
+        if not self.database:
+            raise StoreError("no db name in MARIADB_URL")
+        # drops the whole shared database, as this endpoint always has
+
+        def drop():
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f"DROP DATABASE IF EXISTS `{self.database}`")
+            # pooled connections still have the dropped database selected
+            self.pool.reset()
+
+        try:
+            await run_db(drop)
+        except pymysql.MySQLError as e:
+            raise StoreError(str(e)) from e
+        self.schema_cache.invalidate(self.storage_key(form))
+        if os.path.exists(self.marker(form)):
+            os.remove(self.marker(form))
+        self.catalog.discard(safe_name(form), self.kind)
+        return {"dropped_db": self.database}
+
+    async def create_table(self, form: str, table: str, columns: List[Tuple[str, str]]) -> None:
+        self._require(form)
+        sql = (f"CREATE TABLE IF NOT EXISTS {ident(table)} (id INT PRIMARY KEY AUTO_INCREMENT, "
+               + ", ".join(f"{ident(name)} {ctype}" for name, ctype in columns)
+               + ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4")
+        await self._run(lambda cur: cur.execute(sql))
+        self.schema_cache.invalidate(self.storage_key(form), table)
+
+    async def show_tables(self, form: str) -> List[Any]:
+        self._require(form)
+
+        def query(cur):
+            cur.execute("SHOW TABLES")
+            return list(cur.fetchall())
+
+        return await self._run(query)
+
+    async def describe_table(self, form: str, table: str) -> List[Any]:
+        self._require(form)
+
+        def query(cur):
+            cur.execute(f"DESC {ident(table)}")
+            return list(cur.fetchall())
+
+        return await self._run(query)
+
+    async def columns(self, form: str, table: str) -> Dict[str, str]:
+        self._require(form)
+        key = self.storage_key(form)
+        cols = self.schema_cache.get(key, table)
+        if cols is None:
+            def query(cur):
+                cur.execute(
+                    "SELECT COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS"
+                    " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    (table,),
+                )
+                return {name.lower(): ctype for name, ctype in cur.fetchall()}
+
+            cols = await self._run(query)
+            if cols:
+                self.schema_cache.set(key, table, cols)
+        return cols
+
+    async def indexes(self, form: str, table: str) -> List[Dict[str, Any]]:
+        self._require(form)
+
+        def query(cur):
+            cur.execute(
+                "SELECT INDEX_NAME, COLUMN_NAME, NON_UNIQUE FROM information_schema.STATISTICS"
+                " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+                (table,),
+            )
+            found: Dict[str, Dict[str, Any]] = {}
+            for name, col, non_unique in cur.fetchall():
+                ix = found.setdefault(name, {"name": name, "columns": [], "unique": not non_unique})
+                ix["columns"].append(col.lower())
+            return list(found.values())
+
+        return await self._run(query)
+
+    async def create_index(self, form: str, table: str, name: str, columns: List[str], unique: bool = False) -> None:
+        types = await self.columns(form, table)
+
+        def key(col):
+            # InnoDB can only index a prefix of TEXT/BLOB columns
+            ctype = types.get(col.lower(), "").lower()
+            return ident(col) + ("(191)" if "text" in ctype or "blob" in ctype else "")
+
+        sql = (f"CREATE {'UNIQUE ' if unique else ''}INDEX {ident(name)} ON {ident(table)} "
+               f"({', '.join(key(c) for c in columns)})")
+        await self._run(lambda cur: cur.execute(sql))
+
+    async def drop_index(self, form: str, table: str, name: str) -> None:
+        self._require(form)
+        sql = f"DROP INDEX {ident(name)} ON {ident(table)}"
+        await self._run(lambda cur: cur.execute(sql))
+
+    async def drop_table(self, form: str, table: str) -> None:
+        self._require(form)
+        sql = f"DROP TABLE IF EXISTS {ident(table)}"
+
+        def drop(cur):
+            cur.execute(sql)
+            # the triggers went with the table; the side tables and definitions did not
+            for name, _ in self._rollups(cur, table):
+                self._drop_rollup(cur, table, name)
+
+        await self._run(drop)
+        self.schema_cache.invalidate(self.storage_key(form), table)
+
+    async def insert_row(self, form: str, table: str, row: Dict[str, Any]) -> Any:
+        self._require(form)
+        keys = tuple(row)
+        sql = insert_sql("mariadb", table, keys)
+        values = [row[k] for k in keys]
+
+        def insert(cur):
+            cur.execute(sql, values)
+            return cur.lastrowid
+
+        return await self._run(insert)
+
+    async def insert_rows(self, form: str, table: str, rows: List[Any], results: List[Any]) -> None:
+        self._require(form)
+
+        def work():
+            with self.pool.connection() as conn:
+                conn.begin()
+                with conn.cursor() as cur:
+                    self._insert_rows(cur, table, rows, results)
+                conn.commit()
+
+        try:
+            await run_db(work)
+        except pymysql.MySQLError as e:
+            raise StoreError(str(e)) from e
+
+    def _consecutive_ids(self, cur) -> bool:
+        """Whether a multi-row INSERT is given consecutive auto-increment ids.
+
+        InnoDB only promises that with innodb_autoinc_lock_mode 0 or 1 and an
+        auto_increment_increment of 1. Mode 2 (MySQL 8's default, and Galera's)
+        may interleave ids with concurrent inserts.
+        """
+        if self._consecutive is None:
+            cur.execute("SELECT @@auto_increment_increment, @@innodb_autoinc_lock_mode")
+            increment, mode = cur.fetchone()
+            self._consecutive = int(increment) == 1 and int(mode) in (0, 1)
+        return self._consecutive
+
+    def _insert_rows(self, cur, table: str, rows, results) -> None:
+        consecutive = self._consecutive_ids(cur)
+        for keys, idxs in group_by_columns(rows, results).items():
+            id_key = explicit_id(keys)
+            single = insert_sql("mariadb", table, keys)
+            for start in range(0, len(idxs), self.bulk_chunk_rows):
+                chunk = idxs[start:start + self.bulk_chunk_rows]
+                params = [[rows[i][k] for k in keys] for i in chunk]
+                cur.execute("SAVEPOINT bulk_group")
+                try:
+                    if id_key is not None or consecutive:
+                        # one multi-row INSERT per chunk (what pymysql's executemany emits), built here
+                        # so LAST_INSERT_ID() is known to belong to exactly this chunk
+                        cur.execute(insert_sql("mariadb", table, keys, len(chunk)), [v for row in params for v in row])
+                        if id_key is not None:
+                            ids = [rows[i][id_key] for i in chunk]
+                        else:
+                            ids = range(cur.lastrowid, cur.lastrowid + len(chunk))
+                    else:
+                        # ids would not be computable; one statement per row, still one transaction
+                        ids = []
+                        for values in params:
+                            cur.execute(single, values)
+                            ids.append(cur.lastrowid)
+                except pymysql.MySQLError:
+                    cur.execute("ROLLBACK TO SAVEPOINT bulk_group")
+                    insert_rows_one_by_one(cur, single, chunk, params, results)
+                    continue
+                cur.execute("RELEASE SAVEPOINT bulk_group")
+                for i, rowid in zip(chunk, ids):
+                    results[i] = {"id": rowid}
+
+    async def list_rows(self, form: str, table: str, query: RowQuery) -> List[Dict[str, Any]]:
+        self._require(form)
+        sql = select_sql("mariadb", table, query.shape())
+        params = query.params()
+
+        def query(cur):
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            t1 = time.perf_counter()
+            # DictCursor rows are already dict-like
+            rows = [dict(r) for r in cur.fetchall()]
+            t2 = time.perf_counter()
+            _EXECUTE.observe(t1 - t0)
+            _FETCH.observe(t2 - t1)
+            _LISTED.inc(len(rows))
+            self.slow_log.observe(
+                "mariadb", safe_name(form), sql, params, t2 - t0, len(rows),
+                lambda: explain_mysql(cur, sql, params), "list_rows",
+            )
+            return rows
+
+        return await self._run(query, pymysql.cursors.DictCursor)
+
+    async def update_rows(self, form: str, table: str, values: Dict[str, Any], where: Dict[str, Any]) -> int:
+        self._require(form)
+        sql = update_sql("mariadb", table, tuple(values), tuple(where))
+        params = list(values.values()) + list(where.values())
+
+        def update(cur):
+            t0 = time.perf_counter()
+            cur.execute(sql, params)
+            count = cur.rowcount
+            self.slow_log.observe(
+                "mariadb", safe_name(form), sql, params, time.perf_counter() - t0, count,
+                lambda: explain_mysql(cur, sql, params), "update_rows",
+            )
+            return count
+
+        return await self._run(update)
+
+    async def aggregate(self, form: str, table: str, query: AggregateQuery) -> Dict[str, Any]:
+        self._require(form)
+        shape, params = query.filter_shape(), query.filter_params()
+
+        def run(cur):
+            groups = hist = None
+            if query.metrics:
+                cur.execute(aggregate_sql("mariadb", table, query.group_by, query.metrics, shape), params + [query.limit])
+                groups = cur.fetchall()
+            if query.histogram:
+                bounds, buckets = histogram_sql("mariadb", table, query.histogram, shape)
+                cur.execute(bounds, params)
+                lo, hi = cur.fetchone()
+                if lo is not None:
+                    width, _ = histogram_edges(float(lo), float(hi), query.bins)
+                    cur.execute(buckets, [lo, width] + params)
+                    hist = (lo, hi, cur.fetchall())
+            return sql_result(query, groups, hist)
+
+        return await self._run(run)
+
+    @staticmethod
+    def _rollups(cur, table: str) -> List[Tuple[str, str]]:
+        cur.execute(
+            "SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (rollups.META,),
+        )
+        if cur.fetchone() is None:
+            return []
+        cur.execute(rollups.definitions_sql("mariadb"), (table.lower(),))
+        return list(cur.fetchall())
+
+    @staticmethod
+    def _drop_rollup(cur, table: str, name: str) -> None:
+        for stmt in rollups.drop_ddl("mariadb", table, name):
+            cur.execute(stmt)
+        cur.execute(rollups.unregister_sql("mariadb"), (table.lower(), name.lower()))
+
+    @staticmethod
+    def _rebuild(cur, table: str, name: str, dims: List[Dimension]) -> None:
+        # one transaction: INSERT ... SELECT takes shared locks on the rows it counts,
+        # so inserts racing the rebuild wait and are then counted by the triggers
+        cur.connection.begin()
+        try:
+            for stmt in rollups.rebuild_sql("mariadb", table, name, dims):
+                cur.execute(stmt)
+            cur.connection.commit()
+        except BaseException:
+            cur.connection.rollback()
+            raise
+
+    async def rollups(self, form: str, table: str) -> List[Tuple[str, str]]:
+        self._require(form)
+        return await self._run(lambda cur: self._rollups(cur, table))
+
+    async def create_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        types = await self.columns(form, table)
+        ddl = [rollups.meta_ddl("mariadb")] + rollups.create_ddl("mariadb", table, name, dims, types)
+
+        def create(cur):
+            # DDL commits implicitly: the triggers go live first, then the backfill replaces their counts
+            for stmt in ddl:
+                cur.execute(stmt)
+            self._rebuild(cur, table, name, dims)
+            cur.execute(rollups.register_sql("mariadb"), (table.lower(), name.lower(), rollups.dumps(dims)))
+
+        await self._run(create)
+
+    async def rebuild_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        self._require(form)
+        await self._run(lambda cur: self._rebuild(cur, table, name, dims))
+
+    async def read_rollup(self, form: str, table: str, name: str, dims: List[Dimension], limit: int) -> List[tuple]:
+        self._require(form)
+        sql = rollups.read_sql("mariadb", table, name, dims)
+
+        def query(cur):
+            cur.execute(sql, (limit,))
+            return list(cur.fetchall())
+
+        return await self._run(query)
+
+    async def drop_rollup(self, form: str, table: str, name: str) -> None:
+        self._require(form)
+        await self._run(lambda cur: self._drop_rollup(cur, table, name))
+
+    async def open_export(
+        self, form: str, table: str,
+        fields: Optional[Tuple[str, ...]] = None, filters: Tuple[Tuple[str, str, tuple], ...] = (),
+    ) -> RowStream:
+        self._require(form)
+        sql, params = scan_statement("mariadb", table, fields, filters)
+
+        def open_cursor():
+            stack = ExitStack()
+            try:
+                conn = stack.enter_context(self.pool.connection())
+                # server-side cursor: rows stream from MariaDB as the client reads them
+                cur = stack.enter_context(conn.cursor(pymysql.cursors.SSCursor))
+                t0 = time.perf_counter()
+                cur.execute(sql, params)
+                started = time.perf_counter() - t0
+            except BaseException:
+                stack.close()
+                raise
+
+            def done(rows, fetched, complete):
+                # an export closed early may have given the connection back already; and EXPLAIN
+                # on a connection with unread streamed rows would first read all of them
+                explain = (lambda: explain_mysql(cur, sql, params)) if complete else None
+                self.slow_log.observe("mariadb", safe_name(form), sql, params, started + fetched, rows, explain, "scan")
+
+            cols = [d[0] for d in cur.description]
+            return RowStream(cols, fetch_chunks(cur, self.export_chunk_rows, self.kind, done), stack.close)
+
+        try:
+            return await run_db(open_cursor)
+        except pymysql.MySQLError as e:
+            raise StoreError(str(e)) from e
+
+    async def submit(self, form: str, fields: Dict[str, Any]) -> None:
+        # all forms share one database, so there is no per-form submissions table here;
+        # the API keeps storing submissions in the per-form SQLite files
+        raise StoreError("submissions are stored in SQLite")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "catalog": self.catalog.stats(),
+            "mariadb": self._pool.stats() if self._pool is not None else None,
+        }
@@ -0,0 +1,262 @@
+"""FormStore that keeps everything in process memory.
+
+Meant for tests and demos (FORM_STORE=memory): no files, no server, and
+nothing survives a restart. Methods never await, so each call runs to
+completion on the event loop and needs no locking.
+"""
+import operator
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import rollups
+from .aggregate import AggregateQuery, compute, value_range
+from .form_store import FormExists, FormNotFound, FormStore, RowStream, StoreError
+from .rollups import Dimension
+from .row_query import RowQuery
+
+
+class _Table:
+    __slots__ = ("columns", "rows", "next_id", "indexes", "rollups")
+
+    def __init__(self, columns: List[Tuple[str, str]]):
+        self.columns = [("id", "INTEGER")] + [c for c in columns if c[0].lower() != "id"]
+        self.rows: Dict[Any, Dict[str, Any]] = {}  # id -> row, in insertion order
+        self.next_id = 1
+        # declared only (lookups still scan); kept so the index API behaves like the real backends
+        self.indexes: Dict[str, Dict[str, Any]] = {"PRIMARY": {"name": "PRIMARY", "columns": ["id"], "unique": True}}
+        # rollup name -> dimensions JSON; counted when read, there are no triggers to maintain them
+        self.rollups: Dict[str, str] = {}
+
+    def names(self) -> List[str]:
+        return [name for name, _ in self.columns]
+
+    def insert(self, row: Dict[str, Any]) -> Any:
+        # column names match in any case, as in SQL; rows are stored under the declared names
+        declared = {name.lower(): name for name in self.names()}
+        for key in row:
+            if key.lower() not in declared:
+                raise StoreError(f"table has no column named {key}")
+        row = {declared[key.lower()]: value for key, value in row.items()}
+        rowid = row.get("id")
+        if rowid is None:
+            rowid = self.next_id
+        elif rowid in self.rows:
+            raise StoreError("UNIQUE constraint failed: id")
+        self.next_id = max(self.next_id, rowid + 1) if isinstance(rowid, int) else self.next_id
+        stored = {name: None for name in self.names()}
+        stored.update(row)
+        stored["id"] = rowid
+        self.rows[rowid] = stored
+        return rowid
+
+
+_COMPARE = {
+    "eq": operator.eq, "ne": operator.ne, "lt": operator.lt,
+    "lte": operator.le, "gt": operator.gt, "gte": operator.ge,
+}
+
+
+def _matches(value: Any, op: str, values: Tuple[Any, ...]) -> bool:
+    # NULL never matches a comparison, as in SQL
+    if value is None:
+        return False
+    if op == "in":
+        return value in values
+    try:
+        return _COMPARE[op](value, values[0])
+    except TypeError:
+        return False
+
+
+class MemoryStore(FormStore):
+    kind = "memory"
+
+    def __init__(self, export_chunk_rows: int = 1000):
+        self.export_chunk_rows = export_chunk_rows
+        self._forms: Dict[str, Dict[str, _Table]] = {}
+
+    def _form(self, form: str) -> Dict[str, _Table]:
+        tables = self._forms.get(form)
+        if tables is None:
+            raise FormNotFound(form)
+        return tables
+
+    def _table(self, form: str, table: str) -> _Table:
+        t = self._form(form).get(table.lower())
+        if t is None:
+            raise StoreError(f"no such table: {table}")
+        return t
+
+    async def create_form(self, form: str) -> str:
+        if form in self._forms:
+            raise FormExists(form)
+        self._forms[form] = {}
+        return "memory"
+
+    async def form_exists(self, form: str) -> bool:
+        return form in self._forms
+
+    async def list_forms(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> Tuple[List[str], Optional[str]]:
+        names = sorted(n for n in self._forms if n.startswith(prefix) and (after is None or n > after))
+        if len(names) > limit:
+            return names[:limit], names[limit - 1]
+        return names, None
+
+    async def drop_form(self, form: str) -> Dict[str, Any]:
+        self._form(form)
+        del self._forms[form]
+        return {}
+
+    async def create_table(self, form: str, table: str, columns: List[Tuple[str, str]]) -> None:
+        self._form(form).setdefault(table.lower(), _Table(columns))
+
+    async def show_tables(self, form: str) -> List[Any]:
+        return list(self._form(form))
+
+    async def describe_table(self, form: str, table: str) -> List[Any]:
+        t = self._form(form).get(table.lower())
+        if t is None:
+            return []
+        return [
+            dict(cid=i, name=name, type=ctype, notnull=0, dflt_value=None, pk=int(name == "id"))
+            for i, (name, ctype) in enumerate(t.columns)
+        ]
+
+    async def drop_table(self, form: str, table: str) -> None:
+        self._form(form).pop(table.lower(), None)
+
+    async def insert_row(self, form: str, table: str, row: Dict[str, Any]) -> Any:
+        return self._table(form, table).insert(row)
+
+    async def insert_rows(self, form: str, table: str, rows: List[Any], results: List[Any]) -> None:
+        t = self._table(form, table)
+        for i, row in enumerate(rows):
+            if results[i] is None:
+                try:
+                    results[i] = {"id": t.insert(row)}
+                except StoreError as e:
+                    results[i] = {"error": str(e)}
+
+    async def columns(self, form: str, table: str) -> Dict[str, str]:
+        t = self._form(form).get(table.lower())
+        return {} if t is None else {name.lower(): ctype for name, ctype in t.columns}
+
+    async def indexes(self, form: str, table: str) -> List[Dict[str, Any]]:
+        return [dict(ix) for ix in self._table(form, table).indexes.values()]
+
+    async def create_index(self, form: str, table: str, name: str, columns: List[str], unique: bool = False) -> None:
+        t = self._table(form, table)
+        if name in t.indexes:
+            raise StoreError(f"index {name} already exists")
+        t.indexes[name] = {"name": name, "columns": [c.lower() for c in columns], "unique": unique}
+
+    async def drop_index(self, form: str, table: str, name: str) -> None:
+        if self._table(form, table).indexes.pop(name, None) is None:
+            raise StoreError(f"no such index: {name}")
+
+    async def list_rows(self, form: str, table: str, query: RowQuery) -> List[Dict[str, Any]]:
+        t = self._table(form, table)
+        names = {name.lower(): name for name in t.names()}
+
+        def get(row, col):
+            return row.get(names.get(col.lower(), col))
+
+        def sort_key(value, rowid):
+            # NULLs first ascending, as in SQL
+            return (value is not None, 0 if value is None else value, rowid)
+
+        def key(row):
+            return sort_key(get(row, query.sort), row["id"])
+
+        rows = [r for r in t.rows.values() if all(_matches(get(r, c), op, vs) for c, op, vs in query.filters)]
+        desc = query.direction == "desc"
+        if query.seek is not None:
+            last = sort_key(*query.seek)
+            rows = [r for r in rows if (key(r) < last if desc else key(r) > last)]
+        rows.sort(key=key, reverse=desc)
+        if query.fields:
+            return [{f: get(r, f) for f in query.fields} for r in rows[:query.limit]]
+        return [dict(r) for r in rows[:query.limit]]
+
+    async def update_rows(self, form: str, table: str, values: Dict[str, Any], where: Dict[str, Any]) -> int:
+        t = self._table(form, table)
+        affected = 0
+        for row in t.rows.values():
+            if all(row.get(k) == v for k, v in where.items()):
+                row.update(values)
+                affected += 1
+        return affected
+
+    async def open_export(
+        self, form: str, table: str,
+        fields: Optional[Tuple[str, ...]] = None, filters: Tuple[Tuple[str, str, tuple], ...] = (),
+    ) -> RowStream:
+        t = self._table(form, table)
+        lookup = {name.lower(): name for name in t.names()}
+        names = [lookup.get(f.lower(), f) for f in fields] if fields else t.names()
+        data = [
+            tuple(row.get(n) for n in names) for row in t.rows.values()
+            if all(_matches(row.get(lookup.get(c.lower(), c)), op, vs) for c, op, vs in filters)
+        ]
+        size = self.export_chunk_rows
+        return RowStream(names, (data[i:i + size] for i in range(0, len(data), size)))
+
+    async def aggregate(self, form: str, table: str, query: AggregateQuery) -> Dict[str, Any]:
+        # no query engine here: always the NumPy path
+        hist_range = None
+        if query.histogram:
+            first = await self.open_export(form, table, (query.histogram,), query.filters)
+            hist_range = value_range(first.chunks)
+        scan = await self.open_export(form, table, query.scan_columns(), query.filters)
+        return compute(scan.columns, scan.chunks, query, hist_range)
+
+    async def rollups(self, form: str, table: str) -> List[Tuple[str, str]]:
+        t = self._form(form).get(table.lower())
+        return sorted(t.rollups.items()) if t is not None else []
+
+    async def create_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        self._table(form, table).rollups[name.lower()] = rollups.dumps(dims)
+
+    async def rebuild_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        self._table(form, table)
+
+    async def read_rollup(self, form: str, table: str, name: str, dims: List[Dimension], limit: int) -> List[tuple]:
+        t = self._table(form, table)
+        lookup = {name.lower(): name for name in t.names()}
+
+        def key(row, d):
+            v = row.get(lookup[d.column.lower()])
+            return str(v)[:10] if d.day and v is not None else v
+
+        counts = Counter(tuple(key(row, d) for d in dims) for row in t.rows.values())
+        # NULLs first, as in SQL
+        order = sorted(counts, key=lambda k: tuple((v is not None, str(v)) for v in k))
+        return [k + (counts[k],) for k in order[:limit]]
+
+    async def drop_rollup(self, form: str, table: str, name: str) -> None:
+        self._table(form, table).rollups.pop(name.lower(), None)
+
+    async def submit(self, form: str, fields: Dict[str, Any]) -> None:
+        tables = self._forms.setdefault(form, {})
+        t = tables.get("submissions")
+        if t is None:
+            t = tables["submissions"] = _Table(
+                [("submitted_at", "TEXT")] + [(k, "TEXT") for k in fields if k.lower() != "submitted_at"]
+            )
+        known = {name.lower() for name in t.names()}
+        for key in fields:
+            if key.lower() not in known:
+                t.columns.append((key, "TEXT"))
+                for row in t.rows.values():
+                    row[key] = None
+        # the SQLite table's DEFAULT CURRENT_TIMESTAMP
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        t.insert(dict({"submitted_at": now}, **fields))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"memory": {
+            "forms": len(self._forms),
+            "tables": sum(len(tables) for tables in self._forms.values()),
+            "rows": sum(len(t.rows) for tables in self._forms.values() for t in tables.values()),
+        }}
@@ -0,0 +1,322 @@
+"""Counters, gauges and histograms rendered in the Prometheus text format.
+
+Dependency-free and importable both as ``Backend.metrics`` (the FastAPI
+service) and as ``metrics`` (the Flask apps run from this directory). Each
+import has its own registry, and each app serves it at GET /metrics.
+
+Recording is cheap enough to leave on: a labelled child is looked up once
+and kept (``DB_SECONDS.labels("sqlite", "execute")``). Observing then costs
+one bisect and a few additions under a lock. Values that already live
+elsewhere, such as pool and queue gauges, are not copied on every change.
+``Registry.collect`` reads them when /metrics is scraped.
+
+Shared metrics:
+
+* ``http_request_duration_seconds{app,method,route,status}``: from the
+  request to the last response byte, keyed by the route *template*, so
+  ``/forms/{form_name}/...`` is one series, not one per form.
+* ``http_response_bytes_total``: response body bytes, with the same labels.
+* ``db_seconds{backend,phase}``: where database time goes. ``connect`` is
+  opening a connection and ``wait`` is waiting for a pooled one. ``query``
+  is a store call holding a connection, and ``execute``/``fetch`` split the
+  row reads into running the statement and reading its rows. ``write`` is
+  a queued SQLite write, as its caller waits for it, and ``commit`` is the
+  writer's group commit.
+* ``db_rows_total{backend,op}``: rows read, per kind of read.
+* ``encode_seconds{format}``: serializing responses (JSON pages, exports).
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds: 0.5 ms .. 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = Tuple[str, Dict[str, str], float]  # (name suffix, labels, value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """The child for these label values; keep it to skip the lookup next time."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[Sample]:
+        for key, child in list(self._children.items()):
+            yield from child.samples(dict(zip(self.labelnames, key)))
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self, labels) -> Iterator[Sample]:
+        yield "_total", labels, self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self):
+        return _CounterChild()
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+    def samples(self, labels) -> Iterator[Sample]:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            running += n
+            yield "_bucket", dict(labels, le=_number(bound)), running
+        yield "_sum", labels, total
+        yield "_count", labels, running
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, fn: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]) -> None:
+        """Add a scrape-time source of (name, help, type, samples) families, e.g. pool gauges."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        out = []
+
+        def family(name, help, kind, samples):
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                out.append(f"{name}{suffix}{_labels(labels)} {_number(value)}")
+
+        for metric in self._metrics:
+            family(metric.name, metric.help, metric.kind, metric.samples())
+        for fn in self._collectors:
+            for name, help, kind, samples in fn():
+                family(name, help, kind, samples)
+        return "\n".join(out) + "\n"
+
+
+def gauges(prefix: str, stats: Dict[str, object], help: str = "") -> Iterator[Tuple[str, str, str, List[Sample]]]:
+    """One gauge per numeric leaf of a nested stats dict: {"sqlite": {"idle": 3}} -> <prefix>_sqlite_idle 3."""
+    for key, value in stats.items():
+        name = f"{prefix}_{''.join(ch if ch.isalnum() else '_' for ch in str(key))}"
+        if isinstance(value, dict):
+            yield from gauges(name, value, help)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, help or name, "gauge", [("", {}, value)]
+
+
+def merge(texts: Dict[str, str], label: str = "worker") -> str:
+    """Combine the /metrics output of several processes, keyed by ``label`` value.
+
+    Each family is declared once and every sample gets the process's label.
+    """
+    families: Dict[str, List[str]] = {}
+    headers: Dict[str, List[str]] = {}
+    for value, text in texts.items():
+        tag = f'{label}="{_escape(value)}"'
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                family = line.split(" ", 3)[2]
+                if family not in families:
+                    families[family] = []
+                    headers[family] = []
+                if len(headers[family]) < 2:
+                    headers[family].append(line)
+            elif line and family is not None:
+                # a metric name never contains "{" or " ", so the first of them ends it
+                end = min(i for i in (line.find("{"), line.find(" ")) if i >= 0)
+                if line[end] == "{":
+                    line = f"{line[:end + 1]}{tag},{line[end + 1:]}"
+                else:
+                    line = f"{line[:end]}{{{tag}}}{line[end:]}"
+                families[family].append(line)
+    out = []
+    for family, samples in families.items():
+        out.extend(headers[family])
+        out.extend(samples)
+    return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from request to last response byte",
+    ("app", "method", "route", "status"),
+)
+HTTP_BYTES = REGISTRY.counter("http_response_bytes", "Response body bytes", ("app", "method", "route", "status"))
+DB_SECONDS = REGISTRY.histogram("db_seconds", "Database time by backend and phase", ("backend", "phase"))
+DB_ROWS = REGISTRY.counter("db_rows", "Rows read from the database", ("backend", "op"))
+ENCODE_SECONDS = REGISTRY.histogram("encode_seconds", "Time spent serializing responses", ("format",))
+
+
+def timed_connect(backend: str, connect: Callable):
+    """Wrap a pool's connect callable so opening connections is timed as phase "connect"."""
+    child = DB_SECONDS.labels(backend, "connect")
+
+    def wrapper(*args, **kwargs):
+        with child.time():
+            return connect(*args, **kwargs)
+
+    return wrapper
+
+
+def instrument_flask(app, name: str) -> None:
+    """Record HTTP_SECONDS/HTTP_BYTES for a Flask app and serve REGISTRY at GET /metrics.
+
+    Flask hands the response to the WSGI server after ``after_request``, so
+    latency here stops when the body is ready rather than when it is sent.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            labels = (name, request.method, route, str(response.status_code))
+            HTTP_SECONDS.labels(*labels).observe(time.perf_counter() - start)
+            HTTP_BYTES.labels(*labels).inc(response.calculate_content_length() or 0)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+class ASGIMetrics:
+    """ASGI middleware recording HTTP_SECONDS and HTTP_BYTES for every HTTP request."""
+
+    def __init__(self, app, name: str):
+        self.app = app
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def wrapped_send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            # the router stores the matched route in the scope; unmatched paths share one series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            labels = (self.name, scope["method"], route, str(status))
+            HTTP_SECONDS.labels(*labels).observe(time.perf_counter() - start)
+            HTTP_BYTES.labels(*labels).inc(size)
@@ -0,0 +1,136 @@
+"""Process-wide MySQL connection pools for the Flask auth apps.
+
+``flask_app.py`` and ``app.py`` used to call ``mysql.connector.connect`` on
+every /signup and /login. They now borrow from a ``MySQLConnectionPool``
+shared by everything in the process that uses the same server, user and
+database. mysql.connector's pool raises as soon as it is exhausted, so
+checkouts are gated by a semaphore and wait up to ``DB_POOL_TIMEOUT`` seconds
+instead.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import pooling
+
+import metrics
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+
+_pools = {}
+_lock = threading.Lock()
+
+_WAIT = metrics.DB_SECONDS.labels("mysql", "wait")
+_CONNECT = metrics.DB_SECONDS.labels("mysql", "connect")
+_QUERY = metrics.DB_SECONDS.labels("mysql", "query")
+
+
+class PoolExhausted(Exception):
+    """No pooled connection became free within DB_POOL_TIMEOUT."""
+
+
+class _Pool:
+    def __init__(self, config, size):
+        # mysql.connector caps pools at 32 connections
+        size = max(1, min(size, pooling.CNX_POOL_MAXSIZE))
+        # creating the pool opens all of its connections, which is the warm-up
+        self.name = _pool_name(config)
+        self.pool = pooling.MySQLConnectionPool(pool_name=self.name, pool_size=size, **config)
+        self.slots = threading.BoundedSemaphore(size)
+        self.size = size
+        self.in_use = 0
+        self.waits = 0
+        self._count = threading.Lock()
+
+
+def _pool_key(config):
+    return (config.get("host"), config.get("port", 3306), config.get("user"), config.get("database"))
+
+
+def _pool_name(config):
+    # pool names are limited to 64 characters of [A-Za-z0-9._:-$*]
+    name = "auth-{}-{}-{}".format(config.get("host"), config.get("user"), config.get("database"))
+    return "".join(ch if ch.isalnum() or ch in "._:-" else "_" for ch in name)[:64]
+
+
+def get_pool(config, size=None):
+    """Return the shared pool for ``config``, creating (and warming) it on first use."""
+    key = _pool_key(config)
+    pool = _pools.get(key)
+    if pool is None:
+        with _lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _Pool(config, size or DB_POOL_SIZE)
+                _pools[key] = pool
+    return pool
+
+
+def warm(config, size=None):
+    """Create the pool for ``config`` so its connections are open before the first request."""
+    get_pool(config, size)
+
+
+@contextmanager
+def connection(config, timeout=None):
+    """Borrow a validated connection; it goes back to the pool on exit.
+
+    A connection whose server side went away (restart, wait_timeout) is
+    reconnected before it is handed out.
+    """
+    pool = get_pool(config)
+    started = time.perf_counter()
+    if not pool.slots.acquire(blocking=False):
+        with pool._count:
+            pool.waits += 1
+        if not pool.slots.acquire(timeout=DB_POOL_TIMEOUT if timeout is None else timeout):
+            raise PoolExhausted("no database connection available")
+    with pool._count:
+        pool.in_use += 1
+    try:
+        conn = pool.pool.get_connection()
+        _WAIT.observe(time.perf_counter() - started)
+        try:
+            if not conn.is_connected():
+                with _CONNECT.time():
+                    conn.reconnect(attempts=2, delay=0)
+            with _QUERY.time():
+                yield conn
+        finally:
+            # for a pooled connection close() resets the session and returns it to the pool
+            conn.close()
+    finally:
+        with pool._count:
+            pool.in_use -= 1
+        pool.slots.release()
+
+
+def stats():
+    """Size, borrowed connections and checkouts that had to wait, per pool."""
+    with _lock:
+        pools = list(_pools.values())
+    return {p.name: {"size": p.size, "in_use": p.in_use, "waits": p.waits} for p in pools}
+
+
+# pool gauges are read when /metrics is scraped
+metrics.REGISTRY.collect(lambda: metrics.gauges("mysql_pool", stats(), "Auth app MySQL pool gauge"))
+
+
+def ensure_index(config, table, name, columns):
+    """Create index ``name`` on ``table`` (``columns``) unless it already exists.
+
+    MySQL has no CREATE INDEX IF NOT EXISTS, so the catalog is checked first.
+    """
+    with connection(config) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT 1 FROM information_schema.STATISTICS"
+            " WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1",
+            (table, name),
+        )
+        if cursor.fetchone() is None:
+            cursor.execute("CREATE INDEX `{}` ON `{}` ({})".format(name, table, ", ".join("`{}`".format(c) for c in columns)))
+        cursor.close()
@@ -0,0 +1,120 @@
+"""Read-through cache of serialized read responses.
+
+Dashboards poll list_rows, show_tables and describe_table, and between
+writes every poll returns the same bytes. The cache keeps the encoded JSON
+body plus an ETag, bounded by total size (LRU) and by age (TTL).
+
+Invalidation uses generations rather than deleting keys. Each form, each
+form's table list and each (form, table) has a counter. An entry remembers
+the counters it was computed under and is only served while they are
+unchanged. A write bumps its table's counter after it commits, so a read
+that raced with the write can never be served afterwards.
+
+ETags hash the body, so a poller whose data did not change gets a 304 even
+after an unrelated invalidation forced a recompute.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_TABLES = object()  # generation slot for a form's table list
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "token", "expires", "size")
+
+    def __init__(self, body: bytes, token: Tuple[int, int], expires: float):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.token = token
+        self.expires = expires
+        self.size = len(body) + 200  # rough per-entry overhead
+
+
+class ResultCache:
+    """max_bytes: total size of cached bodies (0 disables caching); ttl: seconds an entry may be served."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 30.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._gens: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def token(self, form: str, table: Optional[str]) -> Tuple[int, int]:
+        """Current generations for a table (or, with table=None, the form's table list)."""
+        slot = (form, _TABLES if table is None else table.lower())
+        return self._gens.get(form, 0), self._gens.get(slot, 0)
+
+    def get(self, key: Hashable, form: str, table: Optional[str]) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.token == self.token(form, table) and entry.expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, token: Tuple[int, int], body: bytes) -> CachedResponse:
+        """Store ``body``, computed under ``token`` (taken before the read started)."""
+        entry = CachedResponse(body, token, time.monotonic() + self.ttl)
+        if entry.size > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _drop(self, key: Hashable) -> None:
+        # caller holds the lock
+        self._bytes -= self._entries.pop(key).size
+
+    def invalidate(self, form: str, table: Optional[str] = None, tables: bool = False) -> None:
+        """Call after a write commits.
+
+        With ``table``, that table's cached reads go stale. ``tables=True`` also
+        covers the table list (create/drop table). With neither, everything
+        cached for the form goes stale.
+        """
+        with self._lock:
+            if table is None and not tables:
+                self._gens[form] = self._gens.get(form, 0) + 1
+                return
+            if table is not None:
+                slot = (form, table.lower())
+                self._gens[slot] = self._gens.get(slot, 0) + 1
+            if tables:
+                slot = (form, _TABLES)
+                self._gens[slot] = self._gens.get(slot, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "not_modified": self.not_modified,
+        }
@@ -0,0 +1,208 @@
+"""Materialized count rollups, kept current by triggers.
+
+Dashboards want submission counts per day or per field value. Computing
+them from the source table is a full scan per request. A rollup is declared
+once with its dimensions, which are columns or ``day(column)``. Its counts
+live in a side table, ``rollup_<table>_<name>``, with one row per key:
+
+* AFTER INSERT/UPDATE/DELETE triggers on the source table adjust the key's
+  count. They run inside the writing statement, so a count can never
+  disagree with a committed row.
+* Reading a rollup only touches the side table, whose size is the number of
+  distinct keys, not the number of submissions.
+* ``rebuild`` recomputes the side table from the source table (backfill, or
+  repair after rows were written with triggers disabled).
+
+Definitions are kept in the ``_rollups`` table of the same database.
+Keys compare with null-safe equality (``IS`` / ``<=>``), so NULL is a key
+like any other. Reads SUM the counts per key, so the rare duplicate key row
+left by two concurrent first inserts on MariaDB does no harm.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .row_query import InvalidQuery, check_columns
+from .sql import PARAM, ident
+
+META = "_rollups"
+
+# MariaDB's limit on table, column, index and trigger names
+MAX_NAME = 64
+
+_DAY = re.compile(r"^day\((\w+)\)$", re.IGNORECASE)
+
+
+class Dimension:
+    __slots__ = ("column", "day")
+
+    def __init__(self, column: str, day: bool = False):
+        self.column = column
+        self.day = day
+
+    @property
+    def label(self) -> str:
+        return f"day_{self.column.lower()}" if self.day else self.column.lower()
+
+    @property
+    def spec(self) -> str:
+        return f"day({self.column})" if self.day else self.column
+
+    def expr(self, dialect: str, row: str = "") -> str:
+        """The key for a row; ``row`` is "NEW." or "OLD." in triggers."""
+        col = row + ident(self.column)
+        if not self.day:
+            return col
+        # ISO timestamps (CURRENT_TIMESTAMP) start with the date
+        return f"substr({col}, 1, 10)" if dialect == "sqlite" else f"DATE({col})"
+
+
+def _dimension(spec: str) -> Dimension:
+    m = _DAY.match(spec.strip())
+    return Dimension(m.group(1), True) if m else Dimension(spec.strip())
+
+
+def parse_dimensions(columns: Dict[str, str], specs: List[str]) -> List[Dimension]:
+    if not specs:
+        raise InvalidQuery("group_by must name at least one column or day(column)")
+    dims = [_dimension(spec) for spec in specs]
+    check_columns(columns, [d.column for d in dims])
+    if len({d.label for d in dims}) != len(dims):
+        raise InvalidQuery("group_by names the same dimension twice")
+    return dims
+
+
+def dumps(dims: List[Dimension]) -> str:
+    return json.dumps([d.spec for d in dims])
+
+
+def loads(text: str) -> List[Dimension]:
+    return [_dimension(spec) for spec in json.loads(text)]
+
+
+def side_table(table: str, name: str) -> str:
+    return f"rollup_{table.lower()}_{name.lower()}"
+
+
+def check_names(table: str, name: str, dims: List[Dimension]) -> None:
+    """Reject names that would make a generated identifier too long, before any DDL runs."""
+    longest = side_table(table, name) + "_keys"
+    if len(longest) > MAX_NAME:
+        raise InvalidQuery(
+            f"rollup {name!r} on {table!r} needs the index name {longest!r}, over {MAX_NAME} characters; "
+            "choose a shorter rollup name"
+        )
+    for d in dims:
+        if len(d.label) > MAX_NAME:
+            raise InvalidQuery(f"rollup key column {d.label!r} is over {MAX_NAME} characters")
+
+
+def meta_ddl(dialect: str) -> str:
+    text = "TEXT" if dialect == "sqlite" else "VARCHAR(64)"
+    return (f"CREATE TABLE IF NOT EXISTS {META} (source {text} NOT NULL, name {text} NOT NULL, "
+            f"dims TEXT NOT NULL, PRIMARY KEY (source, name))")
+
+
+def register_sql(dialect: str) -> str:
+    p = PARAM[dialect]
+    return f"INSERT INTO {META} (source, name, dims) VALUES ({p}, {p}, {p})"
+
+
+def unregister_sql(dialect: str) -> str:
+    p = PARAM[dialect]
+    return f"DELETE FROM {META} WHERE source = {p} AND name = {p}"
+
+
+def definitions_sql(dialect: str) -> str:
+    return f"SELECT name, dims FROM {META} WHERE source = {PARAM[dialect]} ORDER BY name"
+
+
+def create_ddl(dialect: str, table: str, name: str, dims: List[Dimension], types: Dict[str, str]) -> List[str]:
+    """Side table, its key index and the three triggers; run rebuild_sql afterwards to backfill."""
+    side = ident(side_table(table, name))
+    keys = [ident(d.label) for d in dims]
+    if dialect == "sqlite":
+        # no declared type: keys keep the source values' own types
+        cols = ", ".join(keys)
+        index_cols = ", ".join(keys)
+    else:
+        def mtype(d):
+            return "DATE" if d.day else types[d.column.lower()]
+        cols = ", ".join(f"{k} {mtype(d)}" for k, d in zip(keys, dims))
+        index_cols = ", ".join(
+            k + ("(191)" if "text" in mtype(d).lower() or "blob" in mtype(d).lower() else "") for k, d in zip(keys, dims)
+        )
+    stmts = [
+        f"CREATE TABLE {side} ({cols}, _n INTEGER NOT NULL)",
+        f"CREATE INDEX {ident(side_table(table, name) + '_keys')} ON {side} ({index_cols})",
+    ]
+    eq = "IS" if dialect == "sqlite" else "<=>"
+
+    def match(row):
+        return " AND ".join(f"{k} {eq} {d.expr(dialect, row)}" for k, d in zip(keys, dims))
+
+    def add(row):
+        exprs = ", ".join(d.expr(dialect, row) for d in dims)
+        dual = "" if dialect == "sqlite" else " FROM DUAL"
+        return [
+            f"INSERT INTO {side} ({', '.join(keys)}, _n) SELECT {exprs}, 0{dual} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {side} WHERE {match(row)})",
+            f"UPDATE {side} SET _n = _n + 1 WHERE {match(row)}",
+        ]
+
+    def remove(row):
+        return [f"UPDATE {side} SET _n = _n - 1 WHERE {match(row)}", f"DELETE FROM {side} WHERE _n <= 0 AND {match(row)}"]
+
+    same = " AND ".join(f"{d.expr(dialect, 'OLD.')} {eq} {d.expr(dialect, 'NEW.')}" for d in dims)
+    trig = side_table(table, name)
+    bodies = {
+        "ai": ("AFTER INSERT", add("NEW."), None),
+        "ad": ("AFTER DELETE", remove("OLD."), None),
+        "au": ("AFTER UPDATE", remove("OLD.") + add("NEW."), f"NOT ({same})"),
+    }
+    for suffix, (event, body, when) in bodies.items():
+        head = f"CREATE TRIGGER {ident(trig + '_' + suffix)} {event} ON {ident(table)} FOR EACH ROW"
+        if dialect == "sqlite":
+            stmts.append(f"{head}{' WHEN ' + when if when else ''} BEGIN {'; '.join(body)}; END")
+        elif when:
+            stmts.append(f"{head} BEGIN IF {when} THEN {'; '.join(body)}; END IF; END")
+        else:
+            stmts.append(f"{head} BEGIN {'; '.join(body)}; END")
+    return stmts
+
+
+def drop_ddl(dialect: str, table: str, name: str) -> List[str]:
+    trig = side_table(table, name)
+    return [f"DROP TRIGGER IF EXISTS {ident(trig + '_' + s)}" for s in ("ai", "au", "ad")] + [
+        f"DROP TABLE IF EXISTS {ident(trig)}"
+    ]
+
+
+def rebuild_sql(dialect: str, table: str, name: str, dims: List[Dimension]) -> List[str]:
+    side = ident(side_table(table, name))
+    keys = ", ".join(ident(d.label) for d in dims)
+    exprs = ", ".join(d.expr(dialect) for d in dims)
+    groups = ", ".join(str(i + 1) for i in range(len(dims)))
+    return [
+        f"DELETE FROM {side}",
+        f"INSERT INTO {side} ({keys}, _n) SELECT {exprs}, COUNT(*) FROM {ident(table)} GROUP BY {groups}",
+    ]
+
+
+def read_sql(dialect: str, table: str, name: str, dims: List[Dimension]) -> str:
+    keys = ", ".join(ident(d.label) for d in dims)
+    return (f"SELECT {keys}, SUM(_n) FROM {ident(side_table(table, name))} "
+            f"GROUP BY {keys} ORDER BY {keys} LIMIT {PARAM[dialect]}")
+
+
+def result(name: str, dims: List[Dimension], rows: List[Tuple[Any, ...]]) -> Dict[str, Any]:
+    labels = [d.label for d in dims]
+    out = [dict(zip(labels, r[:-1]), count=int(r[-1])) for r in rows]
+    return {"name": name, "dimensions": [d.spec for d in dims], "rows": out, "total": sum(r["count"] for r in out)}
+
+
+def find(rows: List[Tuple[str, str]], name: str) -> Optional[List[Dimension]]:
+    for n, dims in rows:
+        if n.lower() == name.lower():
+            return loads(dims)
+    return None
@@ -0,0 +1,134 @@
+"""Projection, filters and sort for list_rows, validated against the table schema.
+
+Clients used to export whole tables and filter them locally. A ``RowQuery``
+carries what list_rows should push down into SQL instead:
+
+* ``fields``: the columns to return. ``id`` and the sort column are always
+  included, because the next page's cursor is built from them.
+* ``filters``: ``(column, op, values)`` with ``op`` one of eq, ne, lt, lte,
+  gt, gte and in. Values are coerced to the column's declared type, so
+  ``age:gte:18`` compares numbers on an INTEGER column.
+* ``sort`` and ``direction``: the order, always tie-broken by ``id``. With a
+  sort column other than ``id``, pages continue from ``seek``, the
+  ``(value, id)`` of the previous page's last row.
+
+Every column is checked against the table's cached columns before any SQL is
+built, and values are only ever bound as parameters.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+OPS = {"eq": "=", "ne": "<>", "lt": "<", "lte": "<=", "gt": ">", "gte": ">=", "in": "IN"}
+MAX_IN_VALUES = 100
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+class RowQuery:
+    __slots__ = ("fields", "filters", "sort", "direction", "seek", "limit")
+
+    def __init__(
+        self,
+        limit: int,
+        direction: str = "desc",
+        sort: str = "id",
+        fields: Optional[Tuple[str, ...]] = None,
+        filters: Tuple[Tuple[str, str, Tuple[Any, ...]], ...] = (),
+        seek: Optional[Tuple[Any, Any]] = None,
+    ):
+        self.limit = limit
+        self.direction = direction
+        self.sort = sort
+        self.fields = fields
+        self.filters = filters
+        self.seek = seek
+
+    def shape(self) -> tuple:
+        """Everything the statement text depends on (not the bound values)."""
+        filters = tuple((col, op, len(values)) for col, op, values in self.filters)
+        seek = None if self.seek is None else ("null" if self.seek[0] is None else "value")
+        return self.fields, filters, self.sort, self.direction, seek
+
+    def params(self) -> List[Any]:
+        """Bound values in placeholder order: filters, seek, limit."""
+        params = [v for _, _, values in self.filters for v in values]
+        if self.seek is not None:
+            value, last_id = self.seek
+            params += [last_id] if value is None else [value, value, last_id]
+        params.append(self.limit)
+        return params
+
+    def key(self) -> tuple:
+        """Result cache key for the page this query returns."""
+        return self.shape() + (tuple(self.params()),)
+
+
+def parse_filter(text: str) -> Tuple[str, str, List[str]]:
+    """``column:op:value`` (``in`` takes comma-separated values) -> (column, op, raw values)."""
+    parts = text.split(":", 2)
+    if len(parts) != 3 or parts[1] not in OPS:
+        raise InvalidQuery(f"invalid filter {text!r}; expected column:op:value with op in {', '.join(OPS)}")
+    col, op, raw = parts
+    values = raw.split(",") if op == "in" else [raw]
+    if len(values) > MAX_IN_VALUES:
+        raise InvalidQuery(f"at most {MAX_IN_VALUES} values per in filter")
+    return col, op, values
+
+
+def parse_sort(text: Optional[str]) -> Optional[Tuple[str, str]]:
+    """``col`` (ascending) or ``-col`` (descending) -> (column, direction)."""
+    if not text:
+        return None
+    if text.startswith("-"):
+        return text[1:], "desc"
+    return text, "asc"
+
+
+def coerce(value: Any, ctype: str) -> Any:
+    """Convert a query-string value to the column's declared type (SQLite affinity rules)."""
+    if not isinstance(value, str):
+        return value
+    t = ctype.upper()
+    if "CHAR" in t or "TEXT" in t or "CLOB" in t or "DATE" in t or "TIME" in t:
+        return value
+    try:
+        if "INT" in t:
+            return int(value)
+        if "REAL" in t or "FLOA" in t or "DOUB" in t or "DEC" in t or "NUM" in t:
+            return float(value)
+    except ValueError:
+        raise InvalidQuery(f"{value!r} is not a valid {ctype} value")
+    return value
+
+
+def check_columns(columns: Dict[str, str], names) -> None:
+    """Raise InvalidQuery for any name that is not a column (``columns`` keys are lower-cased)."""
+    for name in names:
+        if name.lower() not in columns:
+            raise InvalidQuery(f"unknown column: {name}")
+
+
+def build(
+    columns: Dict[str, str],
+    limit: int,
+    direction: str,
+    sort: str = "id",
+    fields: Optional[List[str]] = None,
+    filters: Optional[List[Tuple[str, str, List[Any]]]] = None,
+    seek: Optional[Tuple[Any, Any]] = None,
+) -> RowQuery:
+    """Validate the request against ``columns`` and return the RowQuery for it."""
+    filters = filters or []
+    check_columns(columns, [sort] + list(fields or []) + [col for col, _, _ in filters])
+    if fields:
+        wanted = ["id"] + ([sort] if sort.lower() != "id" else []) + list(fields)
+        seen = set()
+        fields = tuple(f for f in wanted if not (f.lower() in seen or seen.add(f.lower())))
+    typed = tuple(
+        (col, op, tuple(coerce(v, columns[col.lower()]) for v in values))
+        for col, op, values in filters
+    )
+    if seek is not None:
+        seek = (coerce(seek[0], columns[sort.lower()]), seek[1])
+    return RowQuery(limit, direction, sort, fields or None, typed, seek)
@@ -0,0 +1,71 @@
+"""In-memory cache of table columns for the form databases.
+
+``/submit`` used to run ``CREATE TABLE IF NOT EXISTS`` before every insert.
+With the columns cached per (database, table), the insert path skips DDL
+entirely once the table is known. Only a submission that brings new fields
+pays for a one-time ``ALTER TABLE ADD COLUMN``. Anything that changes a
+table's shape (create_table, drop_table, drop_database) must invalidate it.
+"""
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from .sql import ident
+
+# lower-cased column name -> declared type
+Columns = Dict[str, str]
+
+
+class SchemaCache:
+    def __init__(self):
+        self._tables: Dict[Tuple[str, str], Columns] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: str, table: str) -> Optional[Columns]:
+        cols = self._tables.get((db, table.lower()))
+        if cols is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cols
+
+    def load(self, db: str, table: str, loader: Callable[[], Columns]) -> Columns:
+        """Return cached columns, calling ``loader`` on a miss. Missing tables are not cached."""
+        cols = self.get(db, table)
+        if cols is None:
+            cols = loader()
+            if cols:
+                self.set(db, table, cols)
+        return cols
+
+    def set(self, db: str, table: str, cols: Columns) -> None:
+        with self._lock:
+            self._tables[(db, table.lower())] = dict(cols)
+
+    def add_column(self, db: str, table: str, name: str, ctype: str) -> None:
+        with self._lock:
+            cols = self._tables.get((db, table.lower()))
+            if cols is not None:
+                # copy-on-write so readers never see a dict being mutated
+                cols = dict(cols)
+                cols[name.lower()] = ctype
+                self._tables[(db, table.lower())] = cols
+
+    def invalidate(self, db: str, table: Optional[str] = None) -> None:
+        """Forget one table, or every table of ``db`` when ``table`` is None."""
+        with self._lock:
+            if table is not None:
+                self._tables.pop((db, table.lower()), None)
+            else:
+                for key in [k for k in self._tables if k[0] == db]:
+                    del self._tables[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"tables": len(self._tables), "hits": self.hits, "misses": self.misses}
+
+
+def sqlite_columns(conn: sqlite3.Connection, table: str) -> Columns:
+    return {r[1].lower(): r[2] for r in conn.execute(f"PRAGMA table_info({ident(table)})")}
+
@@ -0,0 +1,290 @@
+"""Multi-process serving with forms sharded across worker processes.
+
+Running plain ``uvicorn --workers N`` would let every process open every
+form's SQLite file, so writers in different processes would contend for the
+same file locks. Each process would also keep its own caches of the same
+forms. This mode is shared-nothing instead:
+
+* ``N`` backend workers, ``worker0`` to ``worker<N-1>``, each run
+  ``Backend.api:app`` on a private Unix socket.
+* Forms are assigned to workers with a consistent-hash ring of the worker
+  ids keyed on the form name. The ids, unlike the socket paths, are the same
+  on every start, so a form keeps its owner across restarts as long as the
+  worker count stays the same. Only the owning worker ever opens a form's
+  database, runs its writer thread, caches its reads or replays its
+  buffered submissions.
+* The public port is served by stateless router processes (``router_app``,
+  ``--routers`` of them, default one per worker). They find the form in the
+  request (path, or ``form_name`` in the body of POST /forms and /submit)
+  and proxy it to the owner, streaming the response back.
+
+Requests that are not about one form are handled by the router: GET /forms,
+GET /slow_queries and GET /index_report are merged from all workers,
+GET /pools collects every worker's gauges, GET /metrics concatenates every
+worker's metrics with a ``worker`` label and GET /health answers directly.
+
+    python -m Backend.serve --workers 4 --port 8000
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from . import metrics
+from .form_store import safe_name
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# set by main() for the router processes: comma-separated worker_id=socket_path
+BACKENDS_ENV = "SERVE_BACKENDS"
+
+# hop-by-hop headers (and ones httpx recomputes) are not forwarded
+_SKIP_HEADERS = {"host", "connection", "keep-alive", "transfer-encoding", "content-length", "upgrade"}
+
+
+class HashRing:
+    """Consistent hashing of form names onto ``nodes`` with virtual nodes.
+
+    Adding or removing a node only moves the forms adjacent to its points
+    (about 1/N of them), not the whole keyspace.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = 128):
+        self.nodes = list(nodes)
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        ring = sorted((self._hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        for point, node in ring:
+            self._points.append(point)
+            self._owners.append(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    def node(self, form: str) -> str:
+        i = bisect.bisect(self._points, self._hash(safe_name(form)))
+        return self._owners[i % len(self._owners)]
+
+
+def form_of(path: str, method: str, body: bytes) -> Optional[str]:
+    """The form a request is about, or None if it is not about a single form."""
+    parts = path.strip("/").split("/")
+    if parts[0] == "forms" and len(parts) >= 2:
+        return parts[1]
+    if (path.rstrip("/") in ("/forms", "/submit")) and method == "POST":
+        try:
+            name = json.loads(body).get("form_name")
+        except (ValueError, AttributeError):
+            return None
+        return name if isinstance(name, str) else None
+    return None
+
+
+def parse_backends(value: str) -> Dict[str, str]:
+    """Worker id -> socket path, from the ``SERVE_BACKENDS`` value."""
+    backends = {}
+    for item in filter(None, value.split(",")):
+        worker, sep, path = item.partition("=")
+        if not sep or not worker or not path:
+            raise RuntimeError(f"{BACKENDS_ENV}: expected worker_id=socket_path, got {item!r}")
+        backends[worker] = path
+    return backends
+
+
+# keyed by worker id, the name the ring, SERVE_WORKER and the worker labels all use
+_clients: Dict[str, httpx.AsyncClient] = {}
+_ring: Optional[HashRing] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _ring
+    backends = parse_backends(os.environ.get(BACKENDS_ENV, ""))
+    if not backends:
+        raise RuntimeError(f"{BACKENDS_ENV} is not set; start the router with python -m Backend.serve")
+    for worker, path in backends.items():
+        _clients[worker] = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=path),
+            base_url="http://worker",
+            timeout=None,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=256),
+        )
+    # socket paths change with every start; the ids do not, so neither do the owners
+    _ring = HashRing(list(backends))
+    yield
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+router_app = FastAPI(title="Form DB Service (router)", lifespan=lifespan)
+
+
+@router_app.get("/health")
+async def health():
+    return {"ok": True, "workers": len(_clients)}
+
+
+@router_app.get("/forms")
+async def list_forms(request: Request, limit: int = Query(1000, ge=1, le=10000)):
+    """Merge each worker's page; every worker sees the whole data directory but may lag behind the others."""
+    responses = await asyncio.gather(*(c.get("/forms", params=request.query_params) for c in _clients.values()))
+    for r in responses:
+        if r.status_code != 200:
+            return JSONResponse(status_code=r.status_code, content=r.json())
+    names = []
+    for name in heapq.merge(*(r.json()["forms"] for r in responses)):
+        if not names or names[-1] != name:
+            names.append(name)
+    more = len(names) > limit or any(r.json()["next_after"] for r in responses)
+    names = names[:limit]
+    return {"forms": names, "next_after": names[-1] if more and names else None}
+
+
+@router_app.get("/pools")
+async def pool_stats():
+    responses = await asyncio.gather(*(c.get("/pools") for c in _clients.values()))
+    return {"workers": {worker: r.json() for worker, r in zip(_clients, responses)}}
+
+
+@router_app.get("/slow_queries")
+async def slow_queries(request: Request, limit: int = Query(20, ge=1, le=1000)):
+    responses = await asyncio.gather(*(c.get("/slow_queries", params=request.query_params) for c in _clients.values()))
+    for r in responses:
+        if r.status_code != 200:
+            return JSONResponse(status_code=r.status_code, content=r.json())
+    queries = [dict(q, worker=worker) for worker, r in zip(_clients, responses) for q in r.json()["queries"]]
+    queries.sort(key=lambda q: q["total_ms"], reverse=True)
+    return {"threshold_ms": responses[0].json()["threshold_ms"], "queries": queries[:limit]}
+
+
+@router_app.get("/index_report")
+async def index_report(request: Request, limit: int = Query(20, ge=1, le=1000)):
+    # each worker only tracks the queries on the forms it owns
+    responses = await asyncio.gather(*(c.get("/index_report", params=request.query_params) for c in _clients.values()))
+    for r in responses:
+        if r.status_code != 200:
+            return JSONResponse(status_code=r.status_code, content=r.json())
+    queries = [q for r in responses for q in r.json()["queries"]]
+    queries.sort(key=lambda q: q["total_ms"], reverse=True)
+    return {"queries": queries[:limit]}
+
+
+@router_app.get("/metrics")
+async def metrics_text():
+    # routers are interchangeable (any of them may answer a scrape), so only worker metrics are reported
+    responses = await asyncio.gather(*(c.get("/metrics") for c in _clients.values()))
+    texts = {worker: r.text for worker, r in zip(_clients, responses)}
+    return Response(metrics.merge(texts), media_type=metrics.CONTENT_TYPE)
+
+
+@router_app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def proxy(request: Request, path: str):
+    if request.url.path.rstrip("/") in ("/forms", "/submit"):
+        # the form is named in the body
+        body = await request.body()
+    else:
+        # passed through as it arrives, so a large import is never buffered here
+        body = request.stream()
+    form = form_of(request.url.path, request.method, body if isinstance(body, bytes) else b"")
+    # requests that name no form still need an answer (usually a 404/422); any worker can give it
+    owner = _ring.node(form) if form is not None else _ring.nodes[0]
+    client = _clients[owner]
+    headers = [(k, v) for k, v in request.headers.items() if k.lower() not in _SKIP_HEADERS]
+    upstream = await client.send(
+        client.build_request(request.method, request.url.path, params=request.url.query, headers=headers, content=body),
+        stream=True,
+    )
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers={k: v for k, v in upstream.headers.items() if k.lower() not in _SKIP_HEADERS},
+        background=BackgroundTask(upstream.aclose),
+    )
+
+
+def _wait_ready(sockets: List[str], procs: List[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    pending = list(sockets)
+    while pending:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"workers did not start: {pending}")
+        for proc in procs:
+            if proc.poll() is not None:
+                raise RuntimeError(f"worker exited with status {proc.returncode}")
+        path = pending[0]
+        try:
+            with httpx.Client(transport=httpx.HTTPTransport(uds=path), timeout=1) as c:
+                if c.get("http://worker/health").status_code == 200:
+                    pending.pop(0)
+                    continue
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1))))
+    ap.add_argument("--routers", type=int, default=None, help="router processes on the public port (default: --workers)")
+    ap.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    ap.add_argument("--log-level", default="warning")
+    args = ap.parse_args()
+
+    import uvicorn
+
+    sock_dir = tempfile.mkdtemp(prefix="formdb_")
+    backends = {f"worker{i}": os.path.join(sock_dir, f"worker{i}.sock") for i in range(args.workers)}
+    sockets = list(backends.values())
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "Backend.api:app", "--uds", path, "--log-level", args.log_level],
+            env=dict(env, SERVE_WORKER=worker),
+        )
+        for worker, path in backends.items()
+    ]
+    # uvicorn re-raises SIGTERM once it has shut down; make that unwind through
+    # the finally below so the workers are stopped too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        _wait_ready(sockets, procs)
+        os.environ[BACKENDS_ENV] = ",".join(f"{worker}={path}" for worker, path in backends.items())
+        uvicorn.run(
+            "Backend.serve:router_app",
+            host=args.host,
+            port=args.port,
+            workers=args.routers or args.workers,
+            log_level=args.log_level,
+        )
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
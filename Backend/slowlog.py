@@ -0,0 +1,277 @@
+"""Slow-query log with one captured query plan per statement shape.
+
+A filtered list_rows, an update_rows ``where`` or an export can quietly turn
+into a full table scan. The stores (and CRUD.py's ad-hoc SQL) report each
+such statement here once it has run. Statements that took at least
+SLOW_QUERY_MS are grouped by *shape*, which is the SQL text with literals
+replaced by ``?`` and IN lists folded. The log keeps their count, total and
+max time, rows, and the latest redacted parameters (types and lengths, never
+values).
+
+The first time a shape is slow, its plan is captured with the caller's
+connection: ``EXPLAIN QUERY PLAN`` on SQLite, ``EXPLAIN`` on MariaDB/MySQL.
+``report`` ranks shapes by total time (GET /slow_queries in the API).
+
+With SLOW_QUERY_LOG set, every slow statement is also appended to that file
+as a JSON line. The report can be rebuilt from the file later:
+
+    python -m Backend.slowlog /var/log/formdb-slow.jsonl --limit 20
+
+Importable both as ``Backend.slowlog`` and as ``slowlog`` (CRUD.py), so it
+has no package-relative imports.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r"(?<![\w.`])-?\d+(?:\.\d+)?(?![\w`])")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def shape(sql: str) -> str:
+    """``sql`` with literals and placeholders as ``?``, IN lists as ``IN (...)`` and whitespace collapsed."""
+    text = _STRING.sub("?", sql)
+    text = _NUMBER.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _IN_LIST.sub("IN (...)", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def redact(params: Optional[Sequence[Any]]) -> List[str]:
+    """Parameter types (and lengths of strings/bytes), so the log never holds submitted values."""
+    out = []
+    for value in params or ():
+        if value is None:
+            out.append("null")
+        elif isinstance(value, (str, bytes)):
+            out.append(f"{type(value).__name__}[{len(value)}]")
+        else:
+            out.append(type(value).__name__)
+    return out
+
+
+def explain_sqlite(conn, sql: str, params=()) -> List[str]:
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall()
+    # (id, parent, notused, detail); indent children under their parent
+    depth = {0: -1}
+    out = []
+    for row in rows:
+        node, parent, detail = row[0], row[1], row[3]
+        depth[node] = depth.get(parent, -1) + 1
+        out.append("  " * depth[node] + detail)
+    return out
+
+
+def explain_mysql(cur, sql: str, params=()) -> List[str]:
+    """One line per EXPLAIN row, e.g. ``table=t type=ALL key=None rows=1000 Extra=Using where``."""
+    cur.execute("EXPLAIN " + sql, params or None)
+    names = [d[0] for d in cur.description]
+    out = []
+    for row in cur.fetchall():
+        values = row if isinstance(row, dict) else dict(zip(names, row))
+        out.append(" ".join(f"{k}={values.get(k)}" for k in ("table", "type", "key", "rows", "Extra") if k in values))
+    return out
+
+
+class _Shape:
+    __slots__ = ("backend", "where", "shape", "count", "seconds", "max_seconds", "rows", "params", "source", "plan", "last")
+
+    def __init__(self, backend: str, where: str, text: str):
+        self.backend = backend
+        self.where = where
+        self.shape = text
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.params: List[str] = []
+        self.source = ""
+        self.plan: Optional[List[str]] = None
+        self.last = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "where": self.where,
+            "shape": self.shape,
+            "source": self.source,
+            "count": self.count,
+            "total_ms": round(self.seconds * 1000, 3),
+            "avg_ms": round(self.seconds * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "rows": self.rows,
+            "params": self.params,
+            "plan": self.plan,
+        }
+
+
+class SlowLog:
+    def __init__(self, threshold_ms: float = 100, path: Optional[str] = None, max_shapes: int = 500):
+        # a negative threshold turns the log off; 0 logs every statement
+        self.threshold = threshold_ms / 1000
+        self.path = path
+        self.max_shapes = max_shapes
+        self._shapes: Dict[Tuple[str, str, str], _Shape] = {}
+        self._lock = threading.Lock()
+        self.slow = 0
+        self.explained = 0
+        self.explain_errors = 0
+        self.dropped_shapes = 0
+
+    @classmethod
+    def from_env(cls) -> "SlowLog":
+        return cls(
+            threshold_ms=float(os.getenv("SLOW_QUERY_MS", "100")),
+            path=os.getenv("SLOW_QUERY_LOG") or None,
+            max_shapes=int(os.getenv("SLOW_QUERY_MAX_SHAPES", "500")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold >= 0
+
+    def observe(
+        self, backend: str, where: str, sql: str, params, seconds: float, rows: int,
+        explain: Optional[Callable[[], List[str]]] = None, source: str = "",
+    ) -> bool:
+        """Record one executed statement if it was slow (True); ``explain`` is called the first time its shape is.
+
+        ``where`` says which database the statement ran in (the form), because
+        plans depend on that database's indexes. Call it on the thread that owns
+        ``explain``'s connection.
+        """
+        if not self.enabled or seconds < self.threshold:
+            return False
+        text = shape(sql)
+        key = (backend, where, text)
+        with self._lock:
+            entry = self._shapes.get(key)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    # forget the shape that has cost the least so far
+                    del self._shapes[min(self._shapes, key=lambda k: self._shapes[k].seconds)]
+                    self.dropped_shapes += 1
+                entry = self._shapes[key] = _Shape(backend, where, text)
+            entry.count += 1
+            entry.seconds += seconds
+            entry.max_seconds = max(entry.max_seconds, seconds)
+            entry.rows += rows
+            entry.params = redact(params)
+            entry.source = source
+            entry.last = time.time()
+            need_plan = entry.plan is None and explain is not None
+            if need_plan:
+                # claimed here so concurrent slow runs of the shape do not explain it again
+                entry.plan = []
+            self.slow += 1
+        plan = None
+        if need_plan:
+            try:
+                plan = explain()
+                self.explained += 1
+            except Exception:
+                # e.g. the connection is mid-stream; try again the next time this shape is slow
+                self.explain_errors += 1
+                with self._lock:
+                    entry.plan = None
+            else:
+                with self._lock:
+                    entry.plan = plan
+        if self.path:
+            self._append({
+                "ts": round(entry.last, 3), "backend": backend, "where": where, "shape": text, "source": source,
+                "ms": round(seconds * 1000, 3), "rows": rows, "params": redact(params), "plan": plan,
+            })
+        return True
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        # one write per line on an O_APPEND file, so worker processes can share it
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode()
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+    def report(self, limit: int = 20, where: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Slow statement shapes ranked by total time, optionally for one database only."""
+        with self._lock:
+            entries = [e.as_dict() for e in self._shapes.values() if where is None or e.where == where]
+        entries.sort(key=lambda e: e["total_ms"], reverse=True)
+        return entries[:limit]
+
+    def forget(self, where: str) -> None:
+        with self._lock:
+            for key in [k for k in self._shapes if k[1] == where]:
+                del self._shapes[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "shapes": len(self._shapes),
+            "slow": self.slow,
+            "explained": self.explained,
+            "explain_errors": self.explain_errors,
+            "dropped_shapes": self.dropped_shapes,
+        }
+
+
+def report_file(paths: Iterable[str], limit: int = 20) -> List[Dict[str, Any]]:
+    """The ``report`` of one or more SLOW_QUERY_LOG files (e.g. from several processes or hosts)."""
+    shapes: Dict[Tuple[str, str, str], _Shape] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                key = (rec["backend"], rec.get("where", ""), rec["shape"])
+                entry = shapes.get(key)
+                if entry is None:
+                    entry = shapes[key] = _Shape(*key)
+                seconds = rec["ms"] / 1000
+                entry.count += 1
+                entry.seconds += seconds
+                entry.max_seconds = max(entry.max_seconds, seconds)
+                entry.rows += rec.get("rows", 0)
+                entry.params = rec.get("params", [])
+                entry.source = rec.get("source", "")
+                if rec.get("plan"):
+                    entry.plan = rec["plan"]
+    ranked = sorted((e.as_dict() for e in shapes.values()), key=lambda e: e["total_ms"], reverse=True)
+    return ranked[:limit]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Rank the statement shapes in SLOW_QUERY_LOG files by total time.")
+    ap.add_argument("paths", nargs="+", help="slow-query log files (JSON lines)")
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+    ranked = report_file(args.paths, args.limit)
+    if args.json:
+        json.dump(ranked, sys.stdout, indent=2)
+        print()
+        return
+    for i, e in enumerate(ranked, 1):
+        print(f"{i:>3}. {e['total_ms']:>12.1f} ms total  {e['count']:>6}x  avg {e['avg_ms']:.1f} ms  "
+              f"max {e['max_ms']:.1f} ms  {e['rows']} rows  [{e['backend']} {e['where']}]")
+        print(f"     {e['shape']}")
+        for line in e["plan"] or ["(no plan captured)"]:
+            print(f"       {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Identifier quoting and cached statement text for the form stores.
+
+Statements used to be rebuilt with f-strings on every request. That
+re-sanitized the column names each time and gave the drivers a fresh string
+per call. The builders here are memoized on (dialect, table, column
+signature). A given shape of INSERT/UPDATE/SELECT is therefore built once,
+and every later call passes the *same* str object. sqlite3's per-connection
+statement cache (see ``StorageProfile.cached_statements``) then finds the
+compiled statement without re-preparing it.
+
+Identifiers are validated and quoted here only: letters, digits and
+underscores, wrapped in backticks. Backticks are an identifier quote in both
+MariaDB and SQLite; unlike double quotes, SQLite never reinterprets them as a
+string literal.
+"""
+import hashlib
+from functools import lru_cache
+from typing import Tuple
+
+from .row_query import OPS
+
+PARAM = {"sqlite": "?", "mariadb": "%s"}
+
+
+class InvalidIdentifier(ValueError):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def ident(name: str) -> str:
+    if not name or not all(ch.isalnum() or ch == "_" for ch in name):
+        raise InvalidIdentifier(f"invalid identifier: {name!r}")
+    return f"`{name}`"
+
+
+def index_name(table: str, cols) -> str:
+    """``ix_<table>_<cols>``, shortened with a hash past MariaDB's 64-character limit."""
+    name = "_".join(["ix", table.lower()] + [c.lower() for c in cols])
+    if len(name) > 64:
+        name = name[:55] + "_" + hashlib.blake2b(name.encode(), digest_size=4).hexdigest()
+    return name
+
+
+def is_ident(name: str) -> bool:
+    try:
+        ident(name)
+    except InvalidIdentifier:
+        return False
+    return True
+
+
+@lru_cache(maxsize=1024)
+def insert_sql(dialect: str, table: str, cols: Tuple[str, ...], rows: int = 1) -> str:
+    """INSERT for ``cols``; ``rows`` > 1 gives one multi-row VALUES list."""
+    one = "(" + ",".join(PARAM[dialect] for _ in cols) + ")"
+    return f"INSERT INTO {ident(table)} ({','.join(ident(c) for c in cols)}) VALUES " + ",".join([one] * rows)
+
+
+@lru_cache(maxsize=1024)
+def update_sql(dialect: str, table: str, set_cols: Tuple[str, ...], where_cols: Tuple[str, ...]) -> str:
+    p = PARAM[dialect]
+    sets = ",".join(f"{ident(c)}={p}" for c in set_cols)
+    sql = f"UPDATE {ident(table)} SET {sets}"
+    if where_cols:
+        sql += " WHERE " + " AND ".join(f"{ident(c)}={p}" for c in where_cols)
+    return sql
+
+
+def _conditions(dialect: str, filters: tuple) -> list:
+    """WHERE terms for ``(column, op, n_values)`` filters, in parameter order."""
+    p = PARAM[dialect]
+    conds = []
+    for col, op, n in filters:
+        if op == "in":
+            conds.append(f"{ident(col)} IN ({','.join([p] * n)})")
+        else:
+            conds.append(f"{ident(col)} {OPS[op]} {p}")
+    return conds
+
+
+def _where(conds: list) -> str:
+    return (" WHERE " + " AND ".join(conds)) if conds else ""
+
+
+@lru_cache(maxsize=1024)
+def select_sql(dialect: str, table: str, shape: tuple) -> str:
+    """One list_rows page for ``RowQuery.shape()``; parameters are ``RowQuery.params()``.
+
+    Rows are ordered by the sort column and then ``id``. NULLs sort first
+    ascending in both SQLite and MariaDB, which the seek condition relies on.
+    """
+    fields, filters, sort, direction, seek = shape
+    p = PARAM[dialect]
+    cols = ",".join(ident(f) for f in fields) if fields else "*"
+    conds = _conditions(dialect, filters)
+    s, cmp = ident(sort), "<" if direction == "desc" else ">"
+    if seek == "value":
+        rest = f" OR {s} IS NULL" if direction == "desc" else ""
+        conds.append(f"({s} {cmp} {p} OR ({s} = {p} AND `id` {cmp} {p}){rest})")
+    elif seek == "null":
+        conds.append(f"({s} IS NULL AND `id` < {p})" if direction == "desc" else f"({s} IS NOT NULL OR `id` > {p})")
+    where = _where(conds)
+    order = "DESC" if direction == "desc" else "ASC"
+    by = f"`id` {order}" if sort.lower() == "id" else f"{s} {order}, `id` {order}"
+    return f"SELECT {cols} FROM {ident(table)}{where} ORDER BY {by} LIMIT {p}"
+
+
+@lru_cache(maxsize=1024)
+def scan_sql(dialect: str, table: str, fields: Tuple[str, ...], filters: tuple) -> str:
+    """Unordered scan of ``fields`` over the rows matching ``filters`` (for aggregate's NumPy path)."""
+    return f"SELECT {','.join(ident(f) for f in fields)} FROM {ident(table)}{_where(_conditions(dialect, filters))}"
+
+
+@lru_cache(maxsize=1024)
+def aggregate_sql(dialect: str, table: str, group_by: Tuple[str, ...], metrics: tuple, filters: tuple) -> str:
+    """Per-group metrics, ordered by the group columns; parameters are the filters' values, then limit."""
+    exprs = [ident(g) for g in group_by]
+    for fn, col in metrics:
+        arg = "*" if col is None else ident(col)
+        exprs.append(f"{fn.upper()}({arg}) AS {ident(fn if col is None else f'{fn}_{col.lower()}')}")
+    sql = f"SELECT {', '.join(exprs)} FROM {ident(table)}{_where(_conditions(dialect, filters))}"
+    if group_by:
+        groups = ", ".join(ident(g) for g in group_by)
+        sql += f" GROUP BY {groups} ORDER BY {groups}"
+    return sql + f" LIMIT {PARAM[dialect]}"
+
+
+@lru_cache(maxsize=1024)
+def histogram_sql(dialect: str, table: str, column: str, filters: tuple) -> Tuple[str, str]:
+    """(bounds, buckets) statements for a histogram of ``column``.
+
+    bounds takes the filters' values and returns MIN, MAX. buckets takes the
+    low edge and the bucket width, then the filters' values, and returns
+    (bucket number, rows); the top value's bucket number is one too many.
+    """
+    p, c = PARAM[dialect], ident(column)
+    where = _where([f"{c} IS NOT NULL"] + _conditions(dialect, filters))
+    bounds = f"SELECT MIN({c}), MAX({c}) FROM {ident(table)}{where}"
+    if dialect == "sqlite":
+        bucket = f"CAST(({c} - {p}) / {p} AS INTEGER)"
+    else:
+        bucket = f"FLOOR(({c} - {p}) / {p})"
+    buckets = f"SELECT {bucket} AS b, COUNT(*) FROM {ident(table)}{where} GROUP BY b"
+    return bounds, buckets
+
+
+@lru_cache(maxsize=1024)
+def select_all_sql(table: str) -> str:
+    return f"SELECT * FROM {ident(table)}"
+
+
+def cache_info():
+    return {
+        f.__name__: f.cache_info()._asdict()
+        for f in (ident, insert_sql, update_sql, select_sql, scan_sql, aggregate_sql, histogram_sql, select_all_sql)
+    }
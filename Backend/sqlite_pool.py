@@ -0,0 +1,259 @@
+"""Pooled SQLite connections for the per-form databases.
+
+Opening a form DB costs a file open, a schema parse and a cold page cache, so
+instead of connecting per request the API checks connections out of a
+``SQLiteRegistry``. The registry keeps a bounded LRU of forms, each with a
+small stack of idle connections. A checked-out connection is owned by one
+caller until it is returned, so it is safe to hand between threads (e.g. a
+streaming response iterated from Starlette's threadpool).
+
+``StorageProfile`` holds the pragmas every form connection is opened with.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class _FormEntry:
+    __slots__ = ("path", "idle", "in_use", "closed")
+
+    def __init__(self, path: str):
+        self.path = path
+        # (connection, returned_at) pairs, most recently returned last
+        self.idle: List[tuple] = []
+        self.in_use = 0
+        # set when the form is evicted or invalidated; connections that come
+        # back to a closed entry are closed instead of pooled
+        self.closed = False
+
+
+_JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+_SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class StorageProfile:
+    """Pragmas applied to every connection to a form database.
+
+    The defaults put form DBs in WAL mode, so readers never wait for the
+    writer, with synchronous=NORMAL (durable at checkpoints, not every
+    commit), a memory-mapped read path and a larger page cache. busy_timeout
+    makes a connection wait for a lock instead of failing with
+    "database is locked".
+    """
+
+    def __init__(
+        self,
+        journal_mode: str = "WAL",
+        synchronous: str = "NORMAL",
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size: int = -16000,
+        busy_timeout: int = 5000,
+        cached_statements: int = 256,
+    ):
+        journal_mode = journal_mode.upper()
+        synchronous = synchronous.upper()
+        if journal_mode not in _JOURNAL_MODES:
+            raise ValueError(f"journal_mode must be one of {_JOURNAL_MODES}")
+        if synchronous not in _SYNCHRONOUS:
+            raise ValueError(f"synchronous must be one of {_SYNCHRONOUS}")
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.mmap_size = int(mmap_size)
+        self.cache_size = int(cache_size)  # negative = KiB, positive = pages
+        self.busy_timeout = int(busy_timeout)  # milliseconds
+        # compiled statements kept per connection; the stores reuse a small set of SQL strings
+        self.cached_statements = int(cached_statements)
+
+    @classmethod
+    def from_env(cls) -> "StorageProfile":
+        return cls(
+            journal_mode=os.getenv("FORM_DB_JOURNAL_MODE", "WAL"),
+            synchronous=os.getenv("FORM_DB_SYNCHRONOUS", "NORMAL"),
+            mmap_size=int(os.getenv("FORM_DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+            cache_size=int(os.getenv("FORM_DB_CACHE_SIZE", "-16000")),
+            busy_timeout=int(os.getenv("FORM_DB_BUSY_TIMEOUT", "5000")),
+            cached_statements=int(os.getenv("FORM_DB_STATEMENT_CACHE", "256")),
+        )
+
+    def connect(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            path, timeout=self.busy_timeout / 1000, check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "journal_mode": self.journal_mode,
+            "synchronous": self.synchronous,
+            "mmap_size": self.mmap_size,
+            "cache_size": self.cache_size,
+            "busy_timeout": self.busy_timeout,
+            "cached_statements": self.cached_statements,
+        }
+
+
+def _default_connect(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+class SQLiteRegistry:
+    """Bounded LRU of per-form connection stacks.
+
+    max_forms: how many forms may keep idle connections open at once.
+    max_idle_per_form: idle connections retained per form; extra ones are closed.
+    idle_timeout: seconds after which an unused connection is closed.
+    """
+
+    def __init__(
+        self,
+        max_forms: int = 64,
+        max_idle_per_form: int = 4,
+        idle_timeout: float = 300.0,
+        connect: Optional[Callable[[str], sqlite3.Connection]] = None,
+    ):
+        self.max_forms = max_forms
+        self.max_idle_per_form = max_idle_per_form
+        self.idle_timeout = idle_timeout
+        self._connect = connect or _default_connect
+        self._forms: "OrderedDict[str, _FormEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._opened = 0
+        self._reused = 0
+
+    @contextmanager
+    def connection(self, path: str) -> Iterator[sqlite3.Connection]:
+        """Check out a connection for ``path`` and return it to the pool afterwards.
+
+        Any transaction left open (e.g. because the body raised) is rolled back
+        before the connection is reused.
+        """
+        entry, conn = self._checkout(path)
+        try:
+            yield conn
+        finally:
+            self._checkin(entry, conn)
+
+    def _checkout(self, path: str):
+        to_close = []
+        with self._lock:
+            entry = self._forms.get(path)
+            if entry is None:
+                entry = _FormEntry(path)
+                self._forms[path] = entry
+                to_close.extend(self._evict_lru())
+            else:
+                self._forms.move_to_end(path)
+            conn = entry.idle.pop()[0] if entry.idle else None
+            entry.in_use += 1
+            to_close.extend(self._sweep())
+        _close_all(to_close)
+        if conn is not None:
+            self._reused += 1
+            return entry, conn
+        try:
+            conn = self._connect(path)
+        except Exception:
+            with self._lock:
+                entry.in_use -= 1
+            raise
+        self._opened += 1
+        return entry, conn
+
+    def _checkin(self, entry: _FormEntry, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            entry_ok = False
+        else:
+            entry_ok = True
+        with self._lock:
+            entry.in_use -= 1
+            keep = entry_ok and not entry.closed and len(entry.idle) < self.max_idle_per_form
+            if keep:
+                entry.idle.append((conn, time.monotonic()))
+        if not keep:
+            _close_all([conn])
+
+    def _evict_lru(self) -> List[sqlite3.Connection]:
+        # caller holds the lock
+        closed = []
+        while len(self._forms) > self.max_forms:
+            _, old = self._forms.popitem(last=False)
+            old.closed = True
+            closed.extend(c for c, _ in old.idle)
+            old.idle.clear()
+        return closed
+
+    def _sweep(self) -> List[sqlite3.Connection]:
+        # caller holds the lock; runs at most a few times per idle_timeout
+        now = time.monotonic()
+        if now - self._last_sweep < self.idle_timeout / 4:
+            return []
+        self._last_sweep = now
+        cutoff = now - self.idle_timeout
+        closed = []
+        for path in list(self._forms):
+            entry = self._forms[path]
+            fresh = [(c, t) for c, t in entry.idle if t >= cutoff]
+            closed.extend(c for c, t in entry.idle if t < cutoff)
+            entry.idle = fresh
+            if not entry.idle and not entry.in_use:
+                del self._forms[path]
+        return closed
+
+    def invalidate(self, path: str) -> None:
+        """Close every pooled connection for ``path``.
+
+        Connections currently checked out are closed when they are returned.
+        Call this before deleting or replacing the database file.
+        """
+        with self._lock:
+            entry = self._forms.pop(path, None)
+            if entry is None:
+                return
+            entry.closed = True
+            idle = [c for c, _ in entry.idle]
+            entry.idle.clear()
+        _close_all(idle)
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries = list(self._forms.values())
+            self._forms.clear()
+            idle = []
+            for entry in entries:
+                entry.closed = True
+                idle.extend(c for c, _ in entry.idle)
+                entry.idle.clear()
+        _close_all(idle)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "forms": len(self._forms),
+                "idle": sum(len(e.idle) for e in self._forms.values()),
+                "in_use": sum(e.in_use for e in self._forms.values()),
+                "opened": self._opened,
+                "reused": self._reused,
+            }
+
+
+def _close_all(conns) -> None:
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,405 @@
+"""FormStore backed by one SQLite file per form.
+
+Reads check a connection out of the ``SQLiteRegistry`` on the DB executor.
+Writes are jobs for the form's writer thread, so they are group-committed
+and never contend for the file lock.
+"""
+import asyncio
+import itertools
+import os
+import sqlite3
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics, rollups
+from .aggregate import AggregateQuery, histogram_edges, sql_result
+from .aio import run_db
+from .form_catalog import FormCatalog
+from .form_store import (
+    FormExists, FormNotFound, FormStore, RowStream, StoreError,
+    db_path, explicit_id, fetch_chunks, group_by_columns, insert_rows_one_by_one, safe_name, scan_statement,
+)
+from .rollups import Dimension
+from .row_query import RowQuery
+from .schema_cache import SchemaCache, sqlite_columns
+from .slowlog import SlowLog, explain_sqlite
+from .sql import aggregate_sql, histogram_sql, ident, insert_sql, select_sql, update_sql
+from .sqlite_pool import SQLiteRegistry, StorageProfile
+from .sqlite_writer import WriterRegistry
+
+_QUERY = metrics.DB_SECONDS.labels("sqlite", "query")
+_WRITE = metrics.DB_SECONDS.labels("sqlite", "write")
+_EXECUTE = metrics.DB_SECONDS.labels("sqlite", "execute")
+_FETCH = metrics.DB_SECONDS.labels("sqlite", "fetch")
+_LISTED = metrics.DB_ROWS.labels("sqlite", "list_rows")
+
+
+class SQLiteStore(FormStore):
+    kind = "sqlite"
+
+    def __init__(
+        self,
+        data_dir: str,
+        profile: StorageProfile,
+        pool: SQLiteRegistry,
+        writers: WriterRegistry,
+        schema_cache: SchemaCache,
+        catalog: FormCatalog,
+        export_chunk_rows: int = 1000,
+        slow_log: Optional[SlowLog] = None,
+    ):
+        self.data_dir = data_dir
+        self.catalog = catalog
+        self.profile = profile
+        self.pool = pool
+        self.writers = writers
+        self.schema_cache = schema_cache
+        self.export_chunk_rows = export_chunk_rows
+        self.slow_log = slow_log or SlowLog(threshold_ms=-1)
+
+    def path(self, form: str) -> str:
+        return db_path(self.data_dir, form)
+
+    def storage_key(self, form: str) -> str:
+        return self.path(form)
+
+    def _existing(self, form: str) -> str:
+        if not self.catalog.contains(safe_name(form), self.kind):
+            raise FormNotFound(form)
+        return self.path(form)
+
+    async def _read(self, p: str, fn):
+        def work():
+            with _QUERY.time(), self.pool.connection(p) as conn:
+                return fn(conn)
+
+        try:
+            return await run_db(work)
+        except sqlite3.Error as e:
+            raise StoreError(str(e)) from e
+
+    async def _write(self, p: str, job):
+        """Queue ``job(conn)`` on the form's writer thread and await its committed result."""
+        try:
+            with _WRITE.time():
+                return await asyncio.wrap_future(self.writers.submit(p, job))
+        except sqlite3.Error as e:
+            raise StoreError(str(e)) from e
+
+    async def create_form(self, form: str) -> str:
+        p = self.path(form)
+        if os.path.exists(p):
+            raise FormExists(form)
+        # creates the file and switches it to the profile's journal mode
+        await run_db(lambda: self.profile.connect(p).close())
+        self.catalog.add(safe_name(form), self.kind)
+        return p
+
+    async def form_exists(self, form: str) -> bool:
+        return self.catalog.contains(safe_name(form), self.kind)
+
+    async def list_forms(self, prefix: str = "", after: Optional[str] = None, limit: int = 1000) -> Tuple[List[str], Optional[str]]:
+        self.catalog.maybe_refresh()
+        return self.catalog.page(prefix, after, limit)
+
+    async def drop_form(self, form: str) -> Dict[str, Any]:
+        p = self._existing(form)
+
+        def drop():
+            # close pooled handles first so nobody keeps writing to an unlinked file
+            self.writers.stop(p)
+            self.pool.invalidate(p)
+            os.remove(p)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(p + suffix):
+                    os.remove(p + suffix)
+
+        await run_db(drop)
+        self.catalog.discard(safe_name(form), self.kind)
+        self.schema_cache.invalidate(p)
+        return {}
+
+    async def create_table(self, form: str, table: str, columns: List[Tuple[str, str]]) -> None:
+        p = self._existing(form)
+        sql = (f"CREATE TABLE IF NOT EXISTS {ident(table)} (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+               + ", ".join(f"{ident(name)} {ctype}" for name, ctype in columns) + ")")
+        await self._write(p, lambda conn: conn.execute(sql))
+        self.schema_cache.invalidate(p, table)
+
+    async def show_tables(self, form: str) -> List[Any]:
+        return await self._read(self._existing(form), lambda conn: [
+            r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        ])
+
+    async def describe_table(self, form: str, table: str) -> List[Any]:
+        return await self._read(self._existing(form), lambda conn: [
+            dict(cid=r[0], name=r[1], type=r[2], notnull=r[3], dflt_value=r[4], pk=r[5])
+            for r in conn.execute(f"PRAGMA table_info({ident(table)})")
+        ])
+
+    async def columns(self, form: str, table: str) -> Dict[str, str]:
+        p = self._existing(form)
+        cols = self.schema_cache.get(p, table)
+        if cols is None:
+            cols = await self._read(p, lambda conn: sqlite_columns(conn, table))
+            if cols:
+                self.schema_cache.set(p, table, cols)
+        return cols
+
+    async def indexes(self, form: str, table: str) -> List[Dict[str, Any]]:
+        def query(conn):
+            # an INTEGER PRIMARY KEY is the rowid itself and has no index_list entry
+            found = [{"name": "PRIMARY", "columns": ["id"], "unique": True}]
+            for name, unique in conn.execute('SELECT name, "unique" FROM pragma_index_list(?)', (table,)).fetchall():
+                cols = conn.execute("SELECT name FROM pragma_index_info(?) ORDER BY seqno", (name,))
+                found.append({"name": name, "columns": [c.lower() for (c,) in cols if c is not None], "unique": bool(unique)})
+            return found
+
+        return await self._read(self._existing(form), query)
+
+    async def create_index(self, form: str, table: str, name: str, columns: List[str], unique: bool = False) -> None:
+        sql = (f"CREATE {'UNIQUE ' if unique else ''}INDEX {ident(name)} ON {ident(table)} "
+               f"({', '.join(ident(c) for c in columns)})")
+        # on the writer thread: the build holds the write lock, but readers carry on (WAL)
+        await self._write(self._existing(form), lambda conn: conn.execute(sql))
+
+    async def drop_index(self, form: str, table: str, name: str) -> None:
+        sql = f"DROP INDEX {ident(name)}"
+        await self._write(self._existing(form), lambda conn: conn.execute(sql))
+
+    async def drop_table(self, form: str, table: str) -> None:
+        p = self._existing(form)
+        sql = f"DROP TABLE IF EXISTS {ident(table)}"
+
+        def drop(conn):
+            conn.execute(sql)
+            # the triggers went with the table; the side tables and definitions did not
+            for name, _ in self._rollups(conn, table):
+                self._drop_rollup(conn, table, name)
+
+        await self._write(p, drop)
+        self.schema_cache.invalidate(p, table)
+
+    async def insert_row(self, form: str, table: str, row: Dict[str, Any]) -> Any:
+        keys = tuple(row)
+        sql = insert_sql("sqlite", table, keys)
+        values = [row[k] for k in keys]
+        return await self._write(self._existing(form), lambda conn: conn.execute(sql, values).lastrowid)
+
+    async def insert_rows(self, form: str, table: str, rows: List[Any], results: List[Any]) -> None:
+        p = self._existing(form)
+        # one writer job, i.e. one transaction, for the whole request
+        await self._write(p, lambda conn: self._insert_rows(conn, table, rows, results))
+
+    @staticmethod
+    def _insert_rows(conn: sqlite3.Connection, table: str, rows, results) -> None:
+        for keys, idxs in group_by_columns(rows, results).items():
+            sql = insert_sql("sqlite", table, keys)
+            params = [[rows[i][k] for k in keys] for i in idxs]
+            conn.execute("SAVEPOINT bulk_group")
+            try:
+                conn.executemany(sql, params)
+            except sqlite3.Error:
+                conn.execute("ROLLBACK TO SAVEPOINT bulk_group")
+                conn.execute("RELEASE SAVEPOINT bulk_group")
+                insert_rows_one_by_one(conn.cursor(), sql, idxs, params, results)
+                continue
+            conn.execute("RELEASE SAVEPOINT bulk_group")
+            id_key = explicit_id(keys)
+            if id_key is not None:
+                ids = [rows[i][id_key] for i in idxs]
+            else:
+                # rowids handed out inside one write transaction are consecutive
+                last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                ids = range(last - len(idxs) + 1, last + 1)
+            for i, rowid in zip(idxs, ids):
+                results[i] = {"id": rowid}
+
+    async def list_rows(self, form: str, table: str, query: RowQuery) -> List[Dict[str, Any]]:
+        sql = select_sql("sqlite", table, query.shape())
+        params = query.params()
+
+        def query(conn):
+            cur = conn.cursor()
+            cur.row_factory = sqlite3.Row
+            t0 = time.perf_counter()
+            # sqlite3 steps to the first row inside execute; the rest are produced while fetching
+            cur.execute(sql, params)
+            t1 = time.perf_counter()
+            rows = [dict(r) for r in cur]
+            t2 = time.perf_counter()
+            _EXECUTE.observe(t1 - t0)
+            _FETCH.observe(t2 - t1)
+            _LISTED.inc(len(rows))
+            self.slow_log.observe(
+                "sqlite", safe_name(form), sql, params, t2 - t0, len(rows),
+                lambda: explain_sqlite(conn, sql, params), "list_rows",
+            )
+            return rows
+
+        return await self._read(self._existing(form), query)
+
+    async def update_rows(self, form: str, table: str, values: Dict[str, Any], where: Dict[str, Any]) -> int:
+        sql = update_sql("sqlite", table, tuple(values), tuple(where))
+        params = list(values.values()) + list(where.values())
+
+        def update(conn):
+            t0 = time.perf_counter()
+            count = conn.execute(sql, params).rowcount
+            self.slow_log.observe(
+                "sqlite", safe_name(form), sql, params, time.perf_counter() - t0, count,
+                lambda: explain_sqlite(conn, sql, params), "update_rows",
+            )
+            return count
+
+        return await self._write(self._existing(form), update)
+
+    async def aggregate(self, form: str, table: str, query: AggregateQuery) -> Dict[str, Any]:
+        shape, params = query.filter_shape(), query.filter_params()
+
+        def run(conn):
+            groups = hist = None
+            if query.metrics:
+                sql = aggregate_sql("sqlite", table, query.group_by, query.metrics, shape)
+                groups = conn.execute(sql, params + [query.limit]).fetchall()
+            if query.histogram:
+                bounds, buckets = histogram_sql("sqlite", table, query.histogram, shape)
+                lo, hi = conn.execute(bounds, params).fetchone()
+                if lo is not None:
+                    width, _ = histogram_edges(lo, hi, query.bins)
+                    hist = (lo, hi, conn.execute(buckets, [lo, width] + params).fetchall())
+            return sql_result(query, groups, hist)
+
+        return await self._read(self._existing(form), run)
+
+    @staticmethod
+    def _rollups(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str]]:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (rollups.META,)).fetchone() is None:
+            return []
+        return conn.execute(rollups.definitions_sql("sqlite"), (table.lower(),)).fetchall()
+
+    @staticmethod
+    def _drop_rollup(conn: sqlite3.Connection, table: str, name: str) -> None:
+        for stmt in rollups.drop_ddl("sqlite", table, name):
+            conn.execute(stmt)
+        conn.execute(rollups.unregister_sql("sqlite"), (table.lower(), name.lower()))
+
+    async def rollups(self, form: str, table: str) -> List[Tuple[str, str]]:
+        return await self._read(self._existing(form), lambda conn: self._rollups(conn, table))
+
+    async def create_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        stmts = ([rollups.meta_ddl("sqlite")] + rollups.create_ddl("sqlite", table, name, dims, {})
+                 + rollups.rebuild_sql("sqlite", table, name, dims))
+
+        def create(conn):
+            # one writer job: triggers and backfill commit together, so no insert is missed or counted twice
+            for stmt in stmts:
+                conn.execute(stmt)
+            conn.execute(rollups.register_sql("sqlite"), (table.lower(), name.lower(), rollups.dumps(dims)))
+
+        await self._write(self._existing(form), create)
+
+    async def rebuild_rollup(self, form: str, table: str, name: str, dims: List[Dimension]) -> None:
+        stmts = rollups.rebuild_sql("sqlite", table, name, dims)
+
+        def rebuild(conn):
+            for stmt in stmts:
+                conn.execute(stmt)
+
+        await self._write(self._existing(form), rebuild)
+
+    async def read_rollup(self, form: str, table: str, name: str, dims: List[Dimension], limit: int) -> List[tuple]:
+        sql = rollups.read_sql("sqlite", table, name, dims)
+        return await self._read(self._existing(form), lambda conn: conn.execute(sql, (limit,)).fetchall())
+
+    async def drop_rollup(self, form: str, table: str, name: str) -> None:
+        await self._write(self._existing(form), lambda conn: self._drop_rollup(conn, table, name))
+
+    async def open_export(
+        self, form: str, table: str,
+        fields: Optional[Tuple[str, ...]] = None, filters: Tuple[Tuple[str, str, tuple], ...] = (),
+    ) -> RowStream:
+        p = self._existing(form)
+        sql, params = scan_statement("sqlite", table, fields, filters)
+
+        def open_cursor():
+            stack = ExitStack()
+            try:
+                conn = stack.enter_context(self.pool.connection(p))
+                t0 = time.perf_counter()
+                cur = conn.execute(sql, params)
+                started = time.perf_counter() - t0
+            except BaseException:
+                stack.close()
+                raise
+
+            def done(rows, fetched, complete):
+                # an export closed early may have given the connection back to the pool already
+                explain = (lambda: explain_sqlite(conn, sql, params)) if complete else None
+                self.slow_log.observe("sqlite", safe_name(form), sql, params, started + fetched, rows, explain, "scan")
+
+            cols = [d[0] for d in cur.description]
+            return RowStream(cols, fetch_chunks(cur, self.export_chunk_rows, self.kind, done), stack.close)
+
+        try:
+            return await run_db(open_cursor)
+        except sqlite3.Error as e:
+            raise StoreError(str(e)) from e
+
+    async def submit(self, form: str, fields: Dict[str, Any]) -> None:
+        await self.submit_many(form, [fields])
+
+    async def submit_many(self, form: str, rows: List[Dict[str, Any]]) -> None:
+        p = self.path(form)
+        keys = list(dict.fromkeys(k for fields in rows for k in fields))
+        try:
+            # queued on the form's writer thread; the event loop is free until it commits
+            await self._write(p, lambda conn: self._save_submissions(conn, p, rows, keys))
+        except Exception:
+            # the DDL may have been rolled back with the failed insert
+            self.schema_cache.invalidate(p, "submissions")
+            raise
+        # the first submission creates the form's database file
+        self.catalog.add(safe_name(form), self.kind)
+
+    def _save_submissions(self, conn: sqlite3.Connection, p: str, rows: List[Dict[str, Any]], keys: List[str]) -> None:
+        # runs on the form's writer thread, so schema changes for one form are serialized
+        known = self.schema_cache.get(p, "submissions")
+        if known is None:
+            known = sqlite_columns(conn, "submissions")
+            if not known:
+                columns = "".join(f", {ident(key)} TEXT" for key in keys if key.lower() != "submitted_at")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS submissions "
+                    f"(id INTEGER PRIMARY KEY, submitted_at TEXT DEFAULT CURRENT_TIMESTAMP{columns})"
+                )
+                known = sqlite_columns(conn, "submissions")
+            self.schema_cache.set(p, "submissions", known)
+        for key in keys:
+            if key.lower() not in known:
+                try:
+                    conn.execute(f"ALTER TABLE submissions ADD COLUMN {ident(key)} TEXT")
+                except sqlite3.OperationalError as e:
+                    # another process may have added it first
+                    if "duplicate column" not in str(e):
+                        raise
+                self.schema_cache.add_column(p, "submissions", key, "TEXT")
+                known = dict(known, **{key.lower(): "TEXT"})
+
+        # one executemany per run of rows with the same columns, so ids follow the submission order
+        for cols, run in itertools.groupby(rows, key=tuple):
+            conn.executemany(insert_sql("sqlite", "submissions", cols), [list(fields.values()) for fields in run])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "catalog": self.catalog.stats(),
+            "sqlite": self.pool.stats(),
+            "sqlite_writers": self.writers.stats(),
+            "storage_profile": self.profile.as_dict(),
+        }
+
+    async def close(self) -> None:
+        # flush queued writes and close form DBs cleanly (checkpoints the WAL)
+        await run_db(self.writers.stop_all)
+        self.pool.close_all()
@@ -0,0 +1,195 @@
+"""Single-writer queues for the per-form SQLite databases.
+
+SQLite allows one writer per file. When every request opened its own
+connection and committed on its own, concurrent writers queued on the file
+lock and sometimes gave up with "database is locked". Instead, each form
+gets one ``FormWriter`` thread that owns the form's only write connection.
+Requests submit a job (a callable taking that connection) and get a
+``concurrent.futures.Future`` back.
+
+The writer drains everything that is queued, runs each job in its own
+savepoint inside one ``BEGIN IMMEDIATE`` transaction and commits once. A
+burst of inserts therefore costs one commit instead of one per row (group
+commit). A failing job only rolls back its own savepoint. Futures resolve
+after the commit, so a caller that got its result can read its own write
+through any pooled reader connection.
+"""
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from . import metrics
+
+Job = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+_COMMIT = metrics.DB_SECONDS.labels("sqlite", "commit")
+
+
+class FormWriter(threading.Thread):
+    def __init__(self, registry: "WriterRegistry", path: str):
+        super().__init__(name=f"form-writer:{path}", daemon=True)
+        self.registry = registry
+        self.path = path
+        self.queue: "queue.Queue" = queue.Queue()
+        self.stopped = False
+        self.jobs = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+
+    def run(self) -> None:
+        conn = None
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.registry.idle_timeout)
+                except queue.Empty:
+                    if self.registry._retire(self):
+                        return
+                    continue
+                if item is _STOP:
+                    return
+                batch = [item]
+                while len(batch) < self.registry.max_batch:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        self.queue.put(_STOP)  # finish this batch, then stop
+                        break
+                    batch.append(item)
+                if conn is None:
+                    try:
+                        conn = self.registry.connect(self.path)
+                        # transactions are managed here, not by the sqlite3 module
+                        conn.isolation_level = None
+                    except Exception as e:
+                        for _, fut in batch:
+                            fut.set_exception(e)
+                        continue
+                self._run_batch(conn, batch)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _run_batch(self, conn: sqlite3.Connection, batch) -> None:
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job, fut in batch:
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = job(conn)
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO SAVEPOINT job")
+                    conn.execute("RELEASE SAVEPOINT job")
+                    outcomes.append((fut, None, e))
+                else:
+                    conn.execute("RELEASE SAVEPOINT job")
+                    outcomes.append((fut, result, None))
+            with _COMMIT.time():
+                conn.execute("COMMIT")
+        except Exception as e:
+            # the transaction itself failed: nothing in this batch was committed
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        self.jobs += len(batch)
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        for fut, result, exc in outcomes:
+            if exc is None:
+                fut.set_result(result)
+            else:
+                fut.set_exception(exc)
+
+
+class WriterRegistry:
+    """One FormWriter per database path, started on first write.
+
+    Writers exit after ``idle_timeout`` seconds without work, so idle forms
+    do not keep a thread and a file handle open.
+    """
+
+    def __init__(self, connect: Callable[[str], sqlite3.Connection], max_batch: int = 256, idle_timeout: float = 30.0):
+        self.connect = connect
+        self.max_batch = max_batch
+        self.idle_timeout = idle_timeout
+        self._writers: Dict[str, FormWriter] = {}
+        self._lock = threading.Lock()
+        self._retired_jobs = 0
+        self._retired_batches = 0
+
+    def submit(self, path: str, job: Job) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            writer = self._writers.get(path)
+            if writer is None:
+                writer = FormWriter(self, path)
+                self._writers[path] = writer
+                writer.start()
+            writer.queue.put((job, fut))
+        return fut
+
+    def run(self, path: str, job: Job, timeout: Optional[float] = None) -> Any:
+        """Submit ``job`` and wait for its committed result."""
+        return self.submit(path, job).result(timeout)
+
+    def _retire(self, writer: FormWriter) -> bool:
+        # called by an idle writer; only retire if nothing was queued meanwhile
+        with self._lock:
+            if not writer.queue.empty():
+                return False
+            if self._writers.get(writer.path) is writer:
+                del self._writers[writer.path]
+            writer.stopped = True
+            self._retired_jobs += writer.jobs
+            self._retired_batches += writer.batches
+            return True
+
+    def stop(self, path: str, timeout: float = 10.0) -> None:
+        """Finish queued work for ``path`` and close its write connection.
+
+        Call this before deleting the database file.
+        """
+        with self._lock:
+            writer = self._writers.pop(path, None)
+            if writer is None:
+                return
+            writer.stopped = True
+            writer.queue.put(_STOP)
+        writer.join(timeout)
+        with self._lock:
+            self._retired_jobs += writer.jobs
+            self._retired_batches += writer.batches
+
+    def stop_all(self) -> None:
+        for path in list(self._writers):
+            self.stop(path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            writers = list(self._writers.values())
+            jobs = self._retired_jobs + sum(w.jobs for w in writers)
+            batches = self._retired_batches + sum(w.batches for w in writers)
+        return {
+            "writers": len(writers),
+            "queued": sum(w.queue.qsize() for w in writers),
+            "jobs": jobs,
+            "commits": batches,
+            "avg_batch": round(jobs / batches, 2) if batches else 0.0,
+            "max_batch": max((w.max_batch_seen for w in writers), default=0),
+        }
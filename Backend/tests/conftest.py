@@ -0,0 +1,11 @@
+"""Run with ``python -m pytest Backend/tests`` from the repository root.
+
+The service is imported as the ``Backend`` package, as uvicorn does, so the
+root has to be on sys.path; numpy-only helpers also work standalone.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,103 @@
+import importlib
+import io
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def client(request, tmp_path, monkeypatch):
+    # api reads its configuration at import, so import it afresh per store
+    monkeypatch.setenv("FORM_STORE", request.param)
+    monkeypatch.setenv("FORM_DB_DIR", str(tmp_path))
+    monkeypatch.setenv("EXPORT_CHUNK_ROWS", "2")
+    monkeypatch.delenv("USE_MARIADB", raising=False)
+    monkeypatch.delenv("INGEST_BUFFER", raising=False)
+    sys.modules.pop("Backend.api", None)
+    api = importlib.import_module("Backend.api")
+    with TestClient(api.app) as c:
+        yield c
+    sys.modules.pop("Backend.api", None)
+
+
+@pytest.fixture
+def people(client):
+    assert client.post("/forms", json={"form_name": "survey"}).status_code == 201
+    r = client.post("/forms/survey/tables", json={
+        "table": "people",
+        "columns": [{"name": "name", "type": "TEXT"}, {"name": "age", "type": "INTEGER"}],
+    })
+    assert r.status_code == 201
+    return "/forms/survey/tables/people"
+
+
+def test_forms_and_tables(client, people):
+    assert client.get("/forms").json()["forms"] == ["survey"]
+    assert "people" in client.get("/forms/survey/show_tables").json()["tables"]
+    assert client.get("/health").json() == {"ok": True}
+
+
+def test_insert_and_page_with_cursor(client, people):
+    for i in range(5):
+        assert client.post(people + "/rows", json={"row": {"name": f"p{i}", "age": 20 + i}}).status_code == 201
+    first = client.get(people + "/rows", params={"limit": 2}).json()
+    assert [r["name"] for r in first["rows"]] == ["p4", "p3"]
+    second = client.get(people + "/rows", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [r["name"] for r in second["rows"]] == ["p2", "p1"]
+    last = client.get(people + "/rows", params={"limit": 2, "cursor": second["next_cursor"]}).json()
+    assert [r["name"] for r in last["rows"]] == ["p0"] and last["next_cursor"] is None
+    older = client.get(people + "/rows", params={"filter": "age:lt:22", "sort": "age", "fields": "name"}).json()
+    assert [r["name"] for r in older["rows"]] == ["p0", "p1"]
+
+
+def test_bulk_insert_reports_every_row(client, people):
+    r = client.post(people + "/rows/bulk", json=[{"ID": 10, "name": "a"}, {}, {"name": "b", "age": 3}])
+    body = r.json()
+    assert body["inserted"] == 2 and not body["ok"]
+    assert body["results"][0] == {"id": 10}
+    assert "error" in body["results"][1]
+    assert body["results"][2]["id"] > 10
+
+
+def test_etag_and_invalidation_on_write(client, people):
+    client.post(people + "/rows", json={"row": {"name": "a", "age": 1}})
+    first = client.get(people + "/rows")
+    etag = first.headers["ETag"]
+    assert client.get(people + "/rows", headers={"If-None-Match": etag}).status_code == 304
+    client.post(people + "/update", json={"set": {"age": 2}, "where": {"name": "a"}})
+    after = client.get(people + "/rows", headers={"If-None-Match": etag})
+    assert after.status_code == 200 and after.json()["rows"][0]["age"] == 2
+
+
+def test_aggregate(client, people):
+    client.post(people + "/rows/bulk", json=[{"name": n, "age": a} for n, a in
+                                             [("x", 10), ("x", 20), ("y", 30), ("y", 50)]])
+    out = client.get(people + "/aggregate", params={
+        "group_by": "name", "metrics": "count,avg:age", "histogram": "age", "bins": 4,
+    }).json()
+    groups = {g["name"]: g for g in out["groups"]}
+    assert groups["x"]["count"] == 2 and groups["y"]["avg_age"] == 40
+    assert sum(out["histogram"]["counts"]) == 4
+    assert client.get("/forms/survey/tables/missing/aggregate").status_code == 404
+
+
+def test_submit_creates_and_extends_the_table(client):
+    assert client.post("/submit", json={"form_name": "contact", "fields": {"email": "a@b"}}).status_code == 200
+    assert client.post("/submit", json={"form_name": "contact", "fields": {"email": "c@d", "age": 3}}).status_code == 200
+    rows = client.get("/forms/contact/tables/submissions/rows").json()["rows"]
+    assert [r["email"] for r in rows] == ["c@d", "a@b"]
+    assert client.post("/submit", json={"form_name": "contact", "fields": {"bad key": 1}}).status_code == 400
+
+
+def test_export_formats(client, people):
+    # the third row's text lands in the INTEGER column in the second export chunk
+    client.post(people + "/rows/bulk", json=[{"name": "a", "age": 1}, {"name": "b", "age": 2}, {"name": "c", "age": "abc"}])
+    assert client.get(people + "/export").json()["rows"][2][1:] == ["c", "abc"]
+    assert client.get(people + "/export", params={"format": "csv"}).text.splitlines()[0] == "id,name,age"
+    pq = pytest.importorskip("pyarrow.parquet")
+    r = client.get(people + "/export", params={"format": "parquet"})
+    assert r.status_code == 200
+    table = pq.read_table(io.BytesIO(r.content))
+    assert table.column("age").to_pylist() == [1, 2, None]
+    assert str(table.schema.field("age").type) == "int64"
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from Backend import downsample
+
+
+def chunked(x, y, size):
+    return [(x[i:i + size], y[i:i + size]) for i in range(0, len(x), size)]
+
+
+def reference_lttb(x, y, points):
+    """Textbook LTTB over whole arrays."""
+    n = len(x)
+    every = (n - 2) / (points - 2)
+    a, keep = 0, [0]
+    for k in range(points - 2):
+        lo, hi = int(k * every) + 1, int((k + 1) * every) + 1
+        nlo, nhi = hi, min(int((k + 2) * every) + 1, n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep.append(a)
+    keep.append(n - 1)
+    return x[keep], y[keep]
+
+
+@pytest.mark.parametrize("n,points,size", [(1000, 50, 7), (12345, 300, 1000), (101, 3, 10), (500, 100, 500)])
+def test_lttb_matches_reference(n, points, size):
+    rng = np.random.default_rng(n)
+    x = np.arange(n, dtype=float)
+    y = rng.normal(size=n).cumsum()
+    got = downsample.lttb(chunked(x, y, size), n, points)
+    want = reference_lttb(x, y, points)
+    assert np.array_equal(got[0], want[0])
+    assert np.array_equal(got[1], want[1])
+
+
+def test_lttb_keeps_every_row_when_under_target():
+    x = np.arange(10.0)
+    got_x, got_y = downsample.lttb(chunked(x, x * 2, 3), 10, 50)
+    assert got_x.tolist() == x.tolist()
+    assert got_y.tolist() == (x * 2).tolist()
+
+
+def test_lttb_stale_count_short_stream_ends_at_last_row():
+    x = np.arange(100.0)
+    y = np.sin(x)
+    got_x, got_y = downsample.lttb(chunked(x, y, 7), 200, 10)
+    assert got_x[0] == 0
+    assert got_x[-1] == 99
+    assert got_y[-1] == y[99]
+    assert list(got_x) == sorted(set(got_x))
+
+
+def test_lttb_stale_count_long_stream_stops_at_n():
+    x = np.arange(300.0)
+    got_x, _ = downsample.lttb(chunked(x, np.cos(x), 64), 200, 20)
+    assert len(got_x) == 20
+    assert got_x[-1] == 199
+
+
+def test_lttb_empty_and_invalid():
+    got_x, got_y = downsample.lttb([], 10, 5)
+    assert len(got_x) == len(got_y) == 0
+    with pytest.raises(ValueError):
+        downsample.lttb([], 10, 2)
+
+
+@pytest.mark.parametrize("agg,want", [
+    ("mean", [2, 8, 15]), ("sum", [6, 24, 60]), ("min", [0, 6, 12]), ("max", [4, 10, 18]), ("count", [3, 3, 4]),
+])
+def test_binned_aggregates_across_chunks(agg, want):
+    x = np.arange(10.0)
+    centres, values = downsample.binned(chunked(x, x * 2, 4), 0, 9, 3, agg)
+    assert centres.tolist() == [1.5, 4.5, 7.5]
+    assert values.tolist() == want
+
+
+def test_binned_drops_empty_bins_and_rejects_unknown_agg():
+    centres, values = downsample.binned([(np.array([0.0, 9.0]), np.array([1.0, 2.0]))], 0, 9, 3)
+    assert centres.tolist() == [1.5, 7.5]
+    assert values.tolist() == [1, 2]
+    with pytest.raises(ValueError):
+        downsample.binned([], 0, 1, 3, "median")
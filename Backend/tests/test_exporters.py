@@ -0,0 +1,61 @@
+import datetime
+import decimal
+import io
+
+import pytest
+
+from Backend import exporters
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+TYPES = {"id": "INTEGER", "age": "INTEGER", "score": "decimal(10,2)", "name": "TEXT", "note": "", "born": "DATE"}
+COLUMNS = ["id", "age", "score", "name", "note", "born"]
+
+
+def parquet(chunks, types=TYPES, columns=COLUMNS):
+    return pq.read_table(io.BytesIO(b"".join(exporters.encode_parquet(columns, chunks, types))))
+
+
+def arrow(chunks, types=TYPES, columns=COLUMNS):
+    body = b"".join(exporters.encode_arrow(columns, chunks, types))
+    return pa.ipc.open_stream(body).read_all()
+
+
+def test_schema_follows_declared_types():
+    assert [str(exporters.arrow_type(t)) for t in
+            ("INTEGER", "bigint(20) unsigned", "VARCHAR(20)", "double", "decimal(10,2)",
+             "datetime", "date", "blob", "", "enum('point','interval')")] == [
+        "int64", "int64", "string", "double", "double", "timestamp[us]", "date32[day]", "binary", "string", "string",
+    ]
+
+
+@pytest.mark.parametrize("read", [parquet, arrow])
+def test_mixed_types_in_later_chunks(read):
+    chunks = [
+        [(1, 30, decimal.Decimal("1.50"), "a", 5, "2024-05-01")],
+        # what SQLite lets an INTEGER/untyped column hold after the first chunk
+        [(2, "41", 2, 7, "text", datetime.date(2024, 5, 2)), (3, "abc", "x", None, b"raw", "not a date")],
+        [(4, 2.0, None, "d", 1.5, None), (5, 2.5, 3.25, "e", None, "2024-05-03 10:00:00")],
+    ]
+    table = read(chunks)
+    assert table.num_rows == 5
+    assert str(table.schema.field("age").type) == "int64"
+    assert table.column("age").to_pylist() == [30, 41, None, 2, None]
+    assert table.column("score").to_pylist() == [1.5, 2.0, None, None, 3.25]
+    assert table.column("name").to_pylist() == ["a", "7", None, "d", "e"]
+    assert table.column("note").to_pylist() == ["5", "text", "raw", "1.5", None]
+    assert table.column("born").to_pylist() == [
+        datetime.date(2024, 5, 1), datetime.date(2024, 5, 2), None, None, datetime.date(2024, 5, 3),
+    ]
+
+
+def test_empty_table_keeps_its_schema():
+    table = parquet([])
+    assert table.num_rows == 0
+    assert [str(f.type) for f in table.schema] == ["int64", "int64", "double", "string", "string", "date32[day]"]
+
+
+def test_columns_without_types_are_strings():
+    table = arrow([[(1, datetime.datetime(2024, 1, 2, 3, 4))]], types=None, columns=["a", "b"])
+    assert table.to_pylist() == [{"a": "1", "b": "2024-01-02T03:04:00"}]
@@ -0,0 +1,150 @@
+import asyncio
+import os
+
+import pytest
+
+from Backend import ingest_buffer
+from Backend.ingest_buffer import BufferFull, IngestBuffer
+
+
+class Sink:
+    """Flush target; rows whose ``bad`` field is set fail, as a bad submission would."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, form, rows):
+        if any(r.get("bad") for r in rows):
+            raise RuntimeError("bad row")
+        self.batches.append((form, list(rows)))
+
+    def rows(self, form=None):
+        return [r for f, rows in self.batches if form in (None, f) for r in rows]
+
+
+def segments(path):
+    return sorted(n for n in os.listdir(path) if n[:-4].isdigit())
+
+
+def test_record_round_trip_and_torn_lines():
+    line = ingest_buffer.encode("f", {"a": 1, "b": "x"}, 2)
+    item = ingest_buffer.decode(line)
+    assert (item.form, item.fields, item.attempts) == ("f", {"a": 1, "b": "x"}, 2)
+    assert ingest_buffer.decode(line[:-5]) is None  # torn mid-append
+    assert ingest_buffer.decode(b"00000000 " + line[9:]) is None  # CRC mismatch
+    assert ingest_buffer.decode(b"garbage\n") is None
+
+
+def test_unknown_durability():
+    with pytest.raises(RuntimeError):
+        IngestBuffer("/nonexistent", Sink(), durability="sometimes")
+
+
+@pytest.mark.parametrize("durability", ["memory", "write", "fsync"])
+def test_flush_stores_one_batch_per_form(tmp_path, durability):
+    sink = Sink()
+
+    async def run():
+        buf = IngestBuffer(str(tmp_path), sink, durability=durability, flush_ms=60_000)
+        await buf.start()
+        for i in range(5):
+            await buf.append("a" if i % 2 else "b", {"i": i})
+        await buf.flush()
+        await buf.close()
+        return buf
+
+    buf = asyncio.run(run())
+    assert sorted(f for f, _ in sink.batches) == ["a", "b"]
+    assert [r["i"] for r in sink.rows("b")] == [0, 2, 4]
+    assert buf.flushed == 5 and buf.stats()["depth"] == 0
+    if durability != "memory":
+        assert segments(tmp_path) == []
+
+
+def test_fsync_appends_share_fsyncs(tmp_path):
+    async def run():
+        buf = IngestBuffer(str(tmp_path), Sink(), durability="fsync", flush_ms=60_000)
+        await buf.start()
+        await asyncio.gather(*(buf.append("f", {"i": i}) for i in range(50)))
+        fsyncs = buf.fsyncs
+        await buf.close()
+        return fsyncs
+
+    assert 1 <= asyncio.run(run()) < 50
+
+
+def test_replay_after_crash_skips_torn_line(tmp_path):
+    sink = Sink()
+    with open(tmp_path / "000000000003.log", "wb") as fh:
+        fh.write(ingest_buffer.encode("f", {"i": 1}))
+        fh.write(ingest_buffer.encode("f", {"i": 2}))
+        fh.write(ingest_buffer.encode("f", {"i": 3})[:-7])
+
+    async def run():
+        buf = IngestBuffer(str(tmp_path), sink, flush_ms=60_000)
+        await buf.start()
+        await buf.close()
+        return buf
+
+    buf = asyncio.run(run())
+    assert [r["i"] for r in sink.rows()] == [1, 2]
+    assert (buf.replayed, buf.torn) == (2, 1)
+    assert segments(tmp_path) == []
+
+
+def test_unflushed_appends_survive_a_restart(tmp_path):
+    async def crash():
+        buf = IngestBuffer(str(tmp_path), Sink(), durability="write", flush_ms=60_000)
+        await buf.start()
+        await buf.append("f", {"i": 1})
+        await buf.append("f", {"i": 2})
+        buf._task.cancel()  # the process dies: no flush, no close
+
+    asyncio.run(crash())
+    sink = Sink()
+
+    async def restart():
+        buf = IngestBuffer(str(tmp_path), sink, durability="write", flush_ms=60_000)
+        await buf.start()
+        await buf.close()
+
+    asyncio.run(restart())
+    assert [r["i"] for r in sink.rows()] == [1, 2]
+
+
+def test_bad_rows_are_retried_then_dead_lettered(tmp_path):
+    sink = Sink()
+
+    async def run():
+        buf = IngestBuffer(str(tmp_path), sink, flush_ms=60_000, max_attempts=2)
+        await buf.start()
+        await buf.append("f", {"i": 1})
+        await buf.append("f", {"i": 2, "bad": True})
+        await buf.append("f", {"i": 3})
+        await buf.flush()
+        assert buf.stats()["depth"] == 1  # kept for another attempt
+        await buf.flush()
+        await buf.close()
+        return buf
+
+    buf = asyncio.run(run())
+    # the good rows of the failed batch are still stored
+    assert [r["i"] for r in sink.rows()] == [1, 3]
+    assert (buf.retried, buf.dead) == (1, 1)
+    with open(tmp_path / "dead.log", "rb") as fh:
+        dead = [ingest_buffer.decode(line) for line in fh]
+    assert [(d.fields["i"], d.attempts) for d in dead] == [(2, 2)]
+
+
+def test_full_buffer_rejects(tmp_path):
+    async def run():
+        buf = IngestBuffer(str(tmp_path), Sink(), durability="memory", flush_ms=60_000, max_pending=2)
+        await buf.start()
+        await buf.append("f", {})
+        await buf.append("f", {})
+        with pytest.raises(BufferFull):
+            await buf.append("f", {})
+        await buf.close()
+        return buf
+
+    assert asyncio.run(run()).rejected == 1
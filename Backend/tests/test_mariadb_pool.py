@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from Backend.mariadb_pool import MariaDBPool, PoolTimeout
+
+
+class FakeConn:
+    opened = 0
+
+    def __init__(self):
+        FakeConn.opened += 1
+        self.id = FakeConn.opened
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        if self.closed:
+            raise RuntimeError("closed")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_connections_are_reused():
+    pool = MariaDBPool(FakeConn, max_size=2)
+    with pool.connection() as a:
+        pass
+    with pool.connection() as b:
+        assert b is a
+    assert pool.stats()["size"] == 1
+
+
+def test_reset_closes_idle_and_checked_out_connections():
+    pool = MariaDBPool(FakeConn, max_size=4)
+    with pool.connection() as held:
+        with pool.connection() as idle:
+            pass
+        pool.reset()
+        assert idle.closed and not held.closed
+    # the connection held across reset() is not put back
+    assert held.closed
+    assert pool.stats()["size"] == 0
+    with pool.connection() as fresh:
+        assert fresh is not held and not fresh.closed
+    with pool.connection() as again:
+        assert again is fresh
+
+
+def test_connection_opened_during_reset_is_not_reused():
+    pool = MariaDBPool(lambda: (opening.wait(), FakeConn())[1], max_size=2)
+    opening = threading.Event()
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool._checkout()))
+    t.start()
+    pool.reset()
+    opening.set()
+    t.join()
+    pool._checkin(got[0], True)
+    assert got[0].conn.closed and pool.stats()["size"] == 0
+
+
+def test_checkout_times_out_when_full():
+    pool = MariaDBPool(FakeConn, max_size=1, wait_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    assert pool.stats()["timeouts"] == 1
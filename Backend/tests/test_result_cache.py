@@ -0,0 +1,97 @@
+import time
+
+from Backend.result_cache import ResultCache
+
+
+def fill(cache, key, form, table, body=b"[]"):
+    return cache.put(key, cache.token(form, table), body)
+
+
+def test_hit_until_the_table_is_written():
+    cache = ResultCache()
+    fill(cache, ("rows", 1), "f", "t")
+    assert cache.get(("rows", 1), "f", "t") is not None
+    cache.invalidate("f", "other")
+    assert cache.get(("rows", 1), "f", "t") is not None
+    cache.invalidate("f", "T")  # table names match in any case
+    assert cache.get(("rows", 1), "f", "t") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_table_list_and_whole_form_invalidation():
+    cache = ResultCache()
+    fill(cache, "tables", "f", None)
+    fill(cache, "rows", "f", "t")
+    cache.invalidate("f", "t")
+    assert cache.get("tables", "f", None) is not None
+    cache.invalidate("f", tables=True)
+    assert cache.get("tables", "f", None) is None
+    fill(cache, "rows", "f", "t")
+    cache.invalidate("f")
+    assert cache.get("rows", "f", "t") is None
+
+
+def test_storage_is_shared_by_key_not_by_form():
+    # entries are per form, generations per storage (one MariaDB database for every form)
+    cache = ResultCache()
+    fill(cache, ("a", "rows"), "mariadb:db", "t")
+    fill(cache, ("b", "rows"), "mariadb:db", "t")
+    cache.invalidate("mariadb:db", "t")
+    assert cache.get(("a", "rows"), "mariadb:db", "t") is None
+    assert cache.get(("b", "rows"), "mariadb:db", "t") is None
+
+
+def test_read_racing_a_write_is_never_served():
+    cache = ResultCache()
+    token = cache.token("f", "t")  # taken before the read
+    cache.invalidate("f", "t")     # a write commits meanwhile
+    cache.put("rows", token, b"[1]")
+    assert cache.get("rows", "f", "t") is None
+
+
+def test_ttl_expiry():
+    cache = ResultCache(ttl=0.01)
+    fill(cache, "rows", "f", "t")
+    time.sleep(0.02)
+    assert cache.get("rows", "f", "t") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_by_size():
+    body = b"x" * 300
+    cache = ResultCache(max_bytes=1200)  # two entries with their overhead
+    fill(cache, 1, "f", "t", body)
+    fill(cache, 2, "f", "t", body)
+    assert cache.get(1, "f", "t") is not None  # 1 is now the most recent
+    fill(cache, 3, "f", "t", body)
+    assert cache.get(2, "f", "t") is None
+    assert cache.get(1, "f", "t") is not None
+    assert cache.evictions == 1
+    assert cache.stats()["bytes"] <= 1200
+
+
+def test_oversized_and_disabled():
+    cache = ResultCache(max_bytes=100)
+    entry = fill(cache, 1, "f", "t", b"x" * 500)
+    assert entry.body and cache.get(1, "f", "t") is None
+    assert not ResultCache(max_bytes=0).enabled
+
+
+def test_etag_depends_only_on_the_body():
+    cache = ResultCache()
+    a = fill(cache, 1, "f", "t", b'{"rows": []}')
+    cache.invalidate("f", "t")
+    b = fill(cache, 1, "f", "t", b'{"rows": []}')
+    c = fill(cache, 2, "f", "t", b'{"rows": [1]}')
+    assert a.etag == b.etag != c.etag
+    assert a.etag.startswith('"') and a.etag.endswith('"')
+
+
+def test_mariadb_forms_share_one_storage_key(tmp_path):
+    from Backend.mariadb_store import MariaDBStore
+    from Backend.sqlite_store import SQLiteStore
+
+    maria = MariaDBStore(str(tmp_path), "app", None, None, None)
+    assert maria.storage_key("a") == maria.storage_key("b")
+    lite = SQLiteStore(str(tmp_path), None, None, None, None, None)
+    assert lite.storage_key("a") != lite.storage_key("b")
@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+from Backend import rollups
+from Backend.row_query import InvalidQuery
+
+COLUMNS = {"id": "INTEGER", "city": "TEXT", "created": "TEXT"}
+
+
+def test_parse_dimensions():
+    dims = rollups.parse_dimensions(COLUMNS, ["City", "DAY(created)"])
+    assert [(d.column, d.day, d.label, d.spec) for d in dims] == [
+        ("City", False, "city", "City"),
+        ("created", True, "day_created", "day(created)"),
+    ]
+    assert [d.spec for d in rollups.loads(rollups.dumps(dims))] == ["City", "day(created)"]
+    for bad in ([], ["nope"], ["city", "CITY"], ["day(missing)"]):
+        with pytest.raises(InvalidQuery):
+            rollups.parse_dimensions(COLUMNS, bad)
+
+
+def test_check_names_rejects_long_identifiers():
+    dims = rollups.parse_dimensions(COLUMNS, ["city"])
+    rollups.check_names("t", "by_city", dims)
+    with pytest.raises(InvalidQuery):
+        rollups.check_names("t" * 40, "n" * 20, dims)
+    with pytest.raises(InvalidQuery):
+        rollups.check_names("t", "x", [rollups.Dimension("c" * 61, day=True)])
+
+
+@pytest.fixture
+def db():
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, city TEXT, created TEXT)")
+    con.executemany("INSERT INTO t (city, created) VALUES (?, ?)", [
+        ("Oslo", "2024-05-01 10:00:00"),
+        ("Oslo", "2024-05-01 12:00:00"),
+        ("Rome", "2024-05-02 09:00:00"),
+        (None, "2024-05-02 11:00:00"),
+    ])
+    yield con
+    con.close()
+
+
+def rollup(con, specs):
+    dims = rollups.parse_dimensions(COLUMNS, specs)
+    for stmt in rollups.create_ddl("sqlite", "t", "r", dims, COLUMNS) + rollups.rebuild_sql("sqlite", "t", "r", dims):
+        con.execute(stmt)
+    return dims
+
+
+def counts(con, dims):
+    rows = con.execute(rollups.read_sql("sqlite", "t", "r", dims), (100,)).fetchall()
+    return rollups.result("r", dims, rows)
+
+
+def test_rebuild_backfills_counts(db):
+    dims = rollup(db, ["city"])
+    out = counts(db, dims)
+    assert out["total"] == 4
+    assert {r["city"]: r["count"] for r in out["rows"]} == {None: 1, "Oslo": 2, "Rome": 1}
+
+
+def test_triggers_track_inserts_updates_and_deletes(db):
+    dims = rollup(db, ["city", "day(created)"])
+    db.execute("INSERT INTO t (city, created) VALUES ('Rome', '2024-05-02 18:00:00')")
+    db.execute("UPDATE t SET city = 'Rome' WHERE city = 'Oslo' AND created LIKE '2024-05-01 12%'")
+    db.execute("UPDATE t SET created = '2024-05-02 11:30:00' WHERE city IS NULL")  # same key
+    db.execute("DELETE FROM t WHERE city IS NULL")
+    got = {(r["city"], r["day_created"]): r["count"] for r in counts(db, dims)["rows"]}
+    assert got == {("Oslo", "2024-05-01"): 1, ("Rome", "2024-05-01"): 1, ("Rome", "2024-05-02"): 2}
+    # the trigger-maintained table matches a fresh rebuild, and emptied keys are gone
+    for stmt in rollups.rebuild_sql("sqlite", "t", "r", dims):
+        db.execute(stmt)
+    assert {(r["city"], r["day_created"]): r["count"] for r in counts(db, dims)["rows"]} == got
+
+
+def test_drop_removes_triggers_and_side_table(db):
+    dims = rollup(db, ["city"])
+    for stmt in rollups.drop_ddl("sqlite", "t", "r"):
+        db.execute(stmt)
+    assert db.execute("SELECT name FROM sqlite_master WHERE name LIKE 'rollup_%'").fetchall() == []
+    db.execute("INSERT INTO t (city) VALUES ('Oslo')")  # no trigger left to fail
+
+
+def test_definitions_round_trip(db):
+    db.execute(rollups.meta_ddl("sqlite"))
+    dims = rollups.parse_dimensions(COLUMNS, ["day(created)"])
+    db.execute(rollups.register_sql("sqlite"), ("t", "Daily", rollups.dumps(dims)))
+    rows = db.execute(rollups.definitions_sql("sqlite"), ("t",)).fetchall()
+    assert [d.spec for d in rollups.find(rows, "daily")] == ["day(created)"]
+    db.execute(rollups.unregister_sql("sqlite"), ("t", "Daily"))
+    assert rollups.find(db.execute(rollups.definitions_sql("sqlite"), ("t",)).fetchall(), "daily") is None
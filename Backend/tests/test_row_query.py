@@ -0,0 +1,77 @@
+import pytest
+
+from Backend import row_query
+from Backend.row_query import InvalidQuery
+
+COLUMNS = {"id": "INTEGER", "name": "TEXT", "age": "INTEGER", "score": "REAL", "joined": "DATE"}
+
+
+def test_parse_filter():
+    assert row_query.parse_filter("age:gte:18") == ("age", "gte", ["18"])
+    assert row_query.parse_filter("name:in:a,b,c") == ("name", "in", ["a", "b", "c"])
+    # only the first two colons split, so values may contain them
+    assert row_query.parse_filter("joined:eq:2024-01-01T10:00") == ("joined", "eq", ["2024-01-01T10:00"])
+
+
+@pytest.mark.parametrize("text", ["age", "age:gte", "age:like:1", ":eq"])
+def test_parse_filter_rejects_malformed(text):
+    with pytest.raises(InvalidQuery):
+        row_query.parse_filter(text)
+
+
+def test_parse_filter_caps_in_values():
+    values = ",".join(str(i) for i in range(row_query.MAX_IN_VALUES + 1))
+    with pytest.raises(InvalidQuery):
+        row_query.parse_filter(f"age:in:{values}")
+
+
+def test_parse_sort():
+    assert row_query.parse_sort(None) is None
+    assert row_query.parse_sort("age") == ("age", "asc")
+    assert row_query.parse_sort("-age") == ("age", "desc")
+
+
+@pytest.mark.parametrize("value,ctype,want", [
+    ("18", "INTEGER", 18), ("1.5", "REAL", 1.5), ("2", "DECIMAL(5,2)", 2.0),
+    ("x", "TEXT", "x"), ("2024-01-01", "DATE", "2024-01-01"), ("5", "BLOB", "5"), (7, "TEXT", 7),
+])
+def test_coerce(value, ctype, want):
+    got = row_query.coerce(value, ctype)
+    assert got == want and type(got) is type(want)
+
+
+def test_coerce_rejects_bad_numbers():
+    with pytest.raises(InvalidQuery):
+        row_query.coerce("abc", "INTEGER")
+
+
+def test_build_validates_and_types():
+    q = row_query.build(COLUMNS, 10, "asc", "AGE", ["name"], [("age", "gte", ["18"]), ("name", "in", ["a", "b"])])
+    # id and the sort column are always returned, once each, whatever the case
+    assert q.fields == ("id", "AGE", "name")
+    assert q.filters == (("age", "gte", (18,)), ("name", "in", ("a", "b")))
+    assert q.params() == [18, "a", "b", 10]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"sort": "nope"}, {"fields": ["nope"]}, {"filters": [("nope", "eq", ["1"])]},
+])
+def test_build_rejects_unknown_columns(kwargs):
+    with pytest.raises(InvalidQuery):
+        row_query.build(COLUMNS, 10, "asc", **kwargs)
+
+
+def test_seek_params_and_shape():
+    q = row_query.build(COLUMNS, 5, "desc", "age", seek=("30", 12))
+    assert q.params() == [30, 30, 12, 5]
+    assert q.shape()[-1] == "value"
+    null = row_query.build(COLUMNS, 5, "desc", "age", seek=(None, 12))
+    assert null.params() == [12, 5]
+    assert null.shape()[-1] == "null"
+
+
+def test_shape_ignores_values_but_key_does_not():
+    a = row_query.build(COLUMNS, 10, "asc", filters=[("age", "eq", ["1"])])
+    b = row_query.build(COLUMNS, 10, "asc", filters=[("age", "eq", ["2"])])
+    assert a.shape() == b.shape()
+    assert a.key() != b.key()
@@ -0,0 +1,71 @@
+import json
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+from Backend.serve import HashRing, form_of, parse_backends, router_app
+
+FORMS = [f"form_{i}" for i in range(2000)]
+
+
+def test_ring_is_deterministic_and_spread():
+    nodes = ["w0", "w1", "w2", "w3"]
+    ring = HashRing(nodes)
+    owners = {f: ring.node(f) for f in FORMS}
+    again = HashRing(list(reversed(nodes)))
+    assert owners == {f: again.node(f) for f in FORMS}
+    spread = Counter(owners.values())
+    assert set(spread) == set(nodes)
+    assert min(spread.values()) > len(FORMS) / len(nodes) / 2
+
+
+def test_ring_keys_on_the_stored_form_name():
+    ring = HashRing(["w0", "w1", "w2"])
+    assert ring.node("My  Form") == ring.node("My_Form")
+
+
+def test_adding_a_node_moves_about_one_nth():
+    before = HashRing(["w0", "w1", "w2", "w3"])
+    after = HashRing(["w0", "w1", "w2", "w3", "w4"])
+    moved = [f for f in FORMS if before.node(f) != after.node(f)]
+    # only forms taken over by the new node move
+    assert all(after.node(f) == "w4" for f in moved)
+    assert 0.1 < len(moved) / len(FORMS) < 0.3
+
+
+def test_form_of():
+    assert form_of("/forms/survey/tables/t/rows", "GET", b"") == "survey"
+    assert form_of("/forms/survey", "DELETE", b"") == "survey"
+    assert form_of("/forms", "POST", json.dumps({"form_name": "s"}).encode()) == "s"
+    assert form_of("/submit/", "POST", json.dumps({"form_name": "s", "fields": {}}).encode()) == "s"
+    assert form_of("/forms", "GET", b"") is None
+    assert form_of("/submit", "POST", b"not json") is None
+    assert form_of("/submit", "POST", b"[1]") is None
+    assert form_of("/submit", "POST", b'{"form_name": 3}') is None
+    assert form_of("/metrics", "GET", b"") is None
+
+
+def test_owners_survive_a_restart_with_new_socket_paths(tmp_path):
+    def ring(sock_dir):
+        value = ",".join(f"worker{i}={sock_dir}/worker{i}.sock" for i in range(4))
+        return HashRing(list(parse_backends(value)))
+
+    first, second = ring(tmp_path / "formdb_a"), ring(tmp_path / "formdb_b")
+    assert all(first.node(f) == second.node(f) for f in FORMS)
+    assert first.node("survey") in ("worker0", "worker1", "worker2", "worker3")
+
+
+def test_parse_backends():
+    assert parse_backends("w0=/a.sock,w1=/b.sock") == {"w0": "/a.sock", "w1": "/b.sock"}
+    assert parse_backends("") == {}
+    with pytest.raises(RuntimeError):
+        parse_backends("/a.sock")
+
+
+@pytest.mark.parametrize("path", ["/forms", "/slow_queries", "/index_report"])
+def test_router_rejects_a_bad_limit(path):
+    # answered by the router's own validation, before any worker is asked
+    client = TestClient(router_app)
+    assert client.get(path, params={"limit": "abc"}).status_code == 422
+    assert client.get(path, params={"limit": "0"}).status_code == 422
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from Backend import row_query, sql
+
+
+def test_ident_quotes_and_validates():
+    assert sql.ident("Name_1") == "`Name_1`"
+    for bad in ("", "a b", "a`b", "a;drop", "x-y"):
+        with pytest.raises(sql.InvalidIdentifier):
+            sql.ident(bad)
+    assert sql.is_ident("ok") and not sql.is_ident("no way")
+
+
+def test_statements_are_cached_objects():
+    assert sql.insert_sql("sqlite", "t", ("a", "b")) is sql.insert_sql("sqlite", "t", ("a", "b"))
+    assert sql.insert_sql("mariadb", "t", ("a", "b"), 2) == "INSERT INTO `t` (`a`,`b`) VALUES (%s,%s),(%s,%s)"
+    assert sql.update_sql("sqlite", "t", ("a",), ("id",)) == "UPDATE `t` SET `a`=? WHERE `id`=?"
+
+
+def test_index_name_fits_mariadb_limit():
+    assert sql.index_name("T", ["A", "b"]) == "ix_t_a_b"
+    long = sql.index_name("t" * 40, ["c" * 30])
+    assert len(long) == 64
+    assert long == sql.index_name("t" * 40, ["c" * 30])
+
+
+ROWS = [(1, 30), (2, None), (3, 25), (4, 30), (5, None), (6, 40), (7, 25)]
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, age INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def pages(conn, sort, direction, limit):
+    """Every id, read page by page with the seek condition, as list_rows does."""
+    columns = {"id": "INTEGER", "age": "INTEGER"}
+    seen, seek = [], None
+    while True:
+        q = row_query.build(columns, limit, direction, sort, seek=seek)
+        rows = conn.execute(sql.select_sql("sqlite", "t", q.shape()), q.params()).fetchall()
+        seen += [r[0] for r in rows]
+        if len(rows) < limit:
+            return seen
+        seek = (rows[-1][1], rows[-1][0])
+
+
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_keyset_pages_cover_every_row_once_in_order(db, direction, limit):
+    full = [r[0] for r in db.execute(
+        f"SELECT id FROM t ORDER BY age {direction}, id {direction}").fetchall()]
+    assert pages(db, "age", direction, limit) == full
+
+
+def test_filters_bind_values(db):
+    q = row_query.build({"id": "INTEGER", "age": "INTEGER"}, 10, "asc", filters=[("age", "in", ["25", "40"])])
+    text = sql.select_sql("sqlite", "t", q.shape())
+    assert "25" not in text
+    assert [r[0] for r in db.execute(text, q.params())] == [3, 6, 7]